@@ -0,0 +1,148 @@
+"""
+Animation of laser pulses: small red spheres that move along the beams of construction.define_laser.
+
+The pulses of the 'in' beams go from the start of the beam to the focus, the pulses of the 'out' beams from the focus to the end of the beam. An 'out' pulse leaves the focus when the 'in' pulses arrive. It takes period frames to go along a beam, then the pulse starts again. With pulses_per_beam > 1, there are more pulses on each beam, evenly spread.
+
+The locations for all frames are calculated with numpy (pulse_locations, this does not need Blender). The keyframes are not made with keyframe_insert, one frame at the time, but all at once: for each pulse, an action with an F-curve for x, y and z, and all keyframe points are set with keyframe_points.foreach_set. Thousands of frames for dozens of pulses take less than a second.
+
+The pulses use make_laserpulse_material from materials.py (a halo). The pulses of the last run are removed first, so this can be run again in the same file.
+
+Copyright Robbert Bloem, 2013
+"""
+
+import numpy
+
+import bpy
+
+import build
+import materials
+
+
+# the size (radius) of a pulse
+PULSE_SIZE = 0.5
+
+
+def pulse_paths(laser, laser_focus):
+    """
+    Where the pulses of each beam start and end, as n x 3 arrays.
+    """
+    focus = numpy.asarray(laser_focus[0]["loc"], dtype = float)
+    starts = []
+    ends = []
+    for l in laser:
+        loc = numpy.asarray(l["loc"], dtype = float)
+        if l["mat"] == "in":
+            starts.append(loc)
+            ends.append(focus)
+        elif "start" in l:
+            # a part of the beam after a mirror
+            starts.append(numpy.asarray(l["start"], dtype = float))
+            ends.append(loc)
+        else:
+            starts.append(focus)
+            ends.append(loc)
+    return numpy.array(starts).reshape((-1, 3)), numpy.array(ends).reshape((-1, 3))
+
+
+def pulse_locations(starts, ends, frames, period, pulses_per_beam = 1):
+    """
+    The locations of the pulses at frames, as an array of (beams x pulses_per_beam) x frames x 3.
+    The pulses of the first beam come first.
+    """
+    starts = numpy.asarray(starts, dtype = float)
+    ends = numpy.asarray(ends, dtype = float)
+    frames = numpy.asarray(frames, dtype = float)
+
+    # how far each pulse is along its beam, from 0 to 1
+    offsets = numpy.arange(pulses_per_beam) / float(pulses_per_beam)
+    phase = ((frames[numpy.newaxis,:] - frames[0]) / period + offsets[:,numpy.newaxis]) % 1
+
+    locations = starts[:,numpy.newaxis,numpy.newaxis,:] + phase[numpy.newaxis,:,:,numpy.newaxis] * (ends - starts)[:,numpy.newaxis,numpy.newaxis,:]
+    return locations.reshape((-1, len(frames), 3))
+
+
+def pulse_names(laser, pulses_per_beam = 1):
+    """
+    The names of the pulse objects, like pulse1in_0.
+    """
+    return ["%s_%d" % (l["id"], k) for l in laser for k in range(pulses_per_beam)]
+
+
+def remove_pulses(names):
+    """
+    Remove pulse objects and their actions.
+    """
+    for n in names:
+        if n in bpy.data.objects:
+            obj = bpy.data.objects[n]
+            if obj.animation_data is not None and obj.animation_data.action is not None:
+                action = obj.animation_data.action
+                obj.animation_data.action = None
+                if action.users == 0:
+                    bpy.data.actions.remove(action)
+    build.remove_objects(names)
+
+
+def make_pulses(names, size = PULSE_SIZE):
+    """
+    Make the pulse objects. The first one is made with the operator, the others share its mesh.
+    """
+    bpy.ops.mesh.primitive_uv_sphere_add(size = size)
+    first = bpy.context.active_object
+    first.name = names[0]
+    first.active_material = materials.make_laserpulse_material()
+
+    objects = [first]
+    new = []
+    for n in names[1:]:
+        obj = bpy.data.objects.new(n, first.data)
+        new.append(obj)
+        objects.append(obj)
+    build.link_objects(new)
+    return objects
+
+
+def set_keyframes(obj, data_path, frames, values):
+    """
+    Animate obj with a new action: one F-curve for each column of values (frames x columns), with a keyframe at every frame.
+    All keyframe points of an F-curve are set at once with foreach_set.
+    """
+    animation_data = obj.animation_data_create()
+    action = bpy.data.actions.new(obj.name)
+    animation_data.action = action
+
+    co = numpy.empty((len(frames), 2), dtype = numpy.float32)
+    co[:,0] = frames
+    for i in range(values.shape[1]):
+        fcurve = action.fcurves.new(data_path, index = i)
+        fcurve.keyframe_points.add(len(frames))
+        co[:,1] = values[:,i]
+        fcurve.keyframe_points.foreach_set("co", co.ravel())
+        # sort the points and calculate the handles
+        fcurve.update()
+
+
+def animate_pulses(laser, laser_focus, frame_start = 1, frame_end = 250, period = 50, pulses_per_beam = 1, size = PULSE_SIZE):
+    """
+    Make the pulses and animate them from frame_start to frame_end (see above). The frame range of the scene is set as well.
+    Returns the names of the pulses.
+    """
+    names = pulse_names(laser, pulses_per_beam)
+    remove_pulses(names)
+    if len(names) == 0:
+        return names
+
+    frames = numpy.arange(frame_start, frame_end + 1)
+    starts, ends = pulse_paths(laser, laser_focus)
+    locations = pulse_locations(starts, ends, frames, period, pulses_per_beam)
+
+    objects = make_pulses(names, size)
+    for obj, loc in zip(objects, locations):
+        set_keyframes(obj, "location", frames, loc)
+
+    scene = bpy.context.scene
+    scene.frame_start = frame_start
+    scene.frame_end = frame_end
+    scene.frame_set(frame_start)
+    print("animation: %d pulses, frames %d to %d, %d keyframes" % (len(names), frame_start, frame_end, 3 * len(names) * len(frames)))
+    return names
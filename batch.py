@@ -0,0 +1,388 @@
+"""
+Render variants of the figure from the command line, without opening Blender.
+
+The variants are in a JSON file: a list of dictionaries with a name and the flags and properties of run.py that are different, for example:
+[
+    {"name":"mirror", "flag_use_mirror_instead_of_plane":true},
+    {"name":"plane", "flag_use_mirror_instead_of_plane":false, "flag_transparent_background":true},
+    {"name":"close", "camera_settings":{"loc":[40, -50, 15]}, "plot_loc":[31, 40, -4]}
+]
+
+Usage:
+python batch.py variants.json --blender /Applications/blender.app/Contents/MacOS/blender --jobs 2 --output renders
+
+For each variant, a background Blender (blender -b) opens blender.blend, builds the scene with run.py and renders it to output/name.png. A few of these run at the same time (--jobs). Each Blender gets its share of the cores for rendering (--threads), so together they do not use more threads than there are cores.
+
+The timings of each job are in output/timings.json and the output of Blender in output/name.log.
+
+With --tiles 2x2, each picture is split in 4 tiles (see tiles.py). Each tile is rendered by its own Blender, with a render border, and the tiles are stitched together into output/name.png. The render time of each tile is printed, this shows which parts of the picture are slow (for example the mirror).
+
+With --frames 1-250, the frames of an animation are rendered instead of one picture (see progress.py). The frames are split in chunks (--chunk) and each chunk is rendered by its own Blender. Frames that were already rendered with the same scene are skipped, so an interrupted run can just be started again. The frames per minute and the time to go are printed after each chunk.
+
+Copyright Robbert Bloem, 2013
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+# blender -P doesn't add the folder of this file to the path, the other modules are there (see workers.py)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import cache
+import presets
+import progress
+import spec
+import tiles
+import view
+import workers
+
+try:
+    import bpy
+except ImportError:
+    # the driver runs outside of Blender
+    bpy = None
+
+
+# the name of the custom property of the scene with the variant
+VARIANT_PROPERTY = "batch_variant"
+
+
+def variant():
+    """
+    The flags and properties of the variant that is rendered, an empty dictionary when run.py is run by hand.
+    """
+    if bpy is None or VARIANT_PROPERTY not in bpy.context.scene:
+        return {}
+    return json.loads(bpy.context.scene[VARIANT_PROPERTY])
+
+
+def apply_variant(settings, v = None):
+    """
+    Change the flags and properties in settings (the globals() of run.py) to those of the variant v, by default the one that is rendered. See spec.apply_variant.
+    """
+    if v is None:
+        v = variant()
+    return spec.apply_variant(settings, v)
+
+
+def threads_per_job(jobs, cores = None):
+    """
+    Divide the cores over the jobs, at least one thread each.
+    """
+    if cores is None:
+        cores = multiprocessing.cpu_count()
+    return max(1, cores // jobs)
+
+
+def parse_tiles(text):
+    """
+    '2x3' to (2, 3): 2 tiles wide and 3 high.
+    """
+    nx, ny = text.lower().split("x")
+    return int(nx), int(ny)
+
+
+def job_name(v, tile = None, frames = None):
+    """
+    The name of the files of a job. tile is (nx, ny, column, row), frames a chunk of frames.
+    """
+    if frames is not None:
+        return "%s_frames_%d_%d" % (v["name"], frames[0], frames[-1])
+    if tile is None:
+        return v["name"]
+    return "%s_tile_%d_%d" % (v["name"], tile[2], tile[3])
+
+
+def scene_hash(v):
+    """
+    The hash of the scene of variant v: the spec and the flags and properties of run.py. Used to check if frames that were rendered before are still right.
+    """
+    settings = spec.run_settings()
+    spec.apply_variant(settings, v)
+    return cache.make_key("frames", spec.make_spec(settings), settings)
+
+
+def blender_command(blender, blend_file, v, output, threads, tile = None, frames = None, scene_hash = None):
+    """
+    The command line for a background Blender that renders variant v, or one tile of it, or a chunk of frames.
+    """
+    command = [
+        blender,
+        "-b", blend_file,
+        "-t", str(threads),
+        "-P", os.path.join(workers.package_dir, "batch.py"),
+        "--",
+        "--worker", json.dumps(v),
+        "--output", output
+    ]
+    if tile is not None:
+        command += ["--tile", ",".join(str(x) for x in tile)]
+    if frames is not None:
+        command += ["--frame-list", ",".join(str(f) for f in frames), "--scene-hash", scene_hash]
+    return command
+
+
+def run_job(blender, blend_file, v, output, threads, tile = None, frames = None, scene_hash = None):
+    """
+    Render one variant, or one tile of it, or a chunk of frames, in a background Blender. Returns the timings.
+    """
+    name = job_name(v, tile, frames)
+    returncode, total = workers.run_blender(
+        blender_command(blender, blend_file, v, output, threads, tile, frames, scene_hash),
+        os.path.join(output, name + ".log")
+    )
+    timing = {
+        "name":name,
+        "variant":v["name"],
+        "returncode":returncode,
+        "total":total
+    }
+    if tile is not None:
+        timing["tile"] = tile[2:]
+    if frames is not None:
+        timing["chunk"] = [frames[0], frames[-1]]
+    # the worker writes the time of the build and of the render
+    worker_file = os.path.join(output, name + ".json")
+    if os.path.exists(worker_file):
+        with open(worker_file) as f:
+            timing.update(json.load(f))
+        os.remove(worker_file)
+    return timing
+
+
+def render_variants(variants, blender = "blender", blend_file = None, output = "renders", jobs = None, threads = None, tile_grid = None):
+    """
+    Render all variants, jobs at the same time. Returns the timings of each job.
+    With tile_grid (nx, ny), each variant is rendered in nx x ny tiles, that are stitched together afterwards.
+    """
+    if tile_grid is None:
+        job_list = [(v, None) for v in variants]
+    else:
+        nx, ny = tile_grid
+        job_list = [(v, (nx, ny, i, j)) for v in variants for j in range(ny) for i in range(nx)]
+
+    if blend_file is None:
+        blend_file = os.path.join(workers.package_dir, "blender.blend")
+    blend_file = os.path.abspath(blend_file)
+    output = os.path.abspath(output)
+    if not os.path.exists(output):
+        os.makedirs(output)
+    if jobs is None:
+        jobs = min(len(job_list), multiprocessing.cpu_count())
+    jobs = max(1, jobs)
+    if threads is None:
+        threads = threads_per_job(jobs)
+
+    print("%d variants, %d jobs, %d at the same time, %d threads each" % (len(variants), len(job_list), jobs, threads))
+    t = time.time()
+    # in the order of the variants file
+    timings = workers.run_all(run_job, [(blender, blend_file, v, output, threads, tile) for v, tile in job_list], jobs, print_timing)
+
+    if tile_grid is not None:
+        for v in variants:
+            stitch_variant(v["name"], [x for x in timings if x["variant"] == v["name"]], tile_grid, output)
+
+    result = {
+        "jobs":jobs,
+        "threads":threads,
+        "total":time.time() - t,
+        "variants":timings
+    }
+    with open(os.path.join(output, "timings.json"), "w") as f:
+        json.dump(result, f, indent = 2)
+    print("all done in %.1f s, %d failed" % (result["total"], sum(1 for x in timings if x["returncode"] != 0)))
+    return result
+
+
+def render_frames(variants, frames, blender = "blender", blend_file = None, output = "renders", jobs = None, threads = None, chunk = progress.CHUNK_SIZE):
+    """
+    Render the frames of all variants, in chunks of chunk frames, jobs chunks at the same time. Frames that are done are skipped (see progress.py).
+    Returns the timings of each chunk.
+    """
+    if blend_file is None:
+        blend_file = os.path.join(workers.package_dir, "blender.blend")
+    blend_file = os.path.abspath(blend_file)
+    output = os.path.abspath(output)
+    if not os.path.exists(output):
+        os.makedirs(output)
+
+    job_list = []
+    hashes = {}
+    todo = {}
+    for v in variants:
+        hashes[v["name"]] = scene_hash(v)
+        done = progress.done_frames(output, v["name"], hashes[v["name"]])
+        todo[v["name"]] = [f for f in frames if f not in done]
+        print("%s: %d of %d frames done, scene %s" % (v["name"], len(frames) - len(todo[v["name"]]), len(frames), hashes[v["name"]][:12]))
+        job_list += [(v, c) for c in progress.chunks(todo[v["name"]], chunk)]
+
+    total = len(frames) * len(variants)
+    done = total - sum(len(x) for x in todo.values())
+    if jobs is None:
+        jobs = min(len(job_list), multiprocessing.cpu_count())
+    jobs = max(1, jobs)
+    if threads is None:
+        threads = threads_per_job(jobs)
+
+    print("%d frames to render, %d chunks, %d at the same time, %d threads each" % (total - done, len(job_list), jobs, threads))
+    t = time.time()
+    rendered = 0
+
+    def chunk_done(timing):
+        nonlocal done, rendered
+        print_timing(timing)
+        # also the frames of a chunk that failed halfway count
+        before = done
+        done = sum(len(progress.done_frames(output, v["name"], hashes[v["name"]]) & set(frames)) for v in variants)
+        rendered += done - before
+        print(progress.report(done, total, rendered, time.time() - t))
+
+    timings = workers.run_all(run_job, [(blender, blend_file, v, output, threads, None, c, hashes[v["name"]]) for v, c in job_list], jobs, chunk_done)
+
+    result = {
+        "jobs":jobs,
+        "threads":threads,
+        "total":time.time() - t,
+        "frames_per_minute":progress.frames_per_minute(rendered, time.time() - t),
+        "variants":timings
+    }
+    with open(os.path.join(output, "timings.json"), "w") as f:
+        json.dump(result, f, indent = 2)
+    print("all done in %.1f s, %d of %d frames done, %d chunks failed" % (result["total"], done, total, sum(1 for x in timings if x["returncode"] != 0)))
+    return result
+
+
+def stitch_variant(name, timings, tile_grid, output):
+    """
+    Stitch the tiles of a variant into output/name.png and print the render time of each tile. The tiles are removed.
+    """
+    nx, ny = tile_grid
+    if any(x["returncode"] != 0 or "render" not in x for x in timings):
+        print("%s: not stitched, not all tiles were rendered" % name)
+        return
+    width, height = timings[0]["size"]
+    tile_files = [(x["rect"], os.path.join(output, x["name"] + ".png")) for x in timings]
+    tiles.stitch(tile_files, width, height, os.path.join(output, name + ".png"))
+    for rect, tile_file in tile_files:
+        os.remove(tile_file)
+    tiles.print_times(name, dict((tuple(x["tile"]), x["render"]) for x in timings), nx, ny)
+
+
+def print_timing(timing):
+    if timing["returncode"] != 0 or "render" not in timing:
+        print("%s: failed (see %s.log)" % (timing["name"], timing["name"]))
+    else:
+        print("%s: build %.1f s, render %.1f s, total %.1f s" % (timing["name"], timing["build"], timing["render"], timing["total"]))
+
+
+def worker(v, output, tile = None, frames = None, scene_hash = None):
+    """
+    Runs inside the background Blender: build the scene of variant v with run.py and render it.
+    With tile (nx, ny, column, row), only that tile is rendered, as a PNG file.
+    With frames, these frames are rendered as PNG files, and each frame is added to the progress file when it is done (see progress.py).
+    """
+    sys.path.append(os.path.dirname(bpy.data.filepath))
+    bpy.context.scene[VARIANT_PROPERTY] = json.dumps(v)
+
+    t = time.time()
+    import run
+    build_time = time.time() - t
+
+    render = bpy.context.scene.render
+    # what makes the render slow, for the cost model (see presets.py)
+    timing = {"build":build_time, "scene":presets.describe(run.render_preset, run.resolution, run.protein_ids)}
+    if tile is not None:
+        width, height = view.render_size((render.resolution_x, render.resolution_y, render.resolution_percentage))
+        width, height = int(width), int(height)
+        rect = tiles.tile_rect(width, height, *tile)
+        render.border_min_x, render.border_max_x, render.border_min_y, render.border_max_y = tiles.border(rect, width, height)
+        render.use_border = True
+        render.use_crop_to_border = True
+        render.image_settings.file_format = "PNG"
+        timing["size"] = (width, height)
+        timing["rect"] = rect
+
+    if frames is not None:
+        render.image_settings.file_format = "PNG"
+        timing["frames"] = []
+        timing["render"] = 0
+        for frame in frames:
+            bpy.context.scene.frame_set(frame)
+            t = time.time()
+            # Blender adds the .png
+            render.filepath = progress.frame_file(output, v["name"], frame)[:-len(".png")]
+            bpy.ops.render.render(write_still = True)
+            render_time = time.time() - t
+            progress.record(output, v["name"], frame, scene_hash, render_time)
+            timing["frames"].append(frame)
+            timing["render"] += render_time
+    else:
+        t = time.time()
+        render.filepath = os.path.join(output, job_name(v, tile))
+        bpy.ops.render.render(write_still = True)
+        timing["render"] = time.time() - t
+
+    with open(os.path.join(output, job_name(v, tile, frames) + ".json"), "w") as f:
+        json.dump(timing, f)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description = "Render variants of the figure with background Blenders.")
+    parser.add_argument("variants", nargs = "?", help = "JSON file with a list of variants")
+    parser.add_argument("--blender", default = "blender", help = "the Blender executable")
+    parser.add_argument("--blend-file", default = None, help = "the Blender file, default blender.blend next to this file")
+    parser.add_argument("--output", default = "renders", help = "folder for the pictures and timings")
+    parser.add_argument("--jobs", type = int, default = None, help = "number of Blenders at the same time, default the number of cores (at most the number of variants)")
+    parser.add_argument("--threads", type = int, default = None, help = "render threads per Blender, default the cores divided by the jobs")
+    parser.add_argument("--tiles", default = None, help = "render each picture in tiles, for example 2x2")
+    parser.add_argument("--frames", default = None, help = "render these frames of an animation, for example 1-250")
+    parser.add_argument("--chunk", type = int, default = progress.CHUNK_SIZE, help = "with --frames: the number of frames each Blender renders")
+    parser.add_argument("--worker", default = None, help = argparse.SUPPRESS)
+    parser.add_argument("--tile", default = None, help = argparse.SUPPRESS)
+    parser.add_argument("--frame-list", default = None, help = argparse.SUPPRESS)
+    parser.add_argument("--scene-hash", default = None, help = argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker is not None:
+        tile = None
+        if args.tile is not None:
+            tile = tuple(int(x) for x in args.tile.split(","))
+        frames = None
+        if args.frame_list is not None:
+            frames = [int(x) for x in args.frame_list.split(",")]
+        worker(json.loads(args.worker), args.output, tile, frames, args.scene_hash)
+        return
+
+    if args.variants is None:
+        parser.error("give a file with variants")
+    if args.frames is not None:
+        if args.tiles is not None:
+            parser.error("--frames and --tiles can not be used together")
+        render_frames(
+            spec.read_variants(args.variants),
+            progress.parse_frames(args.frames),
+            blender = args.blender,
+            blend_file = args.blend_file,
+            output = args.output,
+            jobs = args.jobs,
+            threads = args.threads,
+            chunk = args.chunk
+        )
+        return
+    render_variants(
+        spec.read_variants(args.variants),
+        blender = args.blender,
+        blend_file = args.blend_file,
+        output = args.output,
+        jobs = args.jobs,
+        threads = args.threads,
+        tile_grid = parse_tiles(args.tiles) if args.tiles else None
+    )
+
+
+if __name__ == "__main__":
+    main(workers.script_args(sys.argv))
@@ -0,0 +1,148 @@
+"""
+Location, rotation and scale of beams between two points, for many beams at once.
+This does the same as the loop in build.build_laser did for one beam at the time (with mathutils), but with arrays. It does not need Blender, so it can also be used (and checked) outside of it.
+
+A beam is a cone. The cone primitive has its point at +z and its base at -z, and it is 2 long.
+
+Copyright Robbert Bloem, 2013
+"""
+
+import numpy
+
+
+def beam_transforms(starts, ends, widths = 1):
+    """
+    Calculate the location, rotation and scale of the cones between starts and ends.
+
+    INPUT
+    - starts: n x 3 array with the start points (the wide end of the beam)
+    - ends: n x 3 array with the end points, or one point (3) for beams that all go to the same focus
+    - widths (int/float or array with n values): the size of the wide end
+
+    OUTPUT
+    - locations: n x 3, the midpoints
+    - rotations: n x 3, Euler angles (XYZ)
+    - scales: n x 3
+    """
+    starts = numpy.atleast_2d(numpy.asarray(starts, dtype = float))
+    ends = numpy.asarray(ends, dtype = float)
+    ends = numpy.broadcast_to(ends, starts.shape)
+
+    # the location is in the middle
+    locations = (starts + ends) / 2
+
+    # the cone is 2 long, so scale it with half of the length
+    lengths = numpy.sqrt(numpy.sum((starts - ends)**2, axis = 1))
+    widths = numpy.broadcast_to(numpy.asarray(widths, dtype = float), lengths.shape)
+    scales = numpy.column_stack((widths, widths, lengths / 2))
+
+    # the rotation that turns the beam direction to the z-axis
+    # then turn it half a circle around z, this is what build_laser always did
+    rotations = rotation_difference_to_z(ends - starts)
+    rotations = quaternions_to_eulers(rotations)
+    rotations[:,2] += numpy.pi
+
+    return locations, rotations, scales
+
+
+def rotation_difference_to_z(vectors):
+    """
+    For each vector, the quaternion (w, x, y, z) that rotates it to the z-axis.
+    This is Vector.rotation_difference(Vector((0,0,1))) from mathutils, for n vectors.
+    """
+    vectors = numpy.atleast_2d(numpy.asarray(vectors, dtype = float))
+    n = len(vectors)
+    lengths = numpy.sqrt(numpy.sum(vectors**2, axis = 1))
+    lengths[lengths == 0] = 1
+    v = vectors / lengths[:,numpy.newaxis]
+
+    # axis is v x z, angle between v and z
+    axis = numpy.column_stack((v[:,1], -v[:,0], numpy.zeros(n)))
+    axis_length = numpy.sqrt(numpy.sum(axis**2, axis = 1))
+    angle = numpy.arccos(numpy.clip(v[:,2], -1, 1))
+
+    # parallel vectors: no rotation
+    # anti-parallel vectors: half a turn around an orthogonal axis, picked like mathutils does
+    parallel = axis_length <= 1.19e-7
+    axis[~parallel] /= axis_length[~parallel,numpy.newaxis]
+    anti = parallel & (v[:,2] < 0)
+    angle[parallel & ~anti] = 0
+    if numpy.any(anti):
+        axis[anti] = ortho_vectors(v[anti])
+        angle[anti] = numpy.pi
+
+    q = numpy.empty((n, 4))
+    q[:,0] = numpy.cos(angle / 2)
+    q[:,1:] = axis * numpy.sin(angle / 2)[:,numpy.newaxis]
+    return q
+
+
+def ortho_vectors(v):
+    """
+    A normalized vector orthogonal to each vector, the same choice as ortho_v3_v3 in Blender.
+    """
+    out = numpy.empty_like(v)
+    dominant = numpy.argmax(numpy.abs(v), axis = 1)
+    x, y, z = v[:,0], v[:,1], v[:,2]
+    candidates = [
+        numpy.column_stack((-y - z, x, x)),
+        numpy.column_stack((y, -x - z, y)),
+        numpy.column_stack((z, z, -x - y)),
+    ]
+    for i in range(3):
+        out[dominant == i] = candidates[i][dominant == i]
+    return out / numpy.sqrt(numpy.sum(out**2, axis = 1))[:,numpy.newaxis]
+
+
+def quaternions_to_matrices(q):
+    """
+    n x 4 quaternions (w, x, y, z) to n x 3 x 3 rotation matrices.
+    """
+    w, x, y, z = q[:,0], q[:,1], q[:,2], q[:,3]
+    m = numpy.empty((len(q), 3, 3))
+    m[:,0,0] = 1 - 2 * (y * y + z * z)
+    m[:,0,1] = 2 * (x * y - w * z)
+    m[:,0,2] = 2 * (x * z + w * y)
+    m[:,1,0] = 2 * (x * y + w * z)
+    m[:,1,1] = 1 - 2 * (x * x + z * z)
+    m[:,1,2] = 2 * (y * z - w * x)
+    m[:,2,0] = 2 * (x * z - w * y)
+    m[:,2,1] = 2 * (y * z + w * x)
+    m[:,2,2] = 1 - 2 * (x * x + y * y)
+    return m
+
+
+def matrices_to_eulers(m):
+    """
+    n x 3 x 3 rotation matrices to XYZ Euler angles.
+    There are two solutions, like mathutils the one with the smallest angles is used.
+    """
+    cy = numpy.hypot(m[:,0,0], m[:,1,0])
+
+    e1 = numpy.column_stack((
+        numpy.arctan2(m[:,2,1], m[:,2,2]),
+        numpy.arctan2(-m[:,2,0], cy),
+        numpy.arctan2(m[:,1,0], m[:,0,0])
+    ))
+    e2 = numpy.column_stack((
+        numpy.arctan2(-m[:,2,1], -m[:,2,2]),
+        numpy.arctan2(-m[:,2,0], -cy),
+        numpy.arctan2(-m[:,1,0], -m[:,0,0])
+    ))
+    use_e2 = numpy.sum(numpy.abs(e1), axis = 1) > numpy.sum(numpy.abs(e2), axis = 1)
+    eulers = numpy.where(use_e2[:,numpy.newaxis], e2, e1)
+
+    # gimbal lock
+    lock = cy <= 16 * 1.19e-7
+    if numpy.any(lock):
+        eulers[lock,0] = numpy.arctan2(-m[lock,1,2], m[lock,1,1])
+        eulers[lock,1] = numpy.arctan2(-m[lock,2,0], cy[lock])
+        eulers[lock,2] = 0
+    return eulers
+
+
+def quaternions_to_eulers(q):
+    """
+    n x 4 quaternions (w, x, y, z) to XYZ Euler angles.
+    """
+    return matrices_to_eulers(quaternions_to_matrices(q))
@@ -0,0 +1,248 @@
+"""
+Benchmark of the build pipeline, without Blender.
+
+run.py is run with the stand-in for bpy of stub_bpy.py, so only the Python side is measured: the construction, the build functions, the caches and the materials. Not the time Blender itself needs for the meshes and the boolean operations.
+
+The scene is made bigger and bigger: at size n, every part of the scene (except the camera and the focus of the laser) is there n times, next to each other. For each size, the time of each stage of run.py (block, green_channel, ..., lamps, see incremental.timings), the total time, the number of operator calls and the number of datablocks are measured.
+
+The results can be saved and compared with earlier results, to find out if something got slower:
+python benchmark.py --save before.json
+(make changes)
+python benchmark.py --compare before.json
+
+Everything happens in a temporary folder, with a made up protein.
+
+Copyright Robbert Bloem, 2013
+"""
+
+import argparse
+import importlib
+import io
+import json
+import math
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import reloader
+import spec
+import stub_bpy
+
+
+# the sizes of the scene
+SIZES = [1, 2, 4, 8]
+
+# the number of faces of the made up protein
+PROTEIN_FACES = 20000
+
+# parts that are not copied when the scene gets bigger
+SINGLE_PARTS = ["camera", "laser_focus"]
+
+# the distance between the copies
+OFFSET = (60, 0, 0)
+
+# a stage is slower if it takes more than TOLERANCE (a fraction) longer, and at least MIN_DIFFERENCE seconds
+# smaller differences are noise
+TOLERANCE = 0.25
+MIN_DIFFERENCE = 0.02
+
+# the folder with run.py
+package_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def write_protein(filename, faces):
+    """
+    A made up protein: a sphere with about faces faces and colors, as a VRML file like PyMol makes.
+    """
+    rings = max(3, int(math.sqrt(faces / 2)))
+    segments = 2 * rings
+    points = []
+    colors = []
+    for i in range(rings + 1):
+        theta = math.pi * i / rings
+        for j in range(segments):
+            phi = 2 * math.pi * j / segments
+            points.append((10 * math.sin(theta) * math.cos(phi), 10 * math.sin(theta) * math.sin(phi), 10 * math.cos(theta)))
+            colors.append((i / rings, j / segments, 0.5))
+    index = []
+    for i in range(rings):
+        for j in range(segments):
+            a = i * segments + j
+            b = i * segments + (j + 1) % segments
+            index.append((a, b, b + segments, a + segments))
+
+    with open(filename, "w") as f:
+        f.write("#VRML V2.0 utf8\n")
+        f.write("Shape {\n geometry IndexedFaceSet {\n  coord Coordinate { point [\n")
+        f.write(",\n".join("%.4f %.4f %.4f" % p for p in points))
+        f.write(" ] }\n  color Color { color [\n")
+        f.write(",\n".join("%.3f %.3f %.3f" % c for c in colors))
+        f.write(" ] }\n  coordIndex [\n")
+        f.write(",\n".join("%d, %d, %d, %d, -1" % q for q in index))
+        f.write(" ]\n }\n}\n")
+
+
+def grow(scene, n):
+    """
+    The scene with every part n times. The first copy keeps the ids, the others get _1, _2 etc.
+    """
+    scene = spec.normalize(scene)
+    for name, elements in scene["parts"].items():
+        if name in SINGLE_PARTS:
+            continue
+        copies = []
+        for k in range(n):
+            for e in elements:
+                e = dict(e)
+                if k > 0:
+                    e["id"] = "%s_%d" % (e["id"], k)
+                    e["loc"] = [e["loc"][i] + k * OFFSET[i] for i in range(3)]
+                copies.append(e)
+        scene["parts"][name] = copies
+    spec.validate(scene)
+    return scene
+
+
+def prepare(folder, sizes):
+    """
+    Set up the temporary folder: the resources, the protein and a spec for each size. Returns the spec files.
+    """
+    resources_path = os.path.join(folder, "res_alt") + "/"
+    os.makedirs(resources_path)
+    for filename in os.listdir(os.path.join(package_dir, "res_alt")):
+        if filename.endswith(".png"):
+            shutil.copy(os.path.join(package_dir, "res_alt", filename), resources_path)
+    write_protein(resources_path + "prot2.wrl", PROTEIN_FACES)
+
+    settings = spec.run_settings()
+    settings["resources_path"] = resources_path
+    scene = spec.make_spec(settings)
+    spec_files = {}
+    for n in sizes:
+        spec_files[n] = os.path.join(folder, "scene_%d.spec" % n)
+        spec.save(grow(scene, n), spec_files[n])
+    return spec_files
+
+
+def run_once(folder, spec_file, warm = False):
+    """
+    Run run.py once, with a new empty scene. Returns the time of each stage, the total time, the operator calls and the new datablocks.
+    """
+    if not warm:
+        shutil.rmtree(os.path.join(folder, "cache"), ignore_errors = True)
+    bpy = stub_bpy.install()
+    # the modules have to use the new bpy
+    reloader.reset()
+    bpy.data.filepath = os.path.join(folder, "blender.blend")
+    bpy.context.scene["batch_variant"] = json.dumps({"name":"benchmark", "scene_spec_file":spec_file})
+
+    # run.py talks a lot
+    stdout = sys.stdout
+    sys.stdout = io.StringIO()
+    try:
+        t = time.time()
+        if "run" in sys.modules:
+            reloader.reload(sys.modules["run"])
+        else:
+            importlib.import_module("run")
+        total = time.time() - t
+    finally:
+        sys.stdout = stdout
+
+    return {
+        "stages":dict(sys.modules["incremental"].timings),
+        "total":total,
+        "calls":dict(stub_bpy.calls),
+        "allocations":dict(stub_bpy.allocations),
+        "objects":len(bpy.data.objects)
+    }
+
+
+def benchmark(sizes = SIZES, repeat = 3, warm = False):
+    """
+    Run the benchmark. For each size, the fastest of repeat runs is kept, per stage.
+    """
+    sys.path.insert(0, package_dir)
+    folder = tempfile.mkdtemp(prefix = "benchmark_")
+    try:
+        spec_files = prepare(folder, sizes)
+        results = {}
+        for n in sizes:
+            runs = [run_once(folder, spec_files[n], warm) for i in range(repeat)]
+            best = runs[0]
+            for r in runs[1:]:
+                best["total"] = min(best["total"], r["total"])
+                for stage, t in r["stages"].items():
+                    best["stages"][stage] = min(best["stages"][stage], t)
+            results[str(n)] = best
+            print_size(n, best)
+    finally:
+        shutil.rmtree(folder, ignore_errors = True)
+        for name in ["bpy", "mathutils"]:
+            sys.modules.pop(name, None)
+
+    return {
+        "date":time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python":platform.python_version(),
+        "machine":platform.machine(),
+        "repeat":repeat,
+        "warm":warm,
+        "sizes":results
+    }
+
+
+def print_size(n, result):
+    print("size %d: %.3f s, %d objects, %d operator calls, %d datablocks" % (n, result["total"], result["objects"], sum(result["calls"].values()), sum(result["allocations"].values())))
+    for stage, t in sorted(result["stages"].items(), key = lambda x: -x[1]):
+        print("    %-15s %8.4f s" % (stage, t))
+
+
+def compare(old, new, tolerance = TOLERANCE, min_difference = MIN_DIFFERENCE):
+    """
+    Compare two benchmarks. Returns the stages that got slower, as (size, stage, old time, new time).
+    """
+    slower = []
+    for n, result in new["sizes"].items():
+        if n not in old["sizes"]:
+            continue
+        before = old["sizes"][n]
+        times = [("total", before["total"], result["total"])]
+        times += [(stage, before["stages"][stage], t) for stage, t in result["stages"].items() if stage in before["stages"]]
+        for stage, t_old, t_new in times:
+            if t_new > t_old * (1 + tolerance) and t_new - t_old > min_difference:
+                slower.append((int(n), stage, t_old, t_new))
+    return sorted(slower)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description = "Benchmark the stages of run.py without Blender.")
+    parser.add_argument("--sizes", type = int, nargs = "+", default = SIZES, help = "the sizes of the scene: every part is there this many times")
+    parser.add_argument("--repeat", type = int, default = 3, help = "runs per size, the fastest counts")
+    parser.add_argument("--warm", action = "store_true", help = "keep the cache between the runs, like running run.py again")
+    parser.add_argument("--save", default = None, help = "save the results in this file")
+    parser.add_argument("--compare", default = None, help = "compare with the results in this file, fails if a stage got slower")
+    parser.add_argument("--tolerance", type = float, default = TOLERANCE, help = "how much slower (fraction) is slower")
+    args = parser.parse_args(argv)
+
+    results = benchmark(args.sizes, args.repeat, args.warm)
+    if args.save is not None:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent = 2, sort_keys = True)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            old = json.load(f)
+        slower = compare(old, results, args.tolerance)
+        for n, stage, t_old, t_new in slower:
+            print("slower: size %d, %s: %.4f s -> %.4f s (+%.0f%%)" % (n, stage, t_old, t_new, 100 * (t_new / t_old - 1)))
+        if len(slower) > 0:
+            return 1
+        print("nothing got slower than %s" % args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
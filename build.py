@@ -5,82 +5,126 @@ To change what is build, use construction.py
 Copyright Robbert Bloem, 2013
 """
 
-import imp
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    # only from Python 3.4
+    tracemalloc = None
 
 import bpy
-import mathutils
 import math
+import numpy
 
+import beams
+import cache
+import csg
+import lod
 import materials
+import spatial
+import vrml
+
+
+# shared meshes for primitives with the same shape, see template_mesh()
+# the key is the shape and tessellation, the value is the name of the mesh
+mesh_templates = {}
+mesh_template_stats = {"hits":0, "misses":0}
 
-imp.reload(materials)
+# the number of vertices of cylinders and cones, if the element doesn't give 'vertices'
+# 40 is needed for the boolean operations (see add_primitive)
+CYLINDER_VERTICES = 40
+CONE_VERTICES = 64
 
 
-def build_laser(laser, laser_focus, material_laser_in, material_laser_out, scale_in, scale_out):
+def build_laser(laser, laser_focus, material_laser_in, material_laser_out, scale_in, scale_out, bulk = False, shared = False):
     """
     This function takes two points (one in laser and the first one of laser_focus) and calculates the position, angle and scale of the element. It is used to calculate beam paths - like it is done here. Strictly speaking, this could/should have been done in construction.py but it is here for historical reasons. It is a pretty cool function. 
     
     'in' are the incoming beams before the block
     'out' are the outgoing beam after the block
     
+    The calculation is done for all beams at once, see beams.py. With bulk = True, the beams are also made with the data API in one go (see add_primitives). 
+    
     INPUT
     - laser: list with starting points
     - laser_focus: list with focus, only 0th element is used
     - material_laser_in, material_laser_out: material
     - scale_in, scale_out (int/float): the size of the non-focus ends
+    - bulk, shared: see add_primitives
     
     """
-
-    # the focus, the end point
-    end = laser_focus[0]["loc"]
-
-    for l in laser:
-        # the start point
-        start = l["loc"]
-    
-        # find the rotation
-        p1 = mathutils.Vector(start)
-        p2 = mathutils.Vector(end)
-        v = p2 - p1
-        rot = v.rotation_difference(mathutils.Vector((0,0,1)))
-        rot = rot.to_euler()
-        rot = (rot[0], rot[1], rot[2] + math.pi)
-
-        # find the location
-        loc = [0,0,0]
-        for j in range(3):
-            loc[j] = (start[j] + end[j]) / 2        
-        loc = (loc[0], loc[1], loc[2])
-        
-        # find the scale
-        _d = 0
-        for j in range(3):
-            _d += (start[j] - end[j])**2 
-
-        # assign material and scale
-        if l["mat"] == "in":
+    
+    elements = laser_primitives(laser, laser_focus, scale_in, scale_out)
+    
+    objects = []
+    for e in elements:
+        # assign material
+        if e["mat"] == "in":
             mat = material_laser_in
-            scale = scale_in
         else:
             mat = material_laser_out
-            scale = scale_out
+        
+        if bulk:
+            objects += [new_primitive_object(e, mat, shared = shared)]
+        else:
+            add_primitive(e, mat)
+    
+    if bulk:
+        link_objects(objects)
 
-        # make a temporary dictionary and add the primitive
-        temp = {"id":l["id"],
+
+def laser_primitives(laser, laser_focus, scale_in, scale_out):
+    """
+    The cones for the beams of build_laser, as a list with dictionaries like the ones in construction.py. 
+    The 'mat' of the beam ('in' or 'out') is kept.
+    A beam with a 'start' (a part of a beam after a mirror, see construction.define_laser) is a cylinder from the start to its loc, as wide as the end of the cone.
+    """
+    
+    if len(laser) == 0:
+        return []
+    
+    # the focus, the end point
+    focus = laser_focus[0]["loc"]
+    
+    # the start points and the size of the non-focus end
+    starts = [l["loc"] for l in laser]
+    ends = [l.get("start", focus) for l in laser]
+    widths = [scale_in if l["mat"] == "in" else scale_out for l in laser]
+    
+    locs, rots, scales = beams.beam_transforms(starts, ends, widths)
+    
+    elements = []
+    for i, l in enumerate(laser):
+        e = {"id":l["id"],
                 "shape":"cone",
-                "loc":loc,
-                "rot":rot,
-                "scale":(scale, scale, math.sqrt(_d)/2)
+                "loc":tuple(locs[i]),
+                "rot":tuple(rots[i]),
+                "scale":tuple(scales[i]),
+                "mat":l["mat"]
             }
-        add_primitive(temp, mat)
+        # the cylinder has the size of the cone: radius 1, 2 long
+        if "start" in l:
+            e.update({"shape":"cylinder", "radius":1, "depth":2})
+        elements += [e]
+    return elements
 
 
-
-def make_proteins(proteins):
+def make_proteins(proteins, native = True, cached = False, cache_size = None, quality = "full", camera = None, resolution = None):
     """
     Import and place proteins
+    
+    With native = True the .wrl files are read with vrml.py and the mesh is made directly. This is faster than the x3d importer, and the lights in the files are not made at all. The time and the peak memory of each protein are printed (if memory was traced already, the peak of that tracing). 
+    With cached = True (only with native), the geometry is saved in a binary file the first time, after that the .wrl file is not read anymore (see vrml.read_wrl_cached). cache_size is the maximum size of the protein cache in bytes.
+    quality (only with native) is the level of detail, see lod.py: 'full', 'high', 'medium', 'low', 'draft', or 'auto'. With 'auto' the level is chosen from the size of the protein in the picture, for that camera (from construction.define_camera) and resolution (resolution_x, resolution_y, resolution_percentage) are needed. 
+    With native = False the x3d importer is used. 
     """
     
+    if native:
+        for p in proteins:
+            make_protein(p, cached, cache_size, quality, camera, resolution)
+        return
+    
     for p in proteins:
         # import
         bpy.ops.import_scene.x3d(filepath = p["filename"])
@@ -107,25 +151,117 @@ def make_proteins(proteins):
         bpy.data.materials["Shape" + ex].use_raytrace = False
 
 
-def add_primitives(elements, material = False, loc = False, scale = False, rot = False):
+def make_protein(p, cached = False, cache_size = None, quality = "full", camera = None, resolution = None):
+    """
+    Read one protein with vrml.py and make the object. See make_proteins.
+    """
+    
+    # if the caller traces memory already, leave it running
+    traced = tracemalloc is not None and tracemalloc.is_tracing()
+    if tracemalloc is not None and not traced:
+        tracemalloc.start()
+    t = time.time()
+    
+    if cached:
+        geometry = vrml.read_wrl_cached(p["filename"], max_size = cache_size)
+        key = vrml.protein_key(p["filename"])
+    else:
+        geometry = vrml.read_wrl(p["filename"])
+        key = None
+    
+    # level of detail
+    if quality == "auto":
+        quality = lod.auto_quality(geometry, p, camera, resolution)
+    geometry = lod.simplify(geometry, quality, key, cache_size)
+    mesh = protein_mesh(p["id"], geometry)
+    
+    obj = bpy.data.objects.new(p["id"], mesh)
+    obj.location = p["loc"]
+    obj.scale = p["scale"]
+    if "rot" in p:
+        obj.rotation_euler = p["rot"]
+    link_objects([obj])
+    
+    # report
+    t = time.time() - t
+    if tracemalloc is not None:
+        peak = tracemalloc.get_traced_memory()[1]
+        if not traced:
+            tracemalloc.stop()
+        memory = "%.1f MB" % (peak / 1024**2)
+    else:
+        memory = "unknown"
+    print("protein %s (%s): %i vertices, %i faces, %.2f s, peak memory %s" % (p["id"], quality, len(geometry["vertices"]), len(geometry["loop_totals"]), t, memory))
+    return obj
+
+
+def protein_mesh(name, geometry):
+    """
+    Make the mesh for a protein from the arrays of vrml.read_wrl: the faces, the colors as vertex colors and the protein material.
+    """
+    mesh = mesh_from_arrays(name, geometry["vertices"], geometry["loop_totals"], geometry["loop_vertices"])
+    
+    if geometry["colors"] is not None:
+        # vertex colors are stored per face corner (loop)
+        layer = mesh.vertex_colors.new()
+        loop_colors = geometry["colors"][numpy.asarray(geometry["loop_vertices"], dtype = numpy.int64)]
+        layer.data.foreach_set("color", loop_colors.ravel())
+    
+    mesh.materials.append(materials.material_protein())
+    return mesh
+
+
+def add_primitives(elements, material = False, loc = False, scale = False, rot = False, bulk = False, shared = False):
     """
     General function that takes a list of primitives that have to be build and build them one by one.
     id and loc(ation) are mandatory.
     Properties can be overridden by the function call.
     Returns a list with all the element-ids so they can be boolean-combined. 
+    
+    With bulk = True the operators are not used. The meshes are made directly with the data API and all objects are linked to the scene in one go, with only one scene update at the end. The result is the same (names, materials, scales, rotations), it is just a lot faster for long lists. 
+    With shared = True (only together with bulk) primitives with the same shape use the same mesh, see template_mesh().
     """
     names = []
+    
+    if bulk:
+        objects = []
+        for element in elements:
+            objects += [new_primitive_object(element, material, loc, scale, rot, shared)]
+            names += [element["id"]]
+        link_objects(objects)
+        return names
+    
     for element in elements:
         add_primitive(element, material, loc, scale, rot)
         names += [element["id"]]
     return names
 
 
+def compare_add_primitives(elements, material = False):
+    """
+    Build the same list with the operators and with the bulk path and print how long both take. 
+    The objects of the first build are removed, so only one set of objects is left.
+    Returns a dictionary with the times in seconds.
+    """
+    t = time.time()
+    for element in elements:
+        obj = add_primitive(element, material)
+        remove_objects([obj.name])
+    t_ops = time.time() - t
+    
+    t = time.time()
+    add_primitives(elements, material, bulk = True)
+    t_bulk = time.time() - t
+    
+    print("add_primitives, %i elements: operators %.3f s, bulk %.3f s (%.1fx)" % (len(elements), t_ops, t_bulk, t_ops / max(t_bulk, 1e-9)))
+    return {"operators":t_ops, "bulk":t_bulk}
+
+
 def add_primitive(p_dic, material = False, loc = False, scale = False, rot = False):
     """
     General function to make a primitive.
     p_dic is a dictionary with properties. It should contain a unique id and a loc(ation). You can also give scale and rotation. You can override the values in p_dic in the function call. 
-    You can use different shapes. Some shapes have additional requirements (cylinder needs depth and radius as well). 
+    You can use different shapes. Some shapes have additional requirements (cylinder needs depth and radius as well). Cylinders and cones can have 'vertices', the number of vertices of the circle (see tessellation.py). 
 
     """
 
@@ -148,13 +284,13 @@ def add_primitive(p_dic, material = False, loc = False, scale = False, rot = Fal
                     depth = p_dic["depth"], 
                     layers = layers,
                     end_fill_type = "TRIFAN", 
-                    vertices = 40
+                    vertices = p_dic.get("vertices", CYLINDER_VERTICES)
                 )
                 # TRIFAN and 40 are set to make the boolean operations work properly.
         elif p_dic["shape"] == "cone":     
             bpy.ops.mesh.primitive_cone_add(
                 location = loc, 
-                vertices = 64,
+                vertices = p_dic.get("vertices", CONE_VERTICES),
                 layers = layers
             )
         elif p_dic["shape"] == "plane":
@@ -176,6 +312,219 @@ def add_primitive(p_dic, material = False, loc = False, scale = False, rot = Fal
 
     # select new object
     obj = bpy.context.active_object
+    set_properties(obj, p_dic, material, scale, rot)
+    return obj
+
+
+def new_primitive_object(p_dic, material = False, loc = False, scale = False, rot = False, shared = False):
+    """
+    Same as add_primitive, but the mesh is made with the data API instead of with an operator. The object is NOT linked to the scene yet, use link_objects() for that. 
+    With shared = True, the object uses a shared mesh from template_mesh(). The material is then linked to the object, not to the mesh, otherwise all objects with the same mesh would get the same material. 
+    """
+    
+    # override location
+    if not loc:
+        loc = p_dic["loc"]
+    
+    if "shape" in p_dic:
+        shape = p_dic["shape"]
+    else:
+        shape = "cube"
+    
+    # the same settings as the operators in add_primitive use
+    if shape == "cylinder":
+        radius = p_dic.get("radius", 1)
+        depth = p_dic.get("depth", 2)
+        vertices = p_dic.get("vertices", CYLINDER_VERTICES)
+    elif shape == "cone":
+        radius = 1
+        depth = 2
+        vertices = p_dic.get("vertices", CONE_VERTICES)
+    else:
+        radius = 1
+        depth = 2
+        vertices = 0
+    
+    if shared:
+        mesh = template_mesh(shape, radius, depth, vertices)
+    else:
+        verts, loop_totals, loop_vertices = primitive_geometry(shape, radius, depth, vertices)
+        mesh = mesh_from_arrays(p_dic["id"], verts, loop_totals, loop_vertices)
+    
+    obj = bpy.data.objects.new(p_dic["id"], mesh)
+    obj.location = loc
+    
+    if shared:
+        set_properties(obj, p_dic, False, scale, rot)
+        if material:
+            obj.material_slots[0].link = "OBJECT"
+            obj.material_slots[0].material = material
+    else:
+        set_properties(obj, p_dic, material, scale, rot)
+    return obj
+
+
+def template_mesh(shape, radius = 1, depth = 2, vertices = 0):
+    """
+    Return the shared mesh for a shape, make it if it doesn't exist yet. 
+    The mesh has one empty material slot, so that objects using it can have their own material. 
+    Meshes are remembered by name, so a removed mesh (or a reopened file) is just a miss. 
+    """
+    key = (shape, radius, depth, vertices)
+    
+    if key in mesh_templates and mesh_templates[key] in bpy.data.meshes:
+        mesh_template_stats["hits"] += 1
+        return bpy.data.meshes[mesh_templates[key]]
+    
+    mesh_template_stats["misses"] += 1
+    verts, loop_totals, loop_vertices = primitive_geometry(shape, radius, depth, vertices)
+    mesh = mesh_from_arrays("template_%s_%g_%g_%i" % key, verts, loop_totals, loop_vertices)
+    mesh.materials.append(None)
+    mesh_templates[key] = mesh.name
+    return mesh
+
+
+def mesh_cache_stats():
+    """
+    Print and return the number of hits and misses of template_mesh().
+    """
+    hits = mesh_template_stats["hits"]
+    misses = mesh_template_stats["misses"]
+    print("shared meshes: %i hits, %i misses, %i meshes" % (hits, misses, len(mesh_templates)))
+    return {"hits":hits, "misses":misses}
+
+
+def link_objects(objects):
+    """
+    Link a list of new objects to the scene, update the scene once and make the last object the active one (this is what boolean_modifier expects).
+    """
+    
+    # add to layer 0 - same as add_primitive
+    layers = [False] * 20
+    layers[0] = True
+
+    scene = bpy.context.scene
+    for obj in objects:
+        scene.objects.link(obj)
+        obj.layers = layers
+    if len(objects) > 0:
+        scene.objects.active = objects[-1]
+    scene.update()
+
+
+def remove_objects(names):
+    """
+    Unlink objects from the scene and remove them, and their meshes (or lamps) if nobody else uses them.
+    """
+    scene = bpy.context.scene
+    for n in names:
+        if n not in bpy.data.objects:
+            continue
+        obj = bpy.data.objects[n]
+        data = obj.data
+        if obj.name in scene.objects:
+            scene.objects.unlink(obj)
+        # groups are users as well (see instancing.py)
+        for group in obj.users_group:
+            group.objects.unlink(obj)
+        bpy.data.objects.remove(obj)
+        if data is None or data.users > 0:
+            continue
+        collection = data_collection(data)
+        if collection is not None:
+            collection.remove(data)
+
+
+def data_collection(data):
+    """
+    The collection in bpy.data that data (of an object) is in.
+    """
+    for collection in [bpy.data.meshes, bpy.data.lamps]:
+        if data.name in collection and collection[data.name] == data:
+            return collection
+    return None
+
+
+def primitive_geometry(shape, radius = 1, depth = 2, vertices = 32):
+    """
+    Vertices and faces for a primitive, centred on the origin, like the primitive_*_add operators make them. 
+    - cube and plane have size 2 (-1 to 1)
+    - cylinder has TRIFAN ends: a centre vertex with triangles
+    - cone has an n-gon as base and a point at the top
+    Returns the vertices (n x 3), the number of vertices per face and the (flat) vertex indices of the faces. 
+    """
+    
+    if shape == "plane":
+        verts = [(-1,-1,0), (1,-1,0), (1,1,0), (-1,1,0)]
+        faces = [(0,1,2,3)]
+    
+    elif shape == "cylinder" or shape == "cone":
+        # ring of vertices, counter clockwise seen from the top
+        phi = numpy.arange(vertices) * 2 * math.pi / vertices
+        ring = numpy.zeros((vertices, 3))
+        ring[:,0] = -radius * numpy.sin(phi)
+        ring[:,1] = radius * numpy.cos(phi)
+        ring[:,2] = -depth / 2
+        i = numpy.arange(vertices)
+        j = (i + 1) % vertices
+        
+        if shape == "cylinder":
+            top = ring.copy()
+            top[:,2] = depth / 2
+            # bottom ring, top ring, bottom centre, top centre
+            verts = numpy.vstack((ring, top, [(0,0,-depth/2), (0,0,depth/2)]))
+            bottom_centre = 2 * vertices
+            top_centre = 2 * vertices + 1
+            sides = numpy.column_stack((i, j, j + vertices, i + vertices))
+            bottom = numpy.column_stack((numpy.full(vertices, bottom_centre), j, i))
+            top = numpy.column_stack((numpy.full(vertices, top_centre), i + vertices, j + vertices))
+            loop_totals = numpy.array([4] * vertices + [3] * (2 * vertices), dtype = numpy.int32)
+            loop_vertices = numpy.concatenate((sides.ravel(), bottom.ravel(), top.ravel()))
+        else:
+            # ring and the point
+            verts = numpy.vstack((ring, [(0,0,depth/2)]))
+            sides = numpy.column_stack((i, j, numpy.full(vertices, vertices)))
+            loop_totals = numpy.array([3] * vertices + [vertices], dtype = numpy.int32)
+            loop_vertices = numpy.concatenate((sides.ravel(), i[::-1]))
+        
+        return numpy.asarray(verts, dtype = numpy.float32), loop_totals, numpy.asarray(loop_vertices, dtype = numpy.int32)
+    
+    else:
+        # cube
+        verts = [(1,1,-1), (1,-1,-1), (-1,-1,-1), (-1,1,-1), (1,1,1), (1,-1,1), (-1,-1,1), (-1,1,1)]
+        faces = [(0,1,2,3), (4,7,6,5), (0,4,5,1), (1,5,6,2), (2,6,7,3), (4,0,3,7)]
+
+    loop_totals = numpy.array([len(f) for f in faces], dtype = numpy.int32)
+    loop_vertices = numpy.array([v for f in faces for v in f], dtype = numpy.int32)
+    return numpy.array(verts, dtype = numpy.float32), loop_totals, loop_vertices
+
+
+def mesh_from_arrays(name, vertices, loop_totals, loop_vertices):
+    """
+    Make a new mesh from arrays with foreach_set. This is much faster than adding vertices and faces one by one.
+    - vertices: n x 3 coordinates
+    - loop_totals: the number of vertices of each face
+    - loop_vertices: the vertex indices of all faces after each other
+    """
+    loop_totals = numpy.asarray(loop_totals, dtype = numpy.int32)
+    loop_starts = numpy.cumsum(loop_totals, dtype = numpy.int32) - loop_totals
+    
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(vertices))
+    mesh.vertices.foreach_set("co", numpy.asarray(vertices, dtype = numpy.float32).ravel())
+    mesh.loops.add(len(loop_vertices))
+    mesh.loops.foreach_set("vertex_index", numpy.asarray(loop_vertices, dtype = numpy.int32))
+    mesh.polygons.add(len(loop_totals))
+    mesh.polygons.foreach_set("loop_start", loop_starts)
+    mesh.polygons.foreach_set("loop_total", loop_totals)
+    mesh.update(calc_edges = True)
+    return mesh
+
+
+def set_properties(obj, p_dic, material = False, scale = False, rot = False):
+    """
+    Name, material, scale and rotation for a new primitive. Used by add_primitive and new_primitive_object.
+    """
     
     # give object name
     obj.name = p_dic["id"]
@@ -197,31 +546,173 @@ def add_primitive(p_dic, material = False, loc = False, scale = False, rot = Fal
         obj.rotation_euler = p_dic["rot"]
         
 
-def boolean_modifier(name_list, operation = "UNION", hide_after_mod = True):
+def boolean_modifier(name_list, operation = "UNION", hide_after_mod = True, elements = None, rebuild = False, prune = False, method = "sequential"):
     """
     Take a list and do a boolean operation. This function is a bit fucked up, partially because of limitations of the Boolean operator in Blender but also because of my misunderstanding. 
     
     A boolean operator takes two objects A and B and takes the union, difference or intersect. This function ASSUMES that object A is already selected and is the last element in name_list. Objects B are the rest of the elements of the name_list. I guess there should be a better way...
         
     In other cases the result looks weird: faces are missing etc. I usually managed to solve it by changing the order of the elements (and thus changing the order of the Boolean operations). It is kind of reproducible in Blender itself, but I don't understand it.  
+    
+    The boolean operations are slow. If elements is given (the lists from construction.py that made the objects in name_list), the result is cached on disk (see cache.py). The next time the same elements are combined in the same order with the same operation, the result is loaded from the cache instead. For a difference, the meshes of the objects must be the same as well. Use rebuild = True to ignore the cache and do the operations again.
+    
+    With prune = True (only together with elements), objects that don't touch the target are left out of the boolean operations (see spatial.plan_booleans): for a union their mesh is just joined to the target, for a difference they are skipped. For a difference the meshes of the objects are used, not just their elements, because they can hold the result of an earlier union. 
+    
+    With method = "tree" a union is done as a balanced tree (see csg.py): the objects are combined in pairs, so most operations are on small meshes. The meshes of the objects change as well, so only together with hide_after_mod. Otherwise the objects are added one by one.
     """
     
     lastname = name_list[-1]
     names = name_list[:-1]
     
+    # the objects of a difference can be the result of a union, more than their element
+    meshes = None
+    if operation != "UNION" and elements is not None:
+        meshes = [mesh_to_arrays(bpy.data.objects[n].data) for n in name_list]
+    
+    # what to do with each object
+    plan = dict((n, "boolean") for n in names)
+    if prune and elements is not None:
+        vertices = None
+        if meshes is not None:
+            vertices = dict((n, m["vertices"]) for n, m in zip(name_list, meshes))
+        plan = spatial.plan_booleans(elements, name_list, operation, vertices = vertices)
+    
+    tree = method == "tree" and operation == "UNION" and hide_after_mod
+    
+    if elements is not None:
+        key = csg.boolean_key(elements, name_list, operation, prune, "tree" if tree else "sequential", meshes)
+        if not rebuild:
+            arrays = cache.load_arrays("boolean", key)
+            if arrays is not None:
+                replace_mesh(bpy.data.objects[lastname], arrays)
+                if hide_after_mod:
+                    for n in names:
+                        bpy.data.objects[n].hide_render = True
+                        bpy.data.objects[n].hide = True
+                return
+    
+    # the target may use a shared mesh (see template_mesh), give it its own copy before changing it
+    target = bpy.data.objects[lastname]
+    if target.data.users > 1:
+        target.data = target.data.copy()
+    
     for n in names:
-        # add modifier
-        bpy.ops.object.modifier_add(type="BOOLEAN")
-        # set the operation: "UNION", "DIFFERENCE" and ""
-        bpy.data.objects[lastname].modifiers["Boolean"].operation = operation
-        # set the object to work on
-        bpy.data.objects[lastname].modifiers["Boolean"].object = bpy.data.objects[n]
-        # apply the operation
-        bpy.ops.object.modifier_apply(apply_as="DATA", modifier="Boolean")
+        if plan[n] == "join":
+            by_id = dict((e["id"], e) for e in elements)
+            join_mesh(target, bpy.data.objects[n], by_id[lastname], by_id[n])
+        if plan[n] != "boolean" or tree:
+            if hide_after_mod:
+                bpy.data.objects[n].hide_render = True
+                bpy.data.objects[n].hide = True
+            continue
+        apply_boolean(target, bpy.data.objects[n], operation)
         # in some cases you want to hide the original
         if hide_after_mod:
             bpy.data.objects[n].hide_render = True
             bpy.data.objects[n].hide = True
+    
+    if tree:
+        boolean_tree([n for n in names if plan[n] == "boolean"] + [lastname])
+    
+    if elements is not None:
+        cache.save_arrays("boolean", key, **mesh_to_arrays(target.data))
+
+
+def apply_boolean(target, obj, operation = "UNION"):
+    """
+    One boolean operation: target becomes target (operation) obj. 
+    """
+    # the operators work on the active object
+    bpy.context.scene.objects.active = target
+    # add modifier
+    bpy.ops.object.modifier_add(type="BOOLEAN")
+    # set the operation: "UNION", "DIFFERENCE" and ""
+    target.modifiers["Boolean"].operation = operation
+    # set the object to work on
+    target.modifiers["Boolean"].object = obj
+    # apply the operation
+    bpy.ops.object.modifier_apply(apply_as="DATA", modifier="Boolean")
+
+
+def boolean_tree(name_list):
+    """
+    The union of the objects in name_list as a balanced tree (see csg.tree_pairs): the last object gets the result. The other objects are changed as well.
+    """
+    for level in csg.tree_pairs(len(name_list)):
+        for i, j in level:
+            obj = bpy.data.objects[name_list[i]]
+            # shared meshes (see template_mesh) can't be changed
+            if obj.data.users > 1:
+                obj.data = obj.data.copy()
+            apply_boolean(obj, bpy.data.objects[name_list[j]], "UNION")
+
+
+def join_mesh(target, obj, target_element, element):
+    """
+    Add the mesh of obj to the mesh of target, without a boolean operation, like Ctrl-J in Blender but obj stays. 
+    The elements (from construction.py) give the position of both. The new faces get the first material of target.
+    """
+    a = mesh_to_arrays(target.data)
+    b = mesh_to_arrays(obj.data)
+    
+    # from the mesh of obj to the world, and from there to the mesh of target
+    m = numpy.dot(numpy.linalg.inv(spatial.element_matrix(target_element)), spatial.element_matrix(element))
+    vertices = numpy.dot(b["vertices"], m[:3,:3].T) + m[:3,3]
+    
+    arrays = {
+        "vertices":numpy.concatenate((a["vertices"], vertices)), 
+        "loop_totals":numpy.concatenate((a["loop_totals"], b["loop_totals"])), 
+        "loop_vertices":numpy.concatenate((a["loop_vertices"], b["loop_vertices"] + len(a["vertices"]))), 
+        "material_index":numpy.concatenate((a["material_index"], numpy.zeros(len(b["loop_totals"]), dtype = numpy.int32))), 
+        "material_names":a["material_names"]
+    }
+    replace_mesh(target, arrays)
+
+
+def mesh_to_arrays(mesh):
+    """
+    The geometry of a mesh as numpy arrays, the opposite of mesh_from_arrays. 
+    The names of the materials and the material of each face are included, so that they can be restored as well.
+    """
+    vertices = numpy.zeros(len(mesh.vertices) * 3, dtype = numpy.float32)
+    mesh.vertices.foreach_get("co", vertices)
+    loop_totals = numpy.zeros(len(mesh.polygons), dtype = numpy.int32)
+    mesh.polygons.foreach_get("loop_total", loop_totals)
+    material_index = numpy.zeros(len(mesh.polygons), dtype = numpy.int32)
+    mesh.polygons.foreach_get("material_index", material_index)
+    loop_vertices = numpy.zeros(len(mesh.loops), dtype = numpy.int32)
+    mesh.loops.foreach_get("vertex_index", loop_vertices)
+    material_names = numpy.array([m.name if m is not None else "" for m in mesh.materials], dtype = str)
+    return {
+        "vertices":vertices.reshape((-1, 3)), 
+        "loop_totals":loop_totals, 
+        "loop_vertices":loop_vertices, 
+        "material_index":material_index, 
+        "material_names":material_names
+    }
+
+
+def replace_mesh(obj, arrays):
+    """
+    Give obj a new mesh made from arrays (see mesh_to_arrays). 
+    Materials are found by name. If a material doesn't exist (anymore), the material in the same slot of the old mesh is used.
+    """
+    old = obj.data
+    mesh = mesh_from_arrays(old.name, arrays["vertices"], arrays["loop_totals"], arrays["loop_vertices"])
+    
+    for i, name in enumerate(arrays["material_names"]):
+        if name in bpy.data.materials:
+            mesh.materials.append(bpy.data.materials[name])
+        elif i < len(old.materials):
+            mesh.materials.append(old.materials[i])
+        else:
+            mesh.materials.append(None)
+    if len(arrays["material_index"]) > 0:
+        mesh.polygons.foreach_set("material_index", arrays["material_index"])
+    
+    obj.data = mesh
+    if old.users == 0:
+        bpy.data.meshes.remove(old)
 
 
 def location_camera(camera):
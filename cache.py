@@ -0,0 +1,200 @@
+"""
+Cache on disk for results that take a long time to make, like boolean operations.
+The files are content-addressed: the name of a file is a hash of everything that went into the result. If the input changes, the hash changes and the old file is not used anymore. Old files are removed when the cache gets too big, the least recently used first.
+
+Each kind of result has its own folder in cache_dir, for example cache_dir/boolean/.
+The results are saved as numpy arrays (.npz), so they are compact and fast to load. Big arrays that are used as they are (like protein meshes) can be saved as raw binary files (.bin) instead, these are memory-mapped when loaded, so nothing is read until it is used.
+
+Copyright Robbert Bloem, 2013
+"""
+
+import hashlib
+import json
+import os
+import struct
+
+import numpy
+
+
+# where the cache lives, run.py puts it next to the Blender file
+cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+
+# maximum size of the files of one kind, in bytes
+max_bytes = 500 * 1024 * 1024
+
+# first bytes of a raw file, see save_raw
+RAW_MAGIC = b"BDRAW1\n"
+
+
+def make_key(*parts):
+    """
+    Hash of the parts. The parts can be anything that json can handle: lists, tuples, dictionaries, strings and numbers.
+    Dictionaries are sorted, so the order of the keys does not matter. The order of lists does.
+    """
+    s = json.dumps(parts, sort_keys = True, separators = (",", ":"))
+    return hashlib.sha1(s.encode("utf-8")).hexdigest()
+
+
+def arrays_key(*dictionaries):
+    """
+    Hash of dictionaries with numpy arrays, like the meshes of build.mesh_to_arrays. The names, the shapes, the types and the values count.
+    """
+    h = hashlib.sha1()
+    for arrays in dictionaries:
+        for name in sorted(arrays):
+            a = numpy.ascontiguousarray(arrays[name])
+            h.update(("%s %s %s;" % (name, a.dtype.str, a.shape)).encode("utf-8"))
+            h.update(a.tobytes())
+    return h.hexdigest()
+
+
+def kind_dir(kind):
+    """
+    The folder for a kind of result. It is made if it doesn't exist.
+    """
+    d = os.path.join(cache_dir, kind)
+    if not os.path.isdir(d):
+        os.makedirs(d)
+    return d
+
+
+def file_path(kind, key, extension = ".npz"):
+    return os.path.join(kind_dir(kind), key + extension)
+
+
+def save_arrays(kind, key, max_size = None, **arrays):
+    """
+    Save numpy arrays under a key. The file is first written under a temporary name, so that an interrupted run doesn't leave a broken file.
+    Afterwards the folder of kind is kept below max_size bytes (see evict).
+    """
+    path = file_path(kind, key)
+    temp = path + ".tmp.npz"
+    numpy.savez(temp, **arrays)
+    os.replace(temp, path)
+    evict(kind, max_size)
+    return path
+
+
+def load_arrays(kind, key):
+    """
+    Load the arrays saved under key. Returns None if there is nothing (a miss).
+    """
+    path = file_path(kind, key)
+    if not os.path.exists(path):
+        return None
+    # mark as used, evict() removes the least recently used files first
+    os.utime(path, None)
+    with numpy.load(path) as f:
+        return dict(f)
+
+
+def save_raw(kind, key, max_size = None, **arrays):
+    """
+    Save numpy arrays in one raw binary file: a small header that describes the arrays, then the data of each array.
+    Use map_raw to load them. Afterwards the folder of kind is kept below max_size bytes (see evict).
+    """
+    # find where each array goes, aligned at 16 bytes
+    header = {"arrays":[]}
+    offset = 0
+    for name in sorted(arrays):
+        a = numpy.ascontiguousarray(arrays[name])
+        arrays[name] = a
+        header["arrays"] += [{"name":name, "dtype":a.dtype.str, "shape":list(a.shape), "offset":offset}]
+        offset += (a.nbytes + 15) // 16 * 16
+    header = json.dumps(header).encode("utf-8")
+
+    path = file_path(kind, key, ".bin")
+    temp = path + ".tmp"
+    with open(temp, "wb") as f:
+        f.write(RAW_MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        # the data starts at a multiple of 16
+        start = f.tell()
+        f.write(b"\0" * ((16 - start % 16) % 16))
+        start = f.tell()
+        for a in header_arrays(header):
+            f.seek(start + a["offset"])
+            f.write(arrays[a["name"]].tobytes())
+    os.replace(temp, path)
+    evict(kind, max_size)
+    return path
+
+
+def map_raw(kind, key):
+    """
+    Memory-map the arrays saved with save_raw. Returns None if there is nothing (a miss).
+    The arrays are read-only.
+    """
+    path = file_path(kind, key, ".bin")
+    if not os.path.exists(path):
+        return None
+    os.utime(path, None)
+
+    with open(path, "rb") as f:
+        if f.read(len(RAW_MAGIC)) != RAW_MAGIC:
+            return None
+        n = struct.unpack("<I", f.read(4))[0]
+        header = f.read(n)
+        start = f.tell()
+        start += (16 - start % 16) % 16
+
+    arrays = {}
+    for a in header_arrays(header):
+        dtype = numpy.dtype(a["dtype"])
+        count = int(numpy.prod(a["shape"]))
+        if count == 0:
+            arrays[a["name"]] = numpy.zeros(a["shape"], dtype = dtype)
+        else:
+            arrays[a["name"]] = numpy.memmap(path, dtype = dtype, mode = "r", offset = start + a["offset"], shape = tuple(a["shape"]))
+    return arrays
+
+
+def header_arrays(header):
+    return json.loads(header.decode("utf-8"))["arrays"]
+
+
+def file_hash(filename, chunk_size = 1024 * 1024):
+    """
+    sha1 of the contents of a file.
+    """
+    h = hashlib.sha1()
+    with open(filename, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def evict(kind, max_size = None):
+    """
+    Remove the least recently used files of kind until the total size is below max_size (default: max_bytes).
+    Returns the number of removed files.
+    """
+    if max_size is None:
+        max_size = max_bytes
+    d = kind_dir(kind)
+    files = []
+    for name in os.listdir(d):
+        path = os.path.join(d, name)
+        if os.path.isfile(path):
+            files += [(os.path.getmtime(path), os.path.getsize(path), path)]
+
+    total = sum(f[1] for f in files)
+    removed = 0
+    for mtime, size, path in sorted(files):
+        if total <= max_size:
+            break
+        os.remove(path)
+        total -= size
+        removed += 1
+    return removed
+
+
+def clear(kind):
+    """
+    Remove all files of kind.
+    """
+    return evict(kind, max_size = -1)
@@ -9,6 +9,8 @@ Copyright Robbert Bloem, 2013
 
 import math
 
+import optics
+
 def deg2rad(deg):
     """
     Function to convert degrees to radians
@@ -16,12 +18,12 @@ def deg2rad(deg):
     return (deg / 180) * math.pi
 
 
-def define_laser(focus_location, plot_loc):
+def define_laser(focus_location, plot_loc, targets = None, mirrors = ()):
     """
     Defines the laser beams. 
     - The beams focus at focus_location. One beam will end at plot_loc. The other beams will be calculated from that, separated by diff. 
     - Normally, the beams would be just long enough to go from focus_location to plot_loc, this can be extended by factor. 
-    - pulse2out will go to the plot. To make sure it doesn't extend to far, the factor is removed. Then, to make sure it does reach the plot, it is extended by 1.15
+    - pulse2out will go to the plot. With targets (the elements of the plot, see optics.py), it ends exactly where it hits them. The elements with an id in mirrors (also in targets) reflect it: pulse2out then ends on the mirror, and each part after a reflection is an extra beam, pulse2out_r1, pulse2out_r2 etc., with a start. Without targets, the factor is removed, and to make sure it does reach the plot, it is extended by 1.15
     - some pulses are commented out
     
     """
@@ -53,9 +55,38 @@ def define_laser(focus_location, plot_loc):
 #        {"id":"pulse3out", "loc":(flx + dx2, fly + dy, flz + dz1), "mat":"out"},
 #        {"id":"pulse4out", "loc":(flx + dx2, fly + dy, flz + dz2), "mat":"out"},        
     ]
+
+    # the outgoing beams end where they hit the targets, after the mirrors
+    if targets is not None:
+        out = [l for l in laser if l["mat"] == "out"]
+        directions = [[l["loc"][i] - focus_location[i] for i in range(3)] for l in out]
+        result = optics.trace([focus_location] * len(out), directions, optics.surfaces(targets, mirrors))
+        by_id = dict((l["id"], l) for l in out)
+        for segment in optics.beam_segments(result, [l["id"] for l in out]):
+            if segment["bounce"] == 0:
+                beam = by_id[segment["id"]]
+                # a beam that hits nothing keeps its length
+                if result["surface"][out.index(beam)] >= 0:
+                    beam["loc"] = segment["end"]
+            else:
+                laser.append({"id":segment["id"], "start":segment["start"], "loc":segment["end"], "mat":"out"})
     return laser   
 
  
+def define_grid(nx, ny, spacing):
+    """
+    Where the copies of the sample holder go: a grid of nx by ny, spacing (x, y) apart. 
+    The first place (0, 0) is the holder itself, so it is not in the list.
+    """
+    grid = []
+    for j in range(ny):
+        for i in range(nx):
+            if i == 0 and j == 0:
+                continue
+            grid.append({"id":"holder_%d_%d" % (i, j), "loc":(i * spacing[0], j * spacing[1], 0)})
+    return grid
+
+
 def define_laser_focus(focus_location):
     """
     Set the location of the focus. 
@@ -0,0 +1,214 @@
+"""
+Faster boolean operations: as a balanced tree, and at the same time in separate Blenders.
+
+build.boolean_modifier normally adds the objects to the target one by one (method "sequential"): the target gets bigger with every step, so every next operation is slower. With method "tree", the objects of a union are combined in pairs first, then the pairs in pairs, and so on, until the last one is combined with the target. Most operations are then done on small meshes. A difference or an intersection is always sequential.
+
+Boolean operations that don't depend on each other, like the unions of the block and of the green channel, can be done at the same time. prefill starts a background Blender for each of them (a worker), that builds only those elements, does the boolean operations and saves the result in the boolean cache (see cache.py). Building the scene afterwards just loads the results. Results that are already in the cache are not made again. run.py does this with flag_parallel_booleans.
+
+The method is part of the key of the cache, because the meshes are not exactly the same. A difference after a union (the blue channel) has the meshes of its objects in the key, so its result changes with the method of the union as well.
+
+Usage outside Blender, to compare the methods, one after the other and at the same time, for define_block and define_green_channel:
+python csg.py --blender /Applications/blender.app/Contents/MacOS/blender
+
+Copyright Robbert Bloem, 2013
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+# blender -P doesn't add the folder of this file to the path, the other modules are there (see workers.py)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import cache
+import spec
+import workers
+
+try:
+    import bpy
+except ImportError:
+    # the driver runs outside of Blender
+    bpy = None
+
+
+METHODS = ["sequential", "tree"]
+
+# the parts with a union that doesn't depend on other parts, with the function in materials.py that makes their material
+INDEPENDENT_PARTS = [("block", "material_block"), ("green_channel", "material_green_water")]
+
+
+def boolean_key(elements, name_list, operation, prune = False, method = "sequential", meshes = None):
+    """
+    The key of a boolean result in the cache (see build.boolean_modifier). Without prune and with the sequential method, it is the key it always was.
+    meshes are the meshes of the objects (see build.mesh_to_arrays). The objects of a difference can be the result of a union, made with another method, so their meshes are part of the key.
+    """
+    options = []
+    if prune:
+        options.append("prune")
+    if method != "sequential":
+        options.append(method)
+    if meshes is not None:
+        options.append(cache.arrays_key(*meshes))
+    return cache.make_key("boolean", elements, name_list, operation, *options)
+
+
+def tree_pairs(n):
+    """
+    The order of a balanced tree for n objects, the last one is the target. Returns a list of levels, each a list of (target, object) pairs of indices: object is combined into target.
+    """
+    levels = []
+    current = list(range(n))
+    while len(current) > 1:
+        pairs = []
+        following = []
+        for i in range(0, len(current) - 1, 2):
+            # the right one stays, so the target (the last) ends up with everything
+            pairs.append((current[i+1], current[i]))
+            following.append(current[i+1])
+        if len(current) % 2 == 1:
+            following.append(current[-1])
+        levels.append(pairs)
+        current = following
+    return levels
+
+
+def holder_jobs(parts, method = "sequential", prune = False):
+    """
+    The unions of the parts that don't depend on each other (INDEPENDENT_PARTS), as jobs for a worker.
+    """
+    jobs = []
+    for name, material in INDEPENDENT_PARTS:
+        elements = parts[name]
+        jobs.append({
+            "name":name,
+            "material":material,
+            "elements":elements,
+            "name_list":[e["id"] for e in elements],
+            "operation":"UNION",
+            "prune":prune,
+            "method":method
+        })
+    return jobs
+
+
+def is_cached(job):
+    key = boolean_key(job["elements"], job["name_list"], job["operation"], job["prune"], job["method"])
+    return os.path.exists(cache.file_path("boolean", key))
+
+
+def run_worker(blender, blend_file, job, folder, rebuild = False):
+    """
+    Do the boolean operations of one job in a background Blender. Returns the timings: the total time, and the time of the boolean operations in the worker.
+    """
+    job = dict(job, rebuild = rebuild)
+    job_file = os.path.join(folder, "%s_%s.json" % (job["name"], job["method"]))
+    with open(job_file, "w") as f:
+        json.dump(job, f)
+    returncode, total = workers.run_blender(
+        [blender, "-b", blend_file, "-P", os.path.join(workers.package_dir, "csg.py"), "--", "--worker", job_file],
+        job_file[:-len(".json")] + ".log"
+    )
+    timing = {"name":job["name"], "method":job["method"], "returncode":returncode, "total":total}
+    result_file = job_file[:-len(".json")] + "_result.json"
+    if os.path.exists(result_file):
+        with open(result_file) as f:
+            timing.update(json.load(f))
+    return timing
+
+
+def run_jobs(jobs, blender, blend_file, folder, parallel = True, rebuild = False):
+    """
+    Run the jobs, all at the same time or one after the other. Returns the time it took and the timings of the jobs.
+    """
+    t = time.time()
+    timings = workers.run_all(run_worker, [(blender, blend_file, job, folder, rebuild) for job in jobs], len(jobs) if parallel else 1)
+    return time.time() - t, timings
+
+
+def prefill(jobs, blender, blend_file):
+    """
+    Put the results of the jobs in the boolean cache, with a background Blender for each job at the same time. Jobs that are cached already are skipped.
+    """
+    jobs = [job for job in jobs if not is_cached(job)]
+    if len(jobs) == 0:
+        return
+    if not blend_file:
+        print("csg: the Blender file is not saved, the workers can't open it")
+        return
+    folder = tempfile.mkdtemp(prefix = "csg_")
+    wall, timings = run_jobs(jobs, blender, blend_file, folder)
+    for timing in timings:
+        if timing["returncode"] != 0:
+            print("csg: %s failed, see %s" % (timing["name"], folder))
+    print("csg: %s in %.1f s, at the same time" % (", ".join(job["name"] for job in jobs), wall))
+
+
+def report(jobs, blender, blend_file):
+    """
+    Compare sequential and tree, and one after the other with at the same time. The cache is not used.
+    """
+    folder = tempfile.mkdtemp(prefix = "csg_")
+    results = {}
+    for method in METHODS:
+        method_jobs = [dict(job, method = method) for job in jobs]
+        results[method, "serial"] = run_jobs(method_jobs, blender, blend_file, folder, parallel = False, rebuild = True)
+        results[method, "parallel"] = run_jobs(method_jobs, blender, blend_file, folder, parallel = True, rebuild = True)
+
+    print("%-12s %-10s %10s %10s   %s" % ("method", "order", "wall (s)", "speedup", "boolean time per part (s)"))
+    base = results["sequential", "serial"][0]
+    for method in METHODS:
+        for order in ["serial", "parallel"]:
+            wall, timings = results[method, order]
+            parts = ", ".join("%s %.2f" % (x["name"], x.get("boolean", float("nan"))) for x in timings)
+            print("%-12s %-10s %10.2f %9.2fx   %s" % (method, order, wall, base / wall, parts))
+    return results
+
+
+def worker(job_file):
+    """
+    Runs inside the background Blender: build the elements of the job and do the boolean operations, the result goes into the cache.
+    """
+    sys.path.append(os.path.dirname(bpy.data.filepath))
+    import build
+    import materials
+    cache.cache_dir = os.path.join(os.path.dirname(bpy.data.filepath), "cache")
+    with open(job_file) as f:
+        job = json.load(f)
+
+    # objects of an earlier run in the Blender file
+    build.remove_objects(job["name_list"])
+    # the same material as in run.py, the cached mesh refers to it by name
+    material = getattr(materials, job["material"])()
+    build.add_primitives(job["elements"], material, bulk = True, shared = True)
+    t = time.time()
+    build.boolean_modifier(job["name_list"], job["operation"], True, job["elements"], job["rebuild"], job["prune"], job["method"])
+    boolean_time = time.time() - t
+
+    target = bpy.data.objects[job["name_list"][-1]]
+    with open(job_file[:-len(".json")] + "_result.json", "w") as f:
+        json.dump({"boolean":boolean_time, "faces":len(target.data.polygons)}, f)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description = "Compare the boolean methods for the sample holder, in separate Blenders.")
+    parser.add_argument("--blender", default = "blender", help = "the Blender executable")
+    parser.add_argument("--blend-file", default = None, help = "the Blender file, default blender.blend next to this file")
+    parser.add_argument("--worker", default = None, help = argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker is not None:
+        worker(args.worker)
+        return
+
+    blend_file = os.path.abspath(args.blend_file or os.path.join(workers.package_dir, "blender.blend"))
+    cache.cache_dir = os.path.join(os.path.dirname(blend_file), "cache")
+    settings = spec.run_settings()
+    jobs = holder_jobs(spec.make_spec(settings)["parts"], prune = settings["flag_prune_booleans"])
+    report(jobs, args.blender, blend_file)
+
+
+if __name__ == "__main__":
+    main(workers.script_args(sys.argv))
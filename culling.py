@@ -0,0 +1,122 @@
+"""
+Which elements does the camera see? Culling with the scene spec, before anything is built, without Blender.
+
+Each element gets a bounding sphere, from its shape, radius, depth, loc, scale and rot. The sphere is tested against the view of the camera from construction.define_camera (see view.py): the four sides of the picture, and the clip distances (clip_end of the camera, and the clip start of Blender). An element is outside the view if its sphere is completely outside one of these.
+
+What happens with elements outside the view (cull):
+- "skip": they are not built at all. This is the fastest, but they are also gone from reflections (the mirror) and shadows.
+- "placeholder": they are built, but cheap: cylinders and cones get the lowest number of vertices. Reflections and shadows stay almost the same.
+
+Only elements with a shape are culled. Proteins (their size is only known after reading them), lamps and the camera are always kept. Elements in boolean operations are not culled either: leaving out an operand, or giving it fewer vertices, changes the result. Operands that are hidden after the boolean operation (hide_after_mod in build.boolean_modifier) are not rendered at all, so they don't count for the render time (see presets.describe).
+
+Copyright Robbert Bloem, 2013
+"""
+
+import numpy
+
+import tessellation
+import view
+
+
+# the clip start of the Blender camera, the spec only has clip_end
+CLIP_START = 0.1
+
+# the clip end of the Blender camera if the spec doesn't have one
+CLIP_END = 100
+
+# the spheres are made this much (a fraction) bigger, to be sure
+MARGIN = 0.1
+
+# what happens with elements outside the view
+MODES = ["skip", "placeholder"]
+
+
+def half_size(e):
+    """
+    Half the size of the shape, before scaling and rotating. None if the shape is unknown.
+    """
+    shape = e.get("shape")
+    if shape == "cube":
+        return (1, 1, 1)
+    if shape == "plane":
+        return (1, 1, 0)
+    if shape in ("cylinder", "cone"):
+        radius = e.get("radius", 1)
+        return (radius, radius, e.get("depth", tessellation.DEFAULT_DEPTH) / 2)
+    return None
+
+
+def bounding_spheres(elements):
+    """
+    The centres and radii of the bounding spheres of elements with a known shape.
+    Returns the indices of these elements, the centres and the radii.
+    """
+    indices = []
+    centres = []
+    radii = []
+    for i, e in enumerate(elements):
+        h = half_size(e)
+        if h is None:
+            continue
+        corners = [[-x for x in h], h]
+        centre, radius = view.bounding_sphere(corners, e["loc"], e.get("scale", (1,1,1)), e.get("rot", (0,0,0)))
+        indices.append(i)
+        centres.append(centre)
+        radii.append(radius)
+    return indices, numpy.array(centres).reshape((-1, 3)), numpy.array(radii)
+
+
+def in_view(centres, radii, camera, resolution, margin = MARGIN):
+    """
+    Which spheres are (partly) in the view of the camera. Returns an array of booleans.
+    """
+    c = view.camera_settings(camera)
+    p = view.to_camera_space(centres, camera)
+    radii = numpy.asarray(radii, dtype = float) * (1 + margin)
+    width, height = view.render_size(resolution)
+    f = view.focal_pixels(camera, resolution)
+
+    # the distance of the centres outside each side of the view, the camera looks along -z
+    x, y, z = p[:,0], p[:,1], p[:,2]
+    tx = width / 2 / f
+    ty = height / 2 / f
+    outside = numpy.array([
+        (x + tx * z) / numpy.sqrt(1 + tx**2),
+        (-x + tx * z) / numpy.sqrt(1 + tx**2),
+        (y + ty * z) / numpy.sqrt(1 + ty**2),
+        (-y + ty * z) / numpy.sqrt(1 + ty**2),
+        z + CLIP_START,
+        -z - c.get("clip_end", CLIP_END),
+    ])
+    return numpy.all(outside <= radii, axis = 0)
+
+
+def placeholder(e):
+    """
+    A cheap copy of an element.
+    """
+    e = dict(e)
+    if e.get("shape") in ("cylinder", "cone"):
+        e["vertices"] = tessellation.MIN_VERTICES
+    return e
+
+
+def cull(elements, camera, resolution, mode = "skip", margin = MARGIN):
+    """
+    The elements to build, and the ids of the elements that are outside the view. mode is "skip" or "placeholder" (see above).
+    """
+    if mode not in MODES:
+        raise ValueError("unknown culling mode '%s', use one of %s" % (mode, ", ".join(MODES)))
+    indices, centres, radii = bounding_spheres(elements)
+    if len(indices) == 0:
+        return elements, []
+
+    visible = in_view(centres, radii, camera, resolution, margin)
+    hidden = set(i for i, v in zip(indices, visible) if not v)
+    result = []
+    for i, e in enumerate(elements):
+        if i not in hidden:
+            result.append(e)
+        elif mode == "placeholder":
+            result.append(placeholder(e))
+    return result, [elements[i]["id"] for i in sorted(hidden)]
@@ -0,0 +1,345 @@
+"""
+Incremental mode: only change what changed since the last run.
+
+Normally, the Blender file is opened again and everything is built from scratch (see the readme). In incremental mode, you just run master.py again in the same file. The elements (the lists with dictionaries from construction.py) of the last run are kept in the scene, and they are compared to the new ones, by id:
+- new elements are made
+- elements that are gone are removed
+- elements that only moved (loc, rot, scale) are moved
+- other changes: the element is removed and made again
+- if only the material changed, the material is changed
+Parts with boolean operations are groups: if anything in the group changes (or in a group it depends on), the whole group is made again. Parts of the scene that are not built anymore (for example the mirror when you switch to the plane) are removed.
+A stage is also made again when a module that builds it changed (see reloader.STAGE_MODULES), for example build.py, but not materials.py.
+
+The functions here are also used when incremental mode is off, then they just build everything. The time each stage takes is kept in timings (see benchmark.py).
+
+Copyright Robbert Bloem, 2013
+"""
+
+import functools
+import json
+import time
+
+import bpy
+
+import animation
+import build
+import instancing
+import reloader
+
+
+# incremental mode on or off, set with begin()
+enabled = False
+
+# the state of the last run and of this run, per stage
+# a stage is a part of the scene, like 'block' or 'lamps'
+old_state = {}
+new_state = {}
+
+# the stages that changed during this run
+changed = set()
+
+# the time each stage took during this run, in seconds
+timings = {}
+
+# the name of the custom property of the scene with the state
+STATE_PROPERTY = "incremental_state"
+
+# changing these keys only moves the object
+TRANSFORM_KEYS = ["loc", "rot", "scale"]
+
+
+def begin(incremental = True):
+    """
+    Start a run. Reads the state of the last run from the scene.
+    """
+    global enabled, old_state, new_state, changed, timings
+    enabled = incremental
+    new_state = {}
+    changed = set()
+    timings = {}
+    old_state = {}
+    if enabled and STATE_PROPERTY in bpy.context.scene:
+        old_state = json.loads(bpy.context.scene[STATE_PROPERTY])
+
+
+def end():
+    """
+    Finish a run: remove the stages that were not built this time, and save the state in the scene.
+    Returns the stages that changed.
+    """
+    if not enabled:
+        return changed
+    for stage in old_state:
+        if stage not in new_state:
+            build.remove_objects(old_state[stage]["objects"])
+            changed.add(stage)
+    bpy.context.scene[STATE_PROPERTY] = json.dumps(new_state)
+    print("incremental: changed %s" % (", ".join(sorted(changed)) if changed else "nothing"))
+    return changed
+
+
+def previous_vertices():
+    """
+    The 'vertices' of the elements of the last run, by id (see tessellation.adapt).
+    """
+    result = {}
+    for stage in old_state.values():
+        for e in stage.get("elements", []):
+            if isinstance(e, dict) and "id" in e and "vertices" in e:
+                result[e["id"]] = e["vertices"]
+    return result
+
+
+def normalize(x):
+    """
+    The same thing as json would give it back: tuples become lists etc. Used to compare specs.
+    """
+    return json.loads(json.dumps(x))
+
+
+def material_name(material):
+    if material:
+        return material.name
+    return None
+
+
+def code_changed(old, spec):
+    """
+    Did a module that builds the stage change since the last run? See reloader.stage_code.
+    """
+    return old is not None and old.get("code") != spec["code"]
+
+
+def objects_exist(names):
+    return all(n in bpy.data.objects for n in names)
+
+
+def timed(f):
+    """
+    Decorator for the functions that build a stage: the time is added to timings.
+    """
+    @functools.wraps(f)
+    def wrapper(stage, *args, **kwargs):
+        t = time.time()
+        result = f(stage, *args, **kwargs)
+        timings[stage] = timings.get(stage, 0) + time.time() - t
+        return result
+    return wrapper
+
+
+@timed
+def primitives(stage, elements, material = False, bulk = False, shared = False, booleans = None, depends = ()):
+    """
+    Build the elements of a stage with build.add_primitives.
+
+    booleans is a list of boolean operations, done after building. Each is a dictionary with the arguments of build.boolean_modifier (name_list, operation, hide_after_mod, elements, rebuild). Without name_list, the names of this stage are used.
+    depends: stages that this stage uses, for example for boolean operations with their objects. If one of these changed, this stage is built again.
+    Returns the names of the elements.
+    """
+    names = [e["id"] for e in elements]
+    if booleans is None:
+        booleans = []
+
+    spec = {
+        "elements":normalize(elements),
+        "material":material_name(material),
+        "booleans":normalize([dict((k, v) for k, v in b.items() if k != "rebuild") for b in booleans]),
+        "objects":names,
+        "code":reloader.stage_code("primitives")
+    }
+    old = old_state.get(stage)
+    new_state[stage] = spec
+
+    # a group with boolean operations: all or nothing
+    if len(booleans) > 0:
+        if enabled and old is not None and old["elements"] == spec["elements"] and old["booleans"] == spec["booleans"] and not code_changed(old, spec) and objects_exist(names) and not any(d in changed for d in depends):
+            if old["material"] != spec["material"]:
+                set_material(names, material)
+                changed.add(stage)
+            return names
+        if old is not None:
+            build.remove_objects(old["objects"])
+        changed.add(stage)
+        build.add_primitives(elements, material, bulk = bulk, shared = shared)
+        for b in booleans:
+            b = dict(b)
+            name_list = b.pop("name_list", names)
+            build.boolean_modifier(name_list, **b)
+        return names
+
+    if not enabled or old is None or code_changed(old, spec):
+        if old is not None:
+            build.remove_objects(old["objects"])
+        changed.add(stage)
+        build.add_primitives(elements, material, bulk = bulk, shared = shared)
+        return names
+
+    # element by element
+    old_elements = dict((e["id"], e) for e in old["elements"])
+    new_ids = set(names)
+    remove = [n for n in old["objects"] if n not in new_ids]
+    make = []
+    for e, n in zip(spec["elements"], elements):
+        o = old_elements.get(e["id"])
+        if o is None or e["id"] not in bpy.data.objects:
+            make += [n]
+        elif o != e:
+            if only_transform_changed(o, e):
+                set_transform(bpy.data.objects[e["id"]], n)
+            else:
+                remove += [e["id"]]
+                make += [n]
+
+    if len(remove) > 0:
+        build.remove_objects(remove)
+    if len(make) > 0:
+        build.add_primitives(make, material, bulk = bulk, shared = shared)
+
+    material_changed = old["material"] != spec["material"]
+    if material_changed:
+        set_material([n for n in names if n not in [m["id"] for m in make]], material)
+
+    if len(remove) > 0 or len(make) > 0 or material_changed or old["elements"] != spec["elements"]:
+        changed.add(stage)
+    return names
+
+
+def only_transform_changed(old, new):
+    keys = set(old) | set(new)
+    return all(old.get(k) == new.get(k) for k in keys if k not in TRANSFORM_KEYS)
+
+
+def set_transform(obj, element):
+    """
+    Move an object to the loc, rot and scale of element. Missing rot and scale are the defaults.
+    """
+    obj.location = element["loc"]
+    obj.rotation_euler = element.get("rot", (0,0,0))
+    obj.scale = element.get("scale", (1,1,1))
+
+
+def set_material(names, material):
+    for n in names:
+        if n in bpy.data.objects:
+            bpy.data.objects[n].active_material = material
+
+
+@timed
+def proteins(stage, proteins, **kwargs):
+    """
+    Build proteins with build.make_proteins. The keyword arguments are passed on.
+    Proteins that only moved are moved, the others are read again.
+    """
+    spec = {"elements":normalize(proteins), "options":normalize(kwargs), "objects":[p["id"] for p in proteins], "code":reloader.stage_code("proteins")}
+    old = old_state.get(stage)
+    new_state[stage] = spec
+
+    if not enabled or old is None or old["options"] != spec["options"] or code_changed(old, spec):
+        if old is not None:
+            build.remove_objects(old["objects"])
+        changed.add(stage)
+        build.make_proteins(proteins, **kwargs)
+        return
+
+    old_elements = dict((p["id"], p) for p in old["elements"])
+    remove = [n for n in old["objects"] if n not in spec["objects"]]
+    make = []
+    for e, p in zip(spec["elements"], proteins):
+        o = old_elements.get(e["id"])
+        if o is None or e["id"] not in bpy.data.objects:
+            make += [p]
+        elif o != e:
+            if only_transform_changed(o, e):
+                set_transform(bpy.data.objects[e["id"]], p)
+            else:
+                remove += [e["id"]]
+                make += [p]
+
+    if len(remove) > 0:
+        build.remove_objects(remove)
+    if len(make) > 0:
+        build.make_proteins(make, **kwargs)
+    if len(remove) > 0 or len(make) > 0 or old["elements"] != spec["elements"]:
+        changed.add(stage)
+
+
+@timed
+def camera(stage, camera):
+    """
+    Set the camera with build.location_camera. This is fast, so it is always done.
+    """
+    new_state[stage] = {"elements":normalize(camera), "objects":[], "code":reloader.stage_code("camera")}
+    if old_state.get(stage) != new_state[stage]:
+        changed.add(stage)
+    build.location_camera(camera)
+
+
+@timed
+def lamps(stage, lamps):
+    """
+    Build lamps with build.make_lamps. Lamps that changed are made again, that is fast enough.
+    """
+    spec = {"elements":normalize(lamps), "objects":[l["id"] for l in lamps], "code":reloader.stage_code("lamps")}
+    old = old_state.get(stage)
+    new_state[stage] = spec
+
+    if not enabled or old is None or code_changed(old, spec):
+        if old is not None:
+            build.remove_objects(old["objects"])
+        changed.add(stage)
+        build.make_lamps(lamps)
+        return
+
+    old_elements = dict((l["id"], l) for l in old["elements"])
+    remove = [n for n in old["objects"] if n not in spec["objects"]]
+    make = []
+    for e, l in zip(spec["elements"], lamps):
+        if old_elements.get(e["id"]) != e or e["id"] not in bpy.data.objects:
+            remove += [e["id"]]
+            make += [l]
+
+    if len(remove) > 0:
+        build.remove_objects(remove)
+        changed.add(stage)
+    if len(make) > 0:
+        build.make_lamps(make)
+        changed.add(stage)
+
+
+@timed
+def pulses(stage, laser, laser_focus, **kwargs):
+    """
+    Make and animate the laser pulses with animation.animate_pulses. The keyword arguments are passed on.
+    If anything changed, all pulses are made again.
+    """
+    names = animation.pulse_names(laser, kwargs.get("pulses_per_beam", 1))
+    spec = {"elements":normalize(laser + laser_focus), "options":normalize(kwargs), "objects":names, "code":reloader.stage_code("pulses")}
+    old = old_state.get(stage)
+    new_state[stage] = spec
+
+    if enabled and old == spec and objects_exist(names):
+        return names
+    if old is not None:
+        animation.remove_pulses(old["objects"])
+    changed.add(stage)
+    return animation.animate_pulses(laser, laser_focus, **kwargs)
+
+
+@timed
+def instances(stage, names, transforms, method = "group", depends = ()):
+    """
+    Make copies of the objects called names at transforms with instancing.make_copies.
+    If anything changed (or in a stage it depends on, the stages of the objects), all copies are made again.
+    """
+    spec = {"elements":normalize(transforms), "options":{"names":names, "method":method}, "code":reloader.stage_code("instances")}
+    old = old_state.get(stage)
+
+    if enabled and old is not None and old["elements"] == spec["elements"] and old["options"] == spec["options"] and not code_changed(old, spec) and objects_exist(old["objects"]) and not any(d in changed for d in depends):
+        new_state[stage] = old
+        return old["objects"]
+    if old is not None:
+        build.remove_objects(old["objects"])
+    changed.add(stage)
+    spec["objects"] = instancing.make_copies(stage, names, transforms, method)
+    new_state[stage] = spec
+    return spec["objects"]
@@ -0,0 +1,86 @@
+"""
+Copies of an assembly: a part of the scene that is built (and boolean-combined) once, and then shown many times, like a grid of sample holders with their proteins.
+
+The copies are not built again. There are two ways to make them (method):
+- "group": the objects of the assembly are put in a group, and each copy is an empty that shows the group (dupli_type GROUP). A copy is just one empty, whatever the size of the assembly.
+- "linked": each copy is an empty with a linked duplicate of each object of the assembly as children. The duplicates share the meshes of the originals, like Alt-D in Blender. They can be changed one by one (material etc), but there is an object for each object of each copy.
+
+The assembly itself stays where it is, the copies are placed relative to it with the transforms: dictionaries with an id, loc and optionally rot and scale, like construction.define_grid makes them. Objects that are not rendered (the operands hidden after a boolean operation) are left out.
+
+Copyright Robbert Bloem, 2013
+"""
+
+import bpy
+
+import build
+
+
+METHODS = ["group", "linked"]
+
+
+def assembly_objects(names):
+    """
+    The objects of the assembly that are rendered.
+    """
+    return [bpy.data.objects[n] for n in names if n in bpy.data.objects and not bpy.data.objects[n].hide_render]
+
+
+def new_empty(t):
+    """
+    An empty at the transform t, not linked to the scene yet.
+    """
+    obj = bpy.data.objects.new(t["id"], None)
+    obj.location = t["loc"]
+    build.set_properties(obj, t)
+    return obj
+
+
+def make_group(name, names):
+    """
+    Put the objects of the assembly in a new group. A group with the same name is removed first.
+    """
+    remove_group(name)
+    group = bpy.data.groups.new(name)
+    for obj in assembly_objects(names):
+        group.objects.link(obj)
+    return group
+
+
+def remove_group(name):
+    if name in bpy.data.groups:
+        group = bpy.data.groups[name]
+        for obj in list(group.objects):
+            group.objects.unlink(obj)
+        bpy.data.groups.remove(group)
+
+
+def make_copies(name, names, transforms, method = "group"):
+    """
+    Make copies of the assembly (the objects called names) at transforms. name is the name of the group.
+    Returns the names of the new objects.
+    """
+    if method not in METHODS:
+        raise ValueError("unknown instancing method '%s', use one of %s" % (method, ", ".join(METHODS)))
+
+    objects = []
+    if method == "group":
+        group = make_group(name, names)
+        for t in transforms:
+            obj = new_empty(t)
+            obj.dupli_type = "GROUP"
+            obj.dupli_group = group
+            objects.append(obj)
+    else:
+        originals = assembly_objects(names)
+        for t in transforms:
+            empty = new_empty(t)
+            objects.append(empty)
+            for o in originals:
+                # shares the mesh with the original
+                obj = o.copy()
+                obj.name = "%s_%s" % (t["id"], o.name)
+                obj.parent = empty
+                objects.append(obj)
+    build.link_objects(objects)
+    print("instancing: %d copies of %d objects (%s)" % (len(transforms), len(assembly_objects(names)), method))
+    return [obj.name for obj in objects]
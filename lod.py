@@ -0,0 +1,176 @@
+"""
+Level of detail: make simpler versions of big meshes, like the proteins, for draft renders.
+
+The mesh is simplified with vertex clustering: space is divided in cubes and all vertices in one cube become one vertex. Faces that collapse are removed. This is not the prettiest way to decimate, but it is fast (it is all numpy) and a protein surface looks fine with it, especially when it is small in the picture.
+
+The simplified meshes are cached next to the original ones (see vrml.read_wrl_cached).
+
+It does not need Blender.
+
+Copyright Robbert Bloem, 2013
+"""
+
+import numpy
+
+import cache
+import view
+
+
+# the levels, with the maximum number of faces
+# 'full' is the original mesh
+LEVELS = [
+    ("full", None),
+    ("high", 200000),
+    ("medium", 50000),
+    ("low", 10000),
+    ("draft", 2000),
+]
+
+# with quality 'auto': the number of faces per pixel of the protein in the picture
+FACES_PER_PIXEL = 0.5
+
+
+def level_faces(quality):
+    """
+    The maximum number of faces of a quality level, None for 'full'.
+    """
+    for name, faces in LEVELS:
+        if name == quality:
+            return faces
+    raise ValueError("unknown quality '%s', use one of %s or 'auto'" % (quality, ", ".join(l[0] for l in LEVELS)))
+
+
+def auto_quality(geometry, p, camera, resolution):
+    """
+    Choose the level for protein p (a dictionary from construction.define_proteins) from its size in the picture.
+    The level is the simplest one that still has FACES_PER_PIXEL faces per pixel.
+    """
+    centre, radius = view.bounding_sphere(geometry["vertices"], p["loc"], p["scale"], p.get("rot", (0,0,0)))
+    size = view.projected_size([centre], [radius], camera, resolution)[0]
+    needed = FACES_PER_PIXEL * numpy.pi * (size / 2)**2
+
+    quality = "full"
+    for name, faces in LEVELS:
+        if faces is not None and faces >= needed:
+            quality = name
+    return quality
+
+
+def simplify(geometry, quality, key = None, max_size = None):
+    """
+    The geometry (a dictionary like vrml.read_wrl gives) at the level quality.
+    If key is given (a unique name for the original mesh), the result is cached. max_size (bytes) limits the size of the protein cache.
+    """
+    faces = level_faces(quality)
+    if faces is None or len(geometry["loop_totals"]) <= faces:
+        return geometry
+
+    if key is not None:
+        lod_key = cache.make_key("lod", key, faces)
+        result = cache.map_raw("protein", lod_key)
+        if result is not None:
+            if "colors" not in result:
+                result["colors"] = None
+            return result
+
+    result = decimate(geometry, faces)
+
+    if key is not None:
+        arrays = {}
+        for k, v in result.items():
+            if v is not None:
+                arrays[k] = v
+        cache.save_raw("protein", lod_key, max_size = max_size, **arrays)
+    return result
+
+
+def triangulate(loop_totals, loop_vertices):
+    """
+    Split faces in triangles (as fans). Returns an n x 3 array.
+    """
+    loop_totals = numpy.asarray(loop_totals, dtype = numpy.int64)
+    loop_vertices = numpy.asarray(loop_vertices, dtype = numpy.int64)
+    if numpy.all(loop_totals == 3):
+        return loop_vertices.reshape((-1, 3))
+
+    starts = numpy.cumsum(loop_totals) - loop_totals
+    # each face with n vertices gives n - 2 triangles: (0, i, i+1)
+    n_tris = loop_totals - 2
+    face = numpy.repeat(numpy.arange(len(loop_totals)), n_tris)
+    i = numpy.arange(n_tris.sum()) - numpy.repeat(numpy.cumsum(n_tris) - n_tris, n_tris) + 1
+    first = loop_vertices[starts[face]]
+    second = loop_vertices[starts[face] + i]
+    third = loop_vertices[starts[face] + i + 1]
+    return numpy.column_stack((first, second, third))
+
+
+def cluster(vertices, triangles, cells):
+    """
+    Vertex clustering with cells x cells x cells cubes.
+    Returns the vertex index of each cluster for each original vertex, the number of clusters and the triangles that are left.
+    """
+    lo = vertices.min(axis = 0)
+    size = (vertices.max(axis = 0) - lo).max() / cells
+    if size == 0:
+        size = 1
+    cell = numpy.floor((vertices - lo) / size).astype(numpy.int64)
+    cell = numpy.minimum(cell, cells - 1)
+    cell_id = (cell[:,0] * cells + cell[:,1]) * cells + cell[:,2]
+    unique, remap = numpy.unique(cell_id, return_inverse = True)
+    remap = remap.ravel()
+
+    t = remap[triangles]
+    # remove triangles that collapsed, and triangles that are now double
+    ok = (t[:,0] != t[:,1]) & (t[:,1] != t[:,2]) & (t[:,0] != t[:,2])
+    t = t[ok]
+    if len(t) > 0:
+        s = numpy.sort(t, axis = 1)
+        _u, first = numpy.unique(s, axis = 0, return_index = True)
+        t = t[numpy.sort(first)]
+    return remap, len(unique), t
+
+
+def decimate(geometry, max_faces, iterations = 12):
+    """
+    Simplify the geometry until it has at most max_faces triangles.
+    The number of cubes is found by bisection.
+    """
+    vertices = numpy.asarray(geometry["vertices"], dtype = numpy.float64)
+    triangles = triangulate(geometry["loop_totals"], geometry["loop_vertices"])
+
+    # bisection on the number of cubes along the longest side
+    low = 1
+    high = max(2, int(numpy.ceil(numpy.sqrt(len(triangles)))))
+    best = cluster(vertices, triangles, low)
+    for i in range(iterations):
+        if high - low <= 1:
+            break
+        middle = (low + high) // 2
+        result = cluster(vertices, triangles, middle)
+        if len(result[2]) <= max_faces:
+            low = middle
+            best = result
+        else:
+            high = middle
+    remap, n, t = best
+
+    # the new vertex is the average of the vertices in its cube, same for the color
+    count = numpy.bincount(remap, minlength = n).astype(numpy.float64)
+    new_vertices = numpy.empty((n, 3))
+    for j in range(3):
+        new_vertices[:,j] = numpy.bincount(remap, weights = vertices[:,j], minlength = n) / count
+
+    colors = None
+    if geometry.get("colors") is not None:
+        c = numpy.asarray(geometry["colors"], dtype = numpy.float64)
+        colors = numpy.empty((n, 3))
+        for j in range(3):
+            colors[:,j] = numpy.bincount(remap, weights = c[:,j], minlength = n) / count
+        colors = colors.astype(numpy.float32)
+
+    return {
+        "vertices":new_vertices.astype(numpy.float32),
+        "loop_totals":numpy.full(len(t), 3, dtype = numpy.uint32),
+        "loop_vertices":t.ravel().astype(numpy.uint32),
+        "colors":colors,
+    }
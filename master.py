@@ -1,5 +1,5 @@
 """
-Add the path to Python, then imports and reloads run.
+Add the path to Python, then imports and runs run.
 There is no need to change this file.
 
 Copyright Robbert Bloem, 2013
@@ -13,6 +13,9 @@ blend_dir = os.path.dirname(bpy.data.filepath)
 if blend_dir not in sys.path:
    sys.path.append(blend_dir)
 
-import imp
-import run
-imp.reload(run)
\ No newline at end of file
+import reloader
+if "run" in sys.modules:
+    # run again, the modules it uses are only reloaded when they changed (see reloader.py)
+    reloader.reload(sys.modules["run"])
+else:
+    import run
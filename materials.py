@@ -1,12 +1,91 @@
 """
 Define materials and textures. 
 
+The factories are @registered: calling one again with the same parameters gives the material that was already made, instead of a new one (mat_laser.001 etc). Use collect_garbage() to remove materials and textures that are not used anymore. 
+
 Copyright Robbert Bloem, 2013
 """
 
+import functools
+import inspect
+import math
+
 import bpy
 import os
 
+import cache
+
+
+# how many materials the factories made and how many they reused
+registry_stats = {"created":0, "reused":0}
+
+# how many images load_image loaded and reused
+image_stats = {"loaded":0, "reused":0}
+
+
+def registered(factory = None, files = None):
+    """
+    Decorator for the material factories. 
+    The name, the parameters and the source code of the factory are hashed and stored in the material. If a material with the same hash exists, it is returned instead of making a new one. Because the source code is part of the hash, changing a factory makes a new material. 
+    The parameters are hashed by name, with the defaults filled in: f(x, True), f(x, transparent = True) and f(x) (if True is the default) give the same material.
+    files: for factories that load files, a function that gives the paths of the files from the parameters (a dictionary by name). The modification times of the files are part of the hash, so a new file gives a new material. Use it as @registered(files = ...).
+    """
+    if factory is None:
+        return functools.partial(registered, files = files)
+    
+    try:
+        source = inspect.getsource(factory)
+    except (IOError, TypeError):
+        source = ""
+    signature = inspect.signature(factory)
+    defaults = dict((name, p.default) for name, p in signature.parameters.items() if p.default is not p.empty)
+    
+    @functools.wraps(factory)
+    def wrapper(*args, **kwargs):
+        # like BoundArguments.apply_defaults, which Python 3.3 doesn't have
+        arguments = dict(defaults)
+        arguments.update(signature.bind(*args, **kwargs).arguments)
+        mtimes = [os.path.getmtime(path) for path in files(arguments)] if files is not None else []
+        key = cache.make_key(factory.__name__, source, arguments, mtimes)
+        for mat in bpy.data.materials:
+            if mat.get("registry_key") == key:
+                registry_stats["reused"] += 1
+                return mat
+        mat = factory(*args, **kwargs)
+        mat["registry_key"] = key
+        registry_stats["created"] += 1
+        return mat
+    
+    return wrapper
+
+
+def collect_garbage():
+    """
+    Remove materials, textures and images without users. Materials first, because they use the textures. 
+    Returns a dictionary with the number of removed datablocks.
+    """
+    removed = {}
+    for collection in ["materials", "textures", "images"]:
+        data = getattr(bpy.data, collection)
+        removed[collection] = 0
+        for d in list(data):
+            if d.users == 0:
+                data.remove(d)
+                removed[collection] += 1
+    return removed
+
+
+def registry_report(removed = None):
+    """
+    Print how many materials were made and reused, how many images were loaded and reused (see load_image), and how many datablocks were removed by collect_garbage.
+    """
+    s = "materials: %i created, %i reused, images: %i loaded, %i reused" % (registry_stats["created"], registry_stats["reused"], image_stats["loaded"], image_stats["reused"])
+    if removed is not None:
+        s += ", removed %i materials, %i textures, %i images" % (removed["materials"], removed["textures"], removed["images"])
+    print(s)
+
+
+@registered
 def material_laser(out = False):
     """
     Material for the laser pulse. 'in' is before the block, 'out' is after the block.
@@ -28,18 +107,22 @@ def material_laser(out = False):
     return mat
 
 
-def material_plot(resources_path, transparent = False): 
+def plot_path(resources_path, transparent = False):
+    if transparent:
+        return resources_path + "plot_transparent.png"
+    return resources_path + "plot_white.png"
+
+
+@registered(files = lambda a: [plot_path(a["resources_path"], a["transparent"])])
+def material_plot(resources_path, transparent = False, max_size = None): 
     """
     Material with plot as texture.
+    max_size: the size of the plot in the picture, in pixels. The image is made smaller if it is bigger than that, see load_image.
     """
     
     # material
     mat = bpy.data.materials.new("mat_plot")
-    
-    if transparent:
-        path = resources_path + "plot_transparent.png"
-    else:
-        path = resources_path + "plot_white.png"
+    path = plot_path(resources_path, transparent)
 
     mat.type = "SURFACE"
     mat.diffuse_intensity = 1
@@ -61,8 +144,10 @@ def material_plot(resources_path, transparent = False):
     slot.texture = tex
     
     # load the image and add to the texture
-    img = bpy.data.images.load(path)
+    img = load_image(path, max_size)
     slot.texture.image = img
+    tex.use_mipmap = True
+    tex.use_interpolation = True
     
     # set some properties
     mat.texture_slots[0].use_map_alpha = True
@@ -72,6 +157,56 @@ def material_plot(resources_path, transparent = False):
     return mat
 
 
+def image_size(max_size):
+    """
+    max_size (pixels) rounded up to a power of 2, the longest side of the copy of an image (see load_image). None stays None.
+    """
+    if max_size is None:
+        return None
+    return 2**int(math.ceil(math.log(max(max_size, 1), 2)))
+
+
+def load_image(path, max_size = None):
+    """
+    Load an image, or reuse it if it is already loaded and the file didn't change.
+    
+    If max_size (pixels) is given and the image is bigger than that, a smaller copy is used. The longest side of the copy is the first power of 2 above max_size, the other side keeps the aspect ratio. Because of the rounding, a small change of max_size (moving the camera a bit) gives the same copy. The copy is saved in the cache folder (see cache.py), so it only has to be made once. 
+    """
+    path = os.path.realpath(path)
+    mtime = os.path.getmtime(path)
+    max_size = image_size(max_size)
+    
+    # already loaded? (custom properties can't be None, 0 is no maximum)
+    for img in bpy.data.images:
+        if img.get("source_path") == path and img.get("source_mtime") == mtime and img.get("max_size") == (max_size or 0):
+            image_stats["reused"] += 1
+            return img
+    
+    scaled_path = None
+    if max_size is not None:
+        scaled_path = cache.file_path("image", cache.make_key(path, mtime, max_size), ".png")
+    
+    if scaled_path is not None and os.path.exists(scaled_path):
+        # the smaller copy was made before
+        img = bpy.data.images.load(scaled_path)
+    else:
+        img = bpy.data.images.load(path)
+        width, height = img.size
+        if max_size is not None and max(width, height) > max_size:
+            f = max_size / max(width, height)
+            img.scale(max(1, int(round(width * f))), max(1, int(round(height * f))))
+            img.filepath_raw = scaled_path
+            img.file_format = "PNG"
+            img.save()
+    
+    img["source_path"] = path
+    img["source_mtime"] = mtime
+    img["max_size"] = max_size or 0
+    image_stats["loaded"] += 1
+    return img
+
+
+@registered
 def material_block():
     """
     Brushed metal look.
@@ -103,6 +238,7 @@ def material_blue_water():
 def material_green_water():
     return material_water((0.35,1,0.35))
 
+@registered
 def material_water(color):
     """
     Well... water... it is transparent and it has a color
@@ -131,6 +267,7 @@ def material_water(color):
     return mat 
 
 
+@registered
 def make_gold_material():
     """
     Shiny!
@@ -157,6 +294,7 @@ def make_gold_material():
     return mat
 
 
+@registered
 def make_mirror_mount_material():
     # shiny dark grey
     mat = bpy.data.materials.new("mat_mirror_mount")
@@ -168,6 +306,7 @@ def make_mirror_mount_material():
     return mat
   
 
+@registered
 def make_beamblock_material():
     # mat black
     mat = bpy.data.materials.new("mat_beam_block")
@@ -179,6 +318,7 @@ def make_beamblock_material():
     return mat
 
 
+@registered
 def material_white_plane():
     mat = bpy.data.materials.new("mat_white_plane")
     mat.type = "SURFACE"
@@ -188,8 +328,23 @@ def material_white_plane():
     mat.raytrace_mirror.use = False
     return mat
 
+@registered
+def material_protein():
+    """
+    Material for the proteins made by build.make_proteins. The colors come from the vertex colors that PyMol exported. 
+    No raytracing, so the proteins don't get shadows from the lamps.
+    """
+    mat = bpy.data.materials.new("mat_protein")
+    mat.type = "SURFACE"
+    mat.diffuse_color = (1,1,1)
+    mat.diffuse_intensity = 1
+    mat.use_vertex_color_paint = True
+    mat.use_raytrace = False
+    return mat
+
 ### NOT USED, I THINK ###
 
+@registered
 def make_laserpulse_material():
     # red halo
     mat_light = bpy.data.materials.new("laser_light")
@@ -202,6 +357,7 @@ def make_laserpulse_material():
     return mat_light
 
 
+@registered
 def make_signalpulse_material():
     # red halo
     mat_light = bpy.data.materials.new("laser_light")
@@ -238,6 +394,7 @@ def make_signalpulse():
     return pulse
 
 
+@registered
 def make_path_material():
     # whitish
     mat_path = bpy.data.materials.new("beam_path")
@@ -247,6 +404,7 @@ def make_path_material():
     return mat_path
     
     
+@registered
 def make_beamsplitter_material():
     # beam splitter
     mat_glass = bpy.data.materials.new("glass")
@@ -270,6 +428,7 @@ def make_beamsplitter_material():
     mat_glass.raytrace_mirror.fresnel_factor = 1
     return mat_glass 
 
+@registered
 def make_glass_material():
     # beam splitter
     mat_glass = bpy.data.materials.new("glass")
@@ -294,6 +453,7 @@ def make_glass_material():
     return mat_glass 
 
 
+@registered
 def make_box_surface_material():
     # shiny grey
     mat = bpy.data.materials.new("box_surface")
@@ -305,6 +465,7 @@ def make_box_surface_material():
     return mat
 
     
+@registered
 def make_wall_surface_material():
     # shiny black
     mat = bpy.data.materials.new("wall_surface")
@@ -318,6 +479,7 @@ def make_wall_surface_material():
     return mat
 
 
+@registered
 def make_laserpulse_material_too_new():
     # red halo
     mat_light = bpy.data.materials.new("laser_light")
@@ -333,6 +495,7 @@ def make_laserpulse_material_too_new():
     return mat_light
 
 
+@registered
 def make_signalpulse_material_original():
     # red halo
     mat_light = bpy.data.materials.new("laser_light")
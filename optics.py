@@ -0,0 +1,190 @@
+"""
+Follow laser beams through the scene: where do they hit something, and where do they go after a mirror?
+
+The things a beam can hit are surfaces, made from the elements of construction.py (surfaces):
+- a cylinder: its two ends, discs (the mirror and the plot are flat cylinders). The side is not used.
+- a cone: its base, a disc
+- a cube: its six faces, rectangles
+- a plane: a rectangle
+A surface either reflects the beam (a mirror) or stops it.
+
+trace follows many rays at once, with arrays: each step, all rays are tested against all surfaces, the nearest hit is kept, and the rays that hit a mirror go on in the reflected direction. The result is a list of segments, from where a ray starts to where it hits something (or to max_length if it hits nothing). The last segment of a ray ends exactly on the surface it hits.
+
+construction.define_laser uses this to let the outgoing beam end on the plot (targets), after the mirrors it hits on the way (mirrors). beam_segments turns the segments into laser elements: the first segment is the beam from the focus, build.laser_primitives makes it a cone as always; each segment after a reflection gets its own element with a start, which becomes a cylinder. The block is not a target: the focus is inside it, in the channel, so the beam would end on the inside of the block.
+
+It does not need Blender.
+
+Copyright Robbert Bloem, 2013
+"""
+
+import numpy
+
+import view
+
+
+# a hit closer than this to the start of a ray is the surface the ray comes from
+EPSILON = 1e-6
+
+# rays that hit nothing stop after this distance
+MAX_LENGTH = 1000
+
+# the largest number of reflections of a ray
+MAX_BOUNCES = 10
+
+
+def element_surfaces(e):
+    """
+    The surfaces of one element, as a list of (centre, u, v, ellipse). u and v are the half axes: the surface is centre + a u + b v, with a^2 + b^2 <= 1 for an ellipse and |a| <= 1, |b| <= 1 for a rectangle.
+    """
+    loc = numpy.asarray(e["loc"], dtype = float)
+    scale = numpy.asarray(e.get("scale", (1,1,1)), dtype = float)
+    m = view.euler_to_matrix(e.get("rot", (0,0,0)))
+    # the axes of the element, scaled
+    x, y, z = m[:,0] * scale[0], m[:,1] * scale[1], m[:,2] * scale[2]
+
+    shape = e.get("shape", "cube")
+    if shape == "cylinder":
+        radius = e.get("radius", 1)
+        half = e.get("depth", 2) / 2
+        return [(loc + z * half, x * radius, y * radius, True), (loc - z * half, x * radius, y * radius, True)]
+    if shape == "cone":
+        # the base is at -z, the point at +z
+        return [(loc - z, x, y, True)]
+    if shape == "plane":
+        return [(loc, x, y, False)]
+    return [
+        (loc + x, y, z, False), (loc - x, y, z, False),
+        (loc + y, z, x, False), (loc - y, z, x, False),
+        (loc + z, x, y, False), (loc - z, x, y, False),
+    ]
+
+
+def surfaces(elements, mirrors = ()):
+    """
+    The surfaces of elements, as arrays. The elements with an id in mirrors reflect, the others stop the rays.
+    """
+    centre = []
+    u = []
+    v = []
+    ellipse = []
+    reflect = []
+    ids = []
+    for e in elements:
+        for c, a, b, is_ellipse in element_surfaces(e):
+            centre.append(c)
+            u.append(a)
+            v.append(b)
+            ellipse.append(is_ellipse)
+            reflect.append(e["id"] in mirrors)
+            ids.append(e["id"])
+    u = numpy.array(u, dtype = float).reshape((-1, 3))
+    v = numpy.array(v, dtype = float).reshape((-1, 3))
+    normal = numpy.cross(u, v)
+    lengths = numpy.sqrt(numpy.sum(normal**2, axis = 1))
+    lengths[lengths == 0] = 1
+    return {
+        "centre":numpy.array(centre, dtype = float).reshape((-1, 3)),
+        "u":u,
+        "v":v,
+        "normal":normal / lengths[:,numpy.newaxis],
+        "ellipse":numpy.array(ellipse, dtype = bool),
+        "reflect":numpy.array(reflect, dtype = bool),
+        "id":ids
+    }
+
+
+def intersect(origins, directions, s):
+    """
+    The nearest hit of each ray with the surfaces s. Returns the distance (inf if nothing is hit) and the index of the surface.
+    """
+    n = len(origins)
+    if len(s["centre"]) == 0:
+        return numpy.full(n, numpy.inf), numpy.zeros(n, dtype = int)
+
+    # distance along the ray to the plane of each surface, rays x surfaces
+    denominator = numpy.dot(directions, s["normal"].T)
+    numerator = numpy.einsum("ijk,jk->ij", s["centre"][numpy.newaxis,:,:] - origins[:,numpy.newaxis,:], s["normal"])
+    # rays parallel to a surface give inf or nan, they don't hit it
+    with numpy.errstate(divide = "ignore", invalid = "ignore"):
+        t = numerator / denominator
+
+        # is the point in the plane inside the surface?
+        d = origins[:,numpy.newaxis,:] + t[:,:,numpy.newaxis] * directions[:,numpy.newaxis,:] - s["centre"][numpy.newaxis,:,:]
+        a = numpy.einsum("ijk,jk->ij", d, s["u"]) / numpy.sum(s["u"]**2, axis = 1)
+        b = numpy.einsum("ijk,jk->ij", d, s["v"]) / numpy.sum(s["v"]**2, axis = 1)
+        inside = numpy.where(s["ellipse"], a**2 + b**2 <= 1, (numpy.abs(a) <= 1) & (numpy.abs(b) <= 1))
+
+    t = numpy.where(inside & (t > EPSILON) & numpy.isfinite(t), t, numpy.inf)
+    index = numpy.argmin(t, axis = 1)
+    return t[numpy.arange(n), index], index
+
+
+def trace(origins, directions, s, max_bounces = MAX_BOUNCES, max_length = MAX_LENGTH):
+    """
+    Follow rays from origins in directions (n x 3, or one direction for all) through the surfaces s (see surfaces).
+    Returns a dictionary with the segments (start, end, the index of the ray and the number of reflections before the segment) and for each ray the index of the last surface it hit (-1 for none).
+    """
+    origins = numpy.atleast_2d(numpy.asarray(origins, dtype = float)).copy()
+    directions = numpy.broadcast_to(numpy.asarray(directions, dtype = float), origins.shape).copy()
+    lengths = numpy.sqrt(numpy.sum(directions**2, axis = 1))
+    lengths[lengths == 0] = 1
+    directions /= lengths[:,numpy.newaxis]
+
+    n = len(origins)
+    hit_surface = numpy.full(n, -1, dtype = int)
+    alive = numpy.arange(n)
+    starts, ends, rays, bounces = [], [], [], []
+    for bounce in range(max_bounces + 1):
+        if len(alive) == 0:
+            break
+        o = origins[alive]
+        d = directions[alive]
+        t, index = intersect(o, d, s)
+        hit = numpy.isfinite(t)
+        end = o + numpy.where(hit, t, max_length)[:,numpy.newaxis] * d
+
+        starts.append(o)
+        ends.append(end)
+        rays.append(alive)
+        bounces.append(numpy.full(len(alive), bounce, dtype = int))
+        hit_surface[alive[hit]] = index[hit]
+
+        # the rays that hit a mirror go on
+        reflect = hit & s["reflect"][index]
+        normal = s["normal"][index[reflect]]
+        d = d[reflect]
+        directions[alive[reflect]] = d - 2 * numpy.sum(d * normal, axis = 1)[:,numpy.newaxis] * normal
+        origins[alive[reflect]] = end[reflect]
+        alive = alive[reflect]
+
+    return {
+        "start":numpy.concatenate(starts) if starts else numpy.zeros((0, 3)),
+        "end":numpy.concatenate(ends) if ends else numpy.zeros((0, 3)),
+        "ray":numpy.concatenate(rays) if rays else numpy.zeros(0, dtype = int),
+        "bounce":numpy.concatenate(bounces) if bounces else numpy.zeros(0, dtype = int),
+        "surface":hit_surface
+    }
+
+
+def end_points(origins, directions, s, max_bounces = MAX_BOUNCES, max_length = MAX_LENGTH):
+    """
+    Where each ray ends (n x 3), and the id of the element it ends on (None if it hits nothing).
+    """
+    result = trace(origins, directions, s, max_bounces, max_length)
+    # the last segment of each ray, every ray has at least one
+    last = numpy.zeros(len(result["surface"]), dtype = int)
+    numpy.maximum.at(last, result["ray"], numpy.arange(len(result["ray"])))
+    ids = [s["id"][i] if i >= 0 else None for i in result["surface"]]
+    return result["end"][last], ids
+
+
+def beam_segments(result, ids):
+    """
+    The segments of a trace as a list of dictionaries, for the beams: {"id", "start", "end", "bounce"}, ray after ray, each from the start to the end. ids are the names of the rays, the segments after a reflection get _r1, _r2 etc. (the pulses of animation.py are _0, _1 etc.)
+    """
+    segments = []
+    order = numpy.lexsort((result["bounce"], result["ray"]))
+    for start, end, ray, bounce in zip(result["start"][order], result["end"][order], result["ray"][order], result["bounce"][order]):
+        name = ids[ray] if bounce == 0 else "%s_r%d" % (ids[ray], bounce)
+        segments.append({"id":name, "start":tuple(float(x) for x in start), "end":tuple(float(x) for x in end), "bounce":int(bounce)})
+    return segments
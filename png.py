@@ -0,0 +1,172 @@
+"""
+Read and write PNG files without Blender, for the stitching of tiles (see tiles.py).
+
+Only what Blender writes is supported: not interlaced, 8 or 16 bits, grey, RGB or RGBA, with or without alpha. The pixels are not interpreted: an image is a numpy array with one row of bytes per line, so tiles can be cut and pasted without changing the colors or the alpha.
+
+It does not need Blender.
+
+Copyright Robbert Bloem, 2013
+"""
+
+import struct
+import zlib
+
+import numpy
+
+
+SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# color type: number of channels
+CHANNELS = {
+    0:1, # grey
+    2:3, # RGB
+    4:2, # grey and alpha
+    6:4, # RGBA
+}
+
+
+def read_chunks(filename):
+    """
+    The chunks in a PNG file, as (type, data).
+    """
+    with open(filename, "rb") as f:
+        data = f.read()
+    if data[:8] != SIGNATURE:
+        raise ValueError("%s is not a PNG file" % filename)
+    chunks = []
+    i = 8
+    while i < len(data):
+        length, = struct.unpack(">I", data[i:i+4])
+        chunk_type = data[i+4:i+8]
+        chunks.append((chunk_type, data[i+8:i+8+length]))
+        i += 12 + length
+        if chunk_type == b"IEND":
+            break
+    return chunks
+
+
+def read_header(data):
+    """
+    The IHDR chunk as a dictionary.
+    """
+    width, height, bit_depth, color_type, compression, filter_method, interlace = struct.unpack(">IIBBBBB", data)
+    return {
+        "width":width,
+        "height":height,
+        "bit_depth":bit_depth,
+        "color_type":color_type,
+        "interlace":interlace
+    }
+
+
+def png_size(filename):
+    """
+    The width and height of a PNG file. Only reads the header.
+    """
+    with open(filename, "rb") as f:
+        data = f.read(24)
+    if data[:8] != SIGNATURE or data[12:16] != b"IHDR":
+        raise ValueError("%s is not a PNG file" % filename)
+    return struct.unpack(">II", data[16:24])
+
+
+def bytes_per_pixel(header):
+    return CHANNELS[header["color_type"]] * header["bit_depth"] // 8
+
+
+def read_png(filename):
+    """
+    Read a PNG file. Returns the header and the pixels, an array (height x width * bytes per pixel) of uint8.
+    """
+    chunks = read_chunks(filename)
+    header = read_header(chunks[0][1])
+    if header["color_type"] not in CHANNELS or header["bit_depth"] not in (8, 16) or header["interlace"] != 0:
+        raise ValueError("%s: only 8 or 16 bit grey, RGB or RGBA PNG files that are not interlaced are supported" % filename)
+
+    raw = zlib.decompress(b"".join(data for chunk_type, data in chunks if chunk_type == b"IDAT"))
+    bpp = bytes_per_pixel(header)
+    stride = header["width"] * bpp
+    rows = numpy.frombuffer(raw, dtype = numpy.uint8).reshape((header["height"], stride + 1))
+    return header, unfilter(rows[:,0], rows[:,1:], bpp)
+
+
+def unfilter(filters, rows, bpp):
+    """
+    Undo the filters of the lines of a PNG file.
+    """
+    pixels = numpy.zeros(rows.shape, dtype = numpy.uint8)
+    previous = numpy.zeros(rows.shape[1], dtype = numpy.uint8)
+    for y in range(len(rows)):
+        f = filters[y]
+        line = rows[y]
+        if f == 0:
+            out = line
+        elif f == 1:
+            # sub: add the pixel to the left, a running sum per byte of the pixel
+            out = (numpy.cumsum(line.reshape((-1, bpp)).astype(numpy.uint32), axis = 0) % 256).astype(numpy.uint8).ravel()
+        elif f == 2:
+            # up: add the pixel above
+            out = line + previous
+        elif f == 3:
+            out = unfilter_average(line, previous, bpp)
+        elif f == 4:
+            out = unfilter_paeth(line, previous, bpp)
+        else:
+            raise ValueError("unknown PNG filter %d" % f)
+        pixels[y] = out
+        previous = pixels[y]
+    return pixels
+
+
+def unfilter_average(line, previous, bpp):
+    out = bytearray(line.tobytes())
+    up = previous.tobytes()
+    for x in range(len(out)):
+        left = out[x - bpp] if x >= bpp else 0
+        out[x] = (out[x] + ((left + up[x]) >> 1)) & 255
+    return numpy.frombuffer(bytes(out), dtype = numpy.uint8)
+
+
+def unfilter_paeth(line, previous, bpp):
+    out = bytearray(line.tobytes())
+    up = previous.tobytes()
+    for x in range(len(out)):
+        if x >= bpp:
+            a = out[x - bpp]
+            c = up[x - bpp]
+        else:
+            a = 0
+            c = 0
+        b = up[x]
+        p = a + b - c
+        pa = abs(p - a)
+        pb = abs(p - b)
+        pc = abs(p - c)
+        if pa <= pb and pa <= pc:
+            predictor = a
+        elif pb <= pc:
+            predictor = b
+        else:
+            predictor = c
+        out[x] = (out[x] + predictor) & 255
+    return numpy.frombuffer(bytes(out), dtype = numpy.uint8)
+
+
+def write_png(filename, header, pixels):
+    """
+    Write a PNG file. header is a dictionary like read_png gives (only bit_depth and color_type are used), pixels an array (height x width * bytes per pixel) of uint8.
+    The lines are not filtered, that is fast and zlib does the rest.
+    """
+    height, stride = pixels.shape
+    width = stride // bytes_per_pixel(header)
+    rows = numpy.zeros((height, stride + 1), dtype = numpy.uint8)
+    rows[:,1:] = pixels
+
+    def chunk(chunk_type, data):
+        return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data) & 0xffffffff)
+
+    with open(filename, "wb") as f:
+        f.write(SIGNATURE)
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, header["bit_depth"], header["color_type"], 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(rows.tobytes(), 6)))
+        f.write(chunk(b"IEND", b""))
@@ -0,0 +1,301 @@
+"""
+Render quality presets: the settings that make a render slow or fast, set together.
+
+- preview: a quarter of the size, little anti aliasing, almost no reflections and no shadows. To see if everything is in the right place.
+- draft: half the size, some anti aliasing, shorter reflections, shadows. To judge the look.
+- final: the figure as it should be.
+
+The settings are the resolution (a fraction of resolution_percentage), antialiasing_samples, use_full_sample, the depth of the mirror reflections of the materials (20 for water, 100 for gold in final), the shadows of the lamps and raytracing of the protein materials (shadows on the proteins). The presets are applied after the scene is built (apply). The depth and the raytracing the material factory gave a material are kept in the material, so that going back to final restores them: a preset can turn raytracing off, but not on for a material that doesn't use it.
+
+The cost model predicts the render time for the scene and a preset. The time is fitted (least squares) as a sum of:
+- a constant
+- the number of samples (pixels x antialiasing samples)
+- the samples, with full sample
+- the samples times the depth of the reflections of the mirrors
+- the samples times the number of lamps with shadows
+- the samples times the number of faces of the proteins with raytracing
+- the number of faces
+The default coefficients are a rough guess. Calibrate them with real renders of your computer:
+python presets.py calibration-variants calibration.json
+python batch.py calibration.json --output calibration
+python presets.py calibrate calibration/timings.json
+The coefficients are saved in cost_model.json. After that, run.py can choose the best preset for a time budget (render_time_budget).
+
+Copyright Robbert Bloem, 2013
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy
+
+import view
+
+try:
+    import bpy
+except ImportError:
+    # calibrating is done outside of Blender
+    bpy = None
+
+
+PRESETS = {
+    "preview":{
+        "resolution_scale":0.25,
+        "antialiasing_samples":"5",
+        "use_full_sample":False,
+        "max_mirror_depth":2,
+        "lamp_shadows":False,
+        "protein_raytrace":False,
+    },
+    "draft":{
+        "resolution_scale":0.5,
+        "antialiasing_samples":"8",
+        "use_full_sample":False,
+        "max_mirror_depth":10,
+        "lamp_shadows":True,
+        "protein_raytrace":False,
+    },
+    "final":{
+        "resolution_scale":1,
+        "antialiasing_samples":"16",
+        "use_full_sample":True,
+        "max_mirror_depth":100,
+        "lamp_shadows":True,
+        "protein_raytrace":True,
+    },
+}
+
+# from the best to the fastest
+ORDER = ["final", "draft", "preview"]
+
+# the terms of the cost model
+FEATURES = ["constant", "samples", "full_sample", "mirror_depth", "shadow_lamps", "protein_raytrace", "faces"]
+
+# seconds per unit of each term, a rough guess until the model is calibrated
+# the samples are in millions, the faces as well
+DEFAULT_COEFFICIENTS = [1.0, 2.0, 2.0, 0.5, 0.5, 1.0, 5.0]
+
+# the folder with this file
+package_dir = os.path.dirname(os.path.abspath(__file__))
+
+# the calibrated coefficients
+MODEL_FILE = os.path.join(package_dir, "cost_model.json")
+
+
+def get_preset(name):
+    if name not in PRESETS:
+        raise ValueError("unknown render preset '%s', use one of %s" % (name, ", ".join(ORDER)))
+    return PRESETS[name]
+
+
+def percentage(resolution, name):
+    """
+    The resolution_percentage of a preset.
+    """
+    return max(1, int(round(resolution[2] * get_preset(name)["resolution_scale"])))
+
+
+def protein_materials(proteins):
+    """
+    The materials of the protein objects, proteins are their ids.
+    """
+    result = []
+    for p in proteins:
+        if p in bpy.data.objects:
+            for slot in bpy.data.objects[p].material_slots:
+                if slot.material is not None and slot.material not in result:
+                    result.append(slot.material)
+    return result
+
+
+def apply(name, resolution, proteins = ()):
+    """
+    Set the render settings, materials and lamps of the scene to preset name.
+    resolution is the one of run.py (the final size), proteins the ids of the protein objects.
+    """
+    preset = get_preset(name)
+    render = bpy.context.scene.render
+    render.resolution_percentage = percentage(resolution, name)
+    render.antialiasing_samples = preset["antialiasing_samples"]
+    render.use_full_sample = preset["use_full_sample"]
+
+    for mat in bpy.data.materials:
+        if mat.raytrace_mirror.use:
+            # remember the depth of the factory
+            if "mirror_depth" not in mat:
+                mat["mirror_depth"] = mat.raytrace_mirror.depth
+            mat.raytrace_mirror.depth = min(mat["mirror_depth"], preset["max_mirror_depth"])
+
+    for mat in protein_materials(proteins):
+        # remember the raytracing of the factory
+        if "protein_raytrace" not in mat:
+            mat["protein_raytrace"] = mat.use_raytrace
+        mat.use_raytrace = bool(mat["protein_raytrace"]) and preset["protein_raytrace"]
+
+    for lamp in bpy.data.lamps:
+        if preset["lamp_shadows"]:
+            lamp.shadow_method = "RAY_SHADOW"
+        else:
+            lamp.shadow_method = "NOSHADOW"
+
+    print("render preset %s: %d%%, %s samples, predicted %.0f s" % (name, render.resolution_percentage, preset["antialiasing_samples"], predict(describe(name, resolution, proteins))))
+
+
+def describe(name, resolution, proteins = ()):
+    """
+    What makes the render of the scene with preset name slow, for the cost model. proteins: see apply.
+    """
+    preset = get_preset(name)
+    width, height = view.render_size((resolution[0], resolution[1], percentage(resolution, name)))
+
+    faces = 0
+    lamps = 0
+    for obj in bpy.context.scene.objects:
+        if obj.type == "MESH" and not obj.hide_render:
+            faces += len(obj.data.polygons)
+        elif obj.type == "LAMP":
+            lamps += 1
+        elif obj.dupli_type == "GROUP" and obj.dupli_group is not None:
+            # the copies are rendered as real objects (see instancing.py)
+            faces += sum(len(o.data.polygons) for o in obj.dupli_group.objects if o.type == "MESH" and not o.hide_render)
+
+    # only materials that reflect something cost time
+    mirror_depth = 0
+    for mat in bpy.data.materials:
+        if mat.users > 0 and mat.raytrace_mirror.use and mat.raytrace_mirror.reflect_factor > 0:
+            mirror_depth += min(mat.get("mirror_depth", mat.raytrace_mirror.depth), preset["max_mirror_depth"])
+
+    # the faces of the proteins that get shadows
+    protein_faces = 0
+    if preset["protein_raytrace"]:
+        for p in proteins:
+            if p in bpy.data.objects:
+                obj = bpy.data.objects[p]
+                if obj.type == "MESH" and not obj.hide_render and any(m.get("protein_raytrace", m.use_raytrace) for m in protein_materials([p])):
+                    protein_faces += len(obj.data.polygons)
+
+    return {
+        "preset":name,
+        "pixels":width * height,
+        "samples":int(preset["antialiasing_samples"]),
+        "full_sample":preset["use_full_sample"],
+        "mirror_depth":mirror_depth,
+        "shadow_lamps":lamps if preset["lamp_shadows"] else 0,
+        "protein_faces":protein_faces,
+        "faces":faces,
+    }
+
+
+def features(description):
+    """
+    The terms of the cost model for a description (see describe).
+    """
+    samples = description["pixels"] * description["samples"] / 1e6
+    return [
+        1,
+        samples,
+        samples if description["full_sample"] else 0,
+        samples * description["mirror_depth"] / 100,
+        samples * description["shadow_lamps"],
+        # not in the timings of older versions
+        samples * description.get("protein_faces", 0) / 1e6,
+        description["faces"] / 1e6,
+    ]
+
+
+def load_model():
+    """
+    The calibrated coefficients, or the default ones.
+    """
+    if os.path.exists(MODEL_FILE):
+        with open(MODEL_FILE) as f:
+            model = json.load(f)
+        # a model with other terms is from an older version
+        if model.get("features") == FEATURES:
+            return model["coefficients"]
+    return DEFAULT_COEFFICIENTS
+
+
+def predict(description, coefficients = None):
+    """
+    The predicted render time in seconds.
+    """
+    if coefficients is None:
+        coefficients = load_model()
+    return float(numpy.dot(features(description), coefficients))
+
+
+def choose(budget, resolution, proteins = ()):
+    """
+    The best preset for which the predicted render time of the scene is within budget (seconds). If none is fast enough, the fastest. proteins: see apply.
+    """
+    coefficients = load_model()
+    for name in ORDER:
+        t = predict(describe(name, resolution, proteins), coefficients)
+        if t <= budget:
+            print("render preset %s fits in %.0f s (predicted %.0f s)" % (name, budget, t))
+            return name
+    print("no render preset fits in %.0f s, using %s" % (budget, ORDER[-1]))
+    return ORDER[-1]
+
+
+def calibrate(timing_files):
+    """
+    Fit the cost model to the renders in timings.json files of batch.py. Saves the coefficients in MODEL_FILE.
+    """
+    descriptions = []
+    times = []
+    for filename in timing_files:
+        with open(filename) as f:
+            result = json.load(f)
+        for v in result["variants"]:
+            # tiles are only part of the picture, chunks are several frames
+            if "scene" in v and "render" in v and "tile" not in v and "chunk" not in v:
+                descriptions.append(v["scene"])
+                times.append(v["render"])
+    if len(times) < 2:
+        raise ValueError("at least two renders are needed to calibrate, found %d" % len(times))
+
+    x = numpy.array([features(d) for d in descriptions], dtype = float)
+    y = numpy.array(times, dtype = float)
+    coefficients = numpy.linalg.lstsq(x, y, rcond = None)[0]
+    # negative costs make no sense, they come from too few renders
+    coefficients = numpy.maximum(coefficients, 0)
+    predicted = numpy.dot(x, coefficients)
+    error = numpy.abs(predicted - y) / numpy.maximum(y, 1e-9)
+
+    with open(MODEL_FILE, "w") as f:
+        json.dump({"features":FEATURES, "coefficients":coefficients.tolist(), "renders":len(times)}, f, indent = 2)
+    print("%d renders, mean error %.0f%%, max error %.0f%%" % (len(times), 100 * error.mean(), 100 * error.max()))
+    for name, c in zip(FEATURES, coefficients):
+        print("    %-15s %10.4f" % (name, c))
+    return coefficients
+
+
+def calibration_variants(filename):
+    """
+    Write a variants file for batch.py that renders each preset with and without proteins and mirror.
+    """
+    variants = []
+    for name in ORDER:
+        variants.append({"name":"%s_full" % name, "render_preset":name})
+        variants.append({"name":"%s_plane" % name, "render_preset":name, "flag_use_mirror_instead_of_plane":False, "flag_no_proteins":True})
+    with open(filename, "w") as f:
+        json.dump(variants, f, indent = 2)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description = "Calibrate the cost model of the render presets.")
+    parser.add_argument("command", choices = ["calibration-variants", "calibrate"])
+    parser.add_argument("files", nargs = "+", help = "calibration-variants: the variants file to write, calibrate: timings.json files of batch.py")
+    args = parser.parse_args(argv)
+    if args.command == "calibration-variants":
+        calibration_variants(args.files[0])
+    else:
+        calibrate(args.files)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,129 @@
+"""
+Render a range of frames (an animation, see animation.py) in chunks, and keep track of the frames that are done. Used by batch.py with --frames.
+
+The frames are split in chunks of a few frames. Each chunk is rendered by its own background Blender, that builds the scene once and then renders the frames one by one, to output/name_0001.png etc. After each frame, a line is added to output/name.frames with the frame, the hash of the scene and the render time.
+
+A frame is done if it is in that file with the hash of the scene that is rendered now, and its picture exists. If the rendering is interrupted, the next run only renders the frames that are not done. If the scene changed (another hash), everything is rendered again.
+
+The hash is that of the scene spec (see spec.py) together with the flags and properties of run.py and the variant, so changing the animation or the render settings also counts.
+
+It does not need Blender.
+
+Copyright Robbert Bloem, 2013
+"""
+
+import json
+import os
+
+
+# the number of frames each Blender renders
+CHUNK_SIZE = 10
+
+
+def parse_frames(text):
+    """
+    '1-250' to the frames 1 to 250 (including 250). '7' is just frame 7. Ranges can be combined with commas: '1-10,20-30'.
+    """
+    frames = []
+    for part in text.split(","):
+        if "-" in part:
+            first, last = part.split("-")
+            frames += range(int(first), int(last) + 1)
+        else:
+            frames.append(int(part))
+    return sorted(set(frames))
+
+
+def chunks(frames, size = CHUNK_SIZE):
+    """
+    Split the frames in chunks of at most size frames that follow each other.
+    """
+    result = []
+    for f in sorted(frames):
+        if len(result) > 0 and len(result[-1]) < size and result[-1][-1] == f - 1:
+            result[-1].append(f)
+        else:
+            result.append([f])
+    return result
+
+
+def frame_file(output, name, frame):
+    """
+    The picture of a frame.
+    """
+    return os.path.join(output, "%s_%04d.png" % (name, frame))
+
+
+def progress_file(output, name):
+    return os.path.join(output, name + ".frames")
+
+
+def record(output, name, frame, scene_hash, render_time):
+    """
+    Add a frame that is done to the progress file. Each Blender adds its own lines, a line is short enough to be written at once.
+    """
+    line = json.dumps({"frame":frame, "hash":scene_hash, "render":render_time}) + "\n"
+    with open(progress_file(output, name), "a") as f:
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_progress(output, name):
+    """
+    The last line of each frame in the progress file, by frame.
+    """
+    result = {}
+    filename = progress_file(output, name)
+    if not os.path.exists(filename):
+        return result
+    with open(filename) as f:
+        for line in f:
+            try:
+                x = json.loads(line)
+            except ValueError:
+                # the last line of a Blender that was killed
+                continue
+            result[x["frame"]] = x
+    return result
+
+
+def done_frames(output, name, scene_hash):
+    """
+    The frames that were rendered with this scene and of which the picture exists.
+    """
+    return set(frame for frame, x in read_progress(output, name).items() if x["hash"] == scene_hash and os.path.exists(frame_file(output, name, frame)))
+
+
+def frames_per_minute(frames, seconds):
+    if seconds <= 0:
+        return 0.0
+    return 60.0 * frames / seconds
+
+
+def time_to_go(remaining, rate):
+    """
+    The time (seconds) to render the remaining frames at rate frames per minute, None if the rate is not known yet.
+    """
+    if rate <= 0:
+        return None
+    return 60.0 * remaining / rate
+
+
+def format_time(seconds):
+    if seconds is None:
+        return "?"
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return "%d s" % seconds
+    if seconds < 3600:
+        return "%d min %d s" % (seconds // 60, seconds % 60)
+    return "%d h %d min" % (seconds // 3600, (seconds % 3600) // 60)
+
+
+def report(done, total, rendered, seconds):
+    """
+    A line with the progress: done of total frames, rendered frames in seconds during this run.
+    """
+    rate = frames_per_minute(rendered, seconds)
+    return "%d of %d frames done, %.1f frames per minute, %s to go" % (done, total, rate, format_time(time_to_go(total - done, rate)))
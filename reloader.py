@@ -0,0 +1,161 @@
+"""
+Reload the modules of this folder only when their source changed.
+
+Blender keeps the modules in memory: when master.py runs run.py again, the modules it imports are the ones of the first run. They used to be reloaded every time, whether they changed or not. reload_changed keeps a hash of the source of each module of this folder (sources) and only reloads the modules whose hash is different, and the modules that import them (directly or through others). This is done in one place, in the order of the imports: a module is reloaded after the modules it imports. Modules that were imported during this run are new anyway, they are not reloaded again.
+
+Which stage of incremental.py uses which modules is in STAGE_MODULES. A stage is built again when one of its modules changed (see stage_code), and only then: a change to materials.py does not make the block again, construction.py is compared by its elements. stage_code uses the hashes of the code that is loaded, not of the files, so a stage is not marked as done with code that isn't loaded yet.
+
+In Blender 2.66 (Python 3.3) importlib has no reload yet, there imp.reload is used.
+
+Copyright Robbert Bloem, 2013
+"""
+
+import hashlib
+import os
+import sys
+
+try:
+    from importlib import reload as reload_module
+except ImportError:
+    # Python 3.3
+    from imp import reload as reload_module
+
+
+# the folder with the modules
+package_dir = os.path.dirname(os.path.abspath(__file__))
+
+# the hash of the source of each module, when it was (re)loaded
+sources = {}
+
+# the modules that were loaded before this module, they may be old
+preloaded = set(sys.modules)
+
+# the modules that build each kind of stage (the functions in incremental.py)
+STAGE_MODULES = {
+    "primitives":["build", "beams", "csg", "spatial"],
+    "proteins":["build", "lod", "vrml"],
+    "pulses":["animation"],
+    "instances":["instancing"],
+    "camera":["build"],
+    "lamps":["build"]
+}
+
+
+def source_hash(name):
+    """
+    The hash of the source file of the module called name, in this folder.
+    """
+    with open(os.path.join(package_dir, name + ".py"), "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def package_modules():
+    """
+    The loaded modules of this folder, by name, without this one.
+    """
+    modules = {}
+    for name, module in list(sys.modules.items()):
+        filename = getattr(module, "__file__", None)
+        if filename is None or name == __name__:
+            continue
+        if os.path.dirname(os.path.abspath(filename)) == package_dir and os.path.exists(os.path.join(package_dir, name + ".py")):
+            modules[name] = module
+    return modules
+
+
+def imports(module, modules):
+    """
+    The names of the modules in modules that module imports at the top.
+    """
+    return sorted(name for name, value in vars(module).items() if name in modules and value is modules[name])
+
+
+def import_order(root, modules):
+    """
+    The names of the modules that root imports, directly or through others, each after the modules it imports. root itself is not in it.
+    """
+    order = []
+    done = set([root.__name__])
+    # depth first, with a stack instead of recursion
+    todo = [(n, False) for n in reversed(imports(root, modules))]
+    while len(todo) > 0:
+        name, expanded = todo.pop()
+        if expanded:
+            order.append(name)
+            continue
+        if name in done:
+            continue
+        done.add(name)
+        todo.append((name, True))
+        todo += [(n, False) for n in reversed(imports(modules[name], modules)) if n not in done]
+    return order
+
+
+def reload(module):
+    """
+    Reload the module, changed or not (like imp.reload). For run.py, that has to run again. Returns the module.
+    """
+    module = reload_module(module)
+    sources[module.__name__] = source_hash(module.__name__)
+    return module
+
+
+def reload_changed(root):
+    """
+    Reload the modules that root uses (the modules of this folder it imports, directly or through others) that changed since they were loaded, and the modules that import them. root is the module that calls this, it is left alone.
+    Returns the names of the reloaded modules.
+    """
+    modules = package_modules()
+    order = import_order(root, modules)
+
+    changed = set()
+    for name in order:
+        current = source_hash(name)
+        if name not in sources and name not in preloaded:
+            # imported during this run, from the current source
+            sources[name] = current
+        elif sources.get(name) != current:
+            changed.add(name)
+
+    reloaded = []
+    for name in order:
+        if name in changed or any(n in reloaded for n in imports(modules[name], modules)):
+            reload_module(modules[name])
+            sources[name] = source_hash(name)
+            reloaded.append(name)
+    if len(reloaded) > 0:
+        print("reloader: %s changed, reloaded %s" % (", ".join(sorted(changed)), ", ".join(reloaded)))
+    return reloaded
+
+
+def reset():
+    """
+    Forget the hashes: all modules are reloaded the next time, like at the start of Blender. For a new bpy (see benchmark.py).
+    """
+    global preloaded
+    sources.clear()
+    preloaded = set(sys.modules)
+
+
+def loaded_hash(name):
+    """
+    The hash of the source of the module called name, as it is loaded. None if it is not loaded, or loaded from an unknown version.
+    """
+    if name not in sources and name in sys.modules and name not in preloaded:
+        # imported during this run
+        sources[name] = source_hash(name)
+    return sources.get(name)
+
+
+def stage_code(kind):
+    """
+    The hashes of the modules of a kind of stage (see STAGE_MODULES), as they are loaded. Part of the state of a stage in incremental.py.
+    """
+    return dict((name, loaded_hash(name)) for name in STAGE_MODULES[kind])
+
+
+def stages(name):
+    """
+    The kinds of stages that are built again when the module called name changes.
+    """
+    return sorted(kind for kind, names in STAGE_MODULES.items() if name in names)
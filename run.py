@@ -6,23 +6,38 @@ Copyright Robbert Bloem, 2013
 
 
 # system
-import imp
 import math
 import os
+import sys
 
 # blender
 import bpy
 import mathutils
 
 # mine
+# first, the modules imported after it are new (see reloader.py)
+import reloader
 import materials
-import construction
+import batch
 import build
-
-# reload to make sure we run the latest version
-imp.reload(materials)
-imp.reload(construction)
-imp.reload(build)
+import cache
+import csg
+import culling
+import incremental
+import instancing
+import presets
+import spec
+import tessellation
+import tracing
+import view
+
+# reload what changed since the last run, to make sure we run the latest version
+reloader.reload_changed(sys.modules[__name__])
+
+# the counters of the modules are for this run, the modules are not always reloaded
+materials.registry_stats.update(created = 0, reused = 0)
+materials.image_stats.update(loaded = 0, reused = 0)
+build.mesh_template_stats.update(hits = 0, misses = 0)
 
 
 ### FLAGS ###
@@ -35,16 +50,92 @@ flag_use_mirror_instead_of_plane = True
 # speeds up the drawing dramatically - use when testing
 flag_no_proteins = False
 
+# read the protein files directly instead of with the x3d importer
+# faster, and the lights in the files are not made
+flag_native_protein_import = True
+
+# keep the proteins in binary files in the cache folder, so the .wrl files are only read once (only with flag_native_protein_import)
+# the cache is used until the .wrl file changes, the folder is kept below protein_cache_size bytes
+flag_protein_cache = True
+protein_cache_size = 1024 * 1024 * 1024
+
+# level of detail of the proteins (only with flag_native_protein_import)
+# "full", "high", "medium", "low", "draft" or "auto" (depends on the size of the protein in the picture)
+protein_quality = "full"
+
 # transparent background
 flag_transparent_background = False
 
+# only build what changed since the last run, instead of everything
+# use this without opening the Blender file again (see incremental.py)
+flag_incremental = False
+
 # size of the non-focus end of the laser beams
 laser_scale_in = 2
 laser_scale_out = 9
 
+# copies of the sample holder (block, channels and proteins), in a grid of assembly_grid[0] by assembly_grid[1], assembly_spacing (x, y) apart
+# the copies are instances, they cost almost no time or memory (see instancing.py)
+# None for just the one
+assembly_grid = None
+assembly_spacing = (40, 40)
+# "group" (an empty that shows a group) or "linked" (linked duplicates)
+instancing_method = "group"
+
+# the outgoing laser beam ends exactly where it hits the plot (see optics.py)
+# otherwise it has a fixed length
+flag_trace_laser = True
+
+# animate laser pulses along the beams, from frame animation_frames[0] to animation_frames[1] (see animation.py)
+# a pulse takes pulse_period frames to go along a beam
+flag_animation = False
+animation_frames = (1, 250)
+pulse_period = 50
+pulses_per_beam = 1
+
+# scale the image of the plot down to the size it has in the picture
+flag_scale_plot_image = True
+
 # switches between two resources
 flag_use_alternate_resources = True
 
+# make the primitives with the data API instead of one operator call per element
+# gives the same result, but much faster for scenes with many elements
+flag_bulk_build = True
+
+# primitives with the same shape share one mesh (only with flag_bulk_build)
+flag_shared_meshes = True
+
+# keep the results of the boolean operations on disk, in the cache folder next to the Blender file
+# the boolean operations are only done again when the elements change
+flag_boolean_cache = True
+
+# ignore the cached boolean results and make them again
+flag_rebuild_boolean_cache = False
+
+# leave objects that don't touch the target out of the boolean operations: join them (union) or skip them (difference), see spatial.py
+# only with flag_boolean_cache (the elements are needed)
+flag_prune_booleans = True
+
+# the order of the unions: "sequential" (one by one into the last element) or "tree" (in pairs, faster for long lists), see csg.py
+boolean_method = "sequential"
+
+# do the unions of the block and the green channel at the same time, each in its own background Blender (see csg.py)
+# only with flag_boolean_cache: the results are loaded from the cache
+flag_parallel_booleans = False
+
+# the number of vertices of cylinders and cones depends on their size in the picture (see tessellation.py)
+# otherwise cylinders have 40 and cones 64, the parts with boolean operations always
+flag_adaptive_tessellation = False
+
+# elements outside the view of the camera: None (build everything), "skip" (don't build them) or "placeholder" (build them cheap)
+# with "skip", they are also gone from the reflections in the mirror and from the shadows (see culling.py)
+culling_mode = None
+
+# measure where the time goes: the time, operator calls and new datablocks of each function in build.py and materials.py
+# saves trace.json next to the Blender file (see tracing.py)
+flag_trace = False
+
 
 ### GENERAL PROPERTIES ###
 
@@ -63,6 +154,31 @@ plot_scale = 10
 # a little bit before the actual middle of the protein
 focus_location = (15, protein_y_offset-1, 0)
 
+# rendering size: x, y and percentage
+# this is not the same as changing the focal length of the camera
+resolution = (1000, 400, 100)
+
+# render quality: "preview", "draft" or "final" (see presets.py)
+render_preset = "final"
+
+# or choose the best render quality that renders within this many seconds (see presets.py)
+# None: use render_preset
+render_time_budget = None
+
+# changes to the camera of construction.define_camera, for example {"loc":(40, -50, 15)}
+camera_settings = {}
+
+# build the scene from a spec file made with spec.py, instead of with construction.py
+# None: use construction.py
+scene_spec_file = None
+
+
+### VARIANTS ###
+
+# batch.py renders variants of the figure: it changes the flags and properties above
+# when run.py is run by hand, nothing changes
+batch.apply_variant(globals())
+
 
 ### WORLD/RENDER PROPERTIES ###
 
@@ -72,21 +188,21 @@ bpy.data.worlds["World"].zenith_color = (0.5,0.5,0.5)
 bpy.data.worlds["World"].exposure = 0.1
 bpy.data.worlds["World"].use_sky_blend = True
 
-# rendering size
-# this is not the same as changing the focal length of the camera
-bpy.context.scene.render.resolution_x = 1000 
-bpy.context.scene.render.resolution_y = 400 
-bpy.context.scene.render.resolution_percentage = 100
+# rendering size (see resolution above)
+bpy.context.scene.render.resolution_x = resolution[0]
+bpy.context.scene.render.resolution_y = resolution[1]
+bpy.context.scene.render.resolution_percentage = resolution[2]
 
-# high quality anti aliasing
-bpy.context.scene.render.antialiasing_samples = "16"
-bpy.context.scene.render.use_full_sample = True
+# anti aliasing and the other settings for the quality are set by the render preset, at the end
 
 # if you want a transparent background, do not render the sky. Also set to save the image with an alpha channel. 
 if flag_transparent_background:
     bpy.context.scene.render.layers["RenderLayer"].use_sky = False
     bpy.data.scenes["Scene"].render.image_settings.color_mode = "RGBA"
 
+# the cache for results that take long to make (see cache.py)
+cache.cache_dir = os.path.join(os.path.dirname(bpy.data.filepath), "cache")
+
 # find the correct resource folder
 path = os.path.dirname(bpy.data.filepath)
 if flag_use_alternate_resources:
@@ -95,93 +211,177 @@ else:
     resources_path = path + "/res/"
 
 
+### TRACING ###
+
+if flag_trace:
+    tracing.start()
+
+
+### SCENE SPEC ###
+
+# everything construction.py defines, in one dictionary (see spec.py)
+if scene_spec_file is None:
+    scene = spec.make_spec(globals())
+else:
+    scene = spec.load(scene_spec_file)
+parts = scene["parts"]
+camera = parts["camera"]
+print("scene spec %s" % spec.spec_hash(scene))
+
+# the parts with boolean operations, their cylinders need enough vertices
+boolean_parts = ["block", "green_channel", "blue_channel"]
+
+# in incremental mode, only what changed since the last run is built (see incremental.py)
+incremental.begin(flag_incremental)
+
+# fewer vertices for cylinders that are small in the picture
+# not for the parts with boolean operations, their cylinders have to line up
+# in incremental mode they are not made smaller, so that moving the camera doesn't make them again
+previous_vertices = incremental.previous_vertices() if flag_incremental else None
+if flag_adaptive_tessellation:
+    for name in parts:
+        if name not in boolean_parts:
+            parts[name] = tessellation.adapt(parts[name], camera, resolution, previous = previous_vertices)
+
+# leave out what the camera doesn't see, the parts with boolean operations stay complete
+culled = []
+if culling_mode is not None:
+    for name in parts:
+        if name not in boolean_parts:
+            parts[name], hidden = culling.cull(parts[name], camera, resolution, culling_mode)
+            culled += hidden
+
+
 ### MAKE STUFF ###
 
+# the unions that don't depend on each other, at the same time
+if flag_parallel_booleans and flag_boolean_cache and not flag_rebuild_boolean_cache:
+    csg.prefill(csg.holder_jobs(parts, boolean_method, flag_prune_booleans), bpy.app.binary_path, bpy.data.filepath)
+
 # block
-block = construction.define_block(
-    y_scale = y_scale
-)
+block = parts["block"]
 block_material = materials.material_block() 
-name_list = build.add_primitives(
+incremental.primitives(
+    "block", 
     block, 
-    block_material
-)
-build.boolean_modifier(
-    name_list, 
-    operation = "UNION"
+    block_material, 
+    bulk = flag_bulk_build, 
+    shared = flag_shared_meshes, 
+    booleans = [{
+        "operation":"UNION", 
+        "elements":block if flag_boolean_cache else None, 
+        "rebuild":flag_rebuild_boolean_cache, 
+        "prune":flag_prune_booleans, 
+        "method":boolean_method
+    }]
 )
 
 # green channel
-green_channel = construction.define_green_channel(
-    y_scale = y_scale
-)
+green_channel = parts["green_channel"]
 green_channel_material = materials.material_green_water()
-name_list = build.add_primitives(
+incremental.primitives(
+    "green_channel", 
     green_channel, 
-    green_channel_material
-)
-build.boolean_modifier(
-    name_list, 
-    operation = "UNION"
+    green_channel_material, 
+    bulk = flag_bulk_build, 
+    shared = flag_shared_meshes, 
+    booleans = [{
+        "operation":"UNION", 
+        "elements":green_channel if flag_boolean_cache else None, 
+        "rebuild":flag_rebuild_boolean_cache, 
+        "prune":flag_prune_booleans, 
+        "method":boolean_method
+    }]
 )
 
 # blue channel
-blue_channel = construction.define_blue_channel(
-    y_scale = y_scale
-)
+blue_channel = parts["blue_channel"]
 blue_channel_material = materials.material_blue_water()
-name_list = build.add_primitives(
+incremental.primitives(
+    "blue_channel", 
     blue_channel, 
-    blue_channel_material
-)
-build.boolean_modifier(
-    ["green_2m", "block_1m", "blue_1"], 
-    operation = "DIFFERENCE", 
-    hide_after_mod = False
+    blue_channel_material, 
+    bulk = flag_bulk_build, 
+    shared = flag_shared_meshes, 
+    booleans = [{
+        "name_list":["green_2m", "block_1m", "blue_1"], 
+        "operation":"DIFFERENCE", 
+        "hide_after_mod":False, 
+        "elements":(block + green_channel + blue_channel) if flag_boolean_cache else None, 
+        "rebuild":flag_rebuild_boolean_cache, 
+        "prune":flag_prune_booleans, 
+        "method":boolean_method
+    }], 
+    depends = ["block", "green_channel"]
 )
 
 # the plot
-if flag_use_mirror_instead_of_plane:
+# how big is the plot in the picture? the image doesn't have to be bigger than that
+# rounded to a power of 2, so that moving the camera a bit gives the same material and image
+if flag_scale_plot_image:
+    plot_pixels = materials.image_size(float(view.projected_size(
+        [(plot_loc[0]+2, plot_loc[1], plot_loc[2])], 
+        [math.sqrt(2) * plot_scale], 
+        camera, 
+        resolution
+    )[0]))
+else:
+    plot_pixels = None
+if "mirror" in parts:
     # mirror
     material_plot = materials.material_plot(
         transparent = True, 
-        resources_path = resources_path
+        resources_path = resources_path, 
+        max_size = plot_pixels
     )
     material_black = materials.make_beamblock_material()
     material_gold = materials.make_gold_material()
     material_mirror_mount = materials.make_mirror_mount_material()
-    mirror, black, plot, mirror_mount = construction.define_mirror(
-        plot_loc = (plot_loc[0]+2, plot_loc[1], plot_loc[2]), 
-        plot_scale = plot_scale
-    )
-    name_list = build.add_primitives(
+    mirror = parts["mirror"]
+    black = parts["black"]
+    plot = parts["plot"]
+    mirror_mount = parts["mirror_mount"]
+    incremental.primitives(
+        "mirror", 
         mirror, 
-        material_gold
+        material_gold, 
+        bulk = flag_bulk_build, 
+        shared = flag_shared_meshes
     )
-    name_list = build.add_primitives(
+    incremental.primitives(
+        "plot", 
         plot, 
-        material_plot
+        material_plot, 
+        bulk = flag_bulk_build, 
+        shared = flag_shared_meshes
     )
-    name_list = build.add_primitives(
+    incremental.primitives(
+        "black", 
         black, 
-        material_black
+        material_black, 
+        bulk = flag_bulk_build, 
+        shared = flag_shared_meshes
     )
-    name_list = build.add_primitives(
+    incremental.primitives(
+        "mirror_mount", 
         mirror_mount, 
-        material_mirror_mount
+        material_mirror_mount, 
+        bulk = flag_bulk_build, 
+        shared = flag_shared_meshes
     )
 else:
     # plane
     material_plot = materials.material_plot(
-        resources_path = resources_path
+        resources_path = resources_path, 
+        max_size = plot_pixels
     )
-    plot_plane = construction.define_plot_plane(
-        loc = (plot_loc[0]+2, plot_loc[1], plot_loc[2]), 
-        scale = plot_scale
-    )
-    name_list = build.add_primitives(
+    plot_plane = parts["plot_plane"]
+    incremental.primitives(
+        "plot_plane", 
         plot_plane, 
-        material = material_plot
+        material_plot, 
+        bulk = flag_bulk_build, 
+        shared = flag_shared_meshes
     )
 
 # laser pulses
@@ -191,44 +391,117 @@ material_laser_in = materials.material_laser(
 material_laser_out = materials.material_laser(
     out = True
 )
-laser_focus = construction.define_laser_focus(
-    focus_location = focus_location
-)
-laser = construction.define_laser(
-    focus_location = focus_location, 
-    plot_loc = plot_loc
-)
-build.build_laser(
+laser_focus = parts["laser_focus"]
+laser = parts["laser"]
+# the cones between the start points and the focus, see build.build_laser
+beams = build.laser_primitives(
     laser = laser, 
     laser_focus = laser_focus, 
-    material_laser_in = material_laser_in, 
-    material_laser_out = material_laser_out, 
     scale_in = laser_scale_in, 
     scale_out = laser_scale_out
 )
+if flag_adaptive_tessellation:
+    beams = tessellation.adapt(
+        beams, 
+        camera, 
+        resolution, 
+        previous = previous_vertices
+    )
+if culling_mode is not None:
+    beams, hidden = culling.cull(beams, camera, resolution, culling_mode)
+    culled += hidden
+if len(culled) > 0:
+    print("culling (%s): outside the view: %s" % (culling_mode, ", ".join(culled)))
+incremental.primitives(
+    "laser_in", 
+    [b for b in beams if b["mat"] == "in"], 
+    material_laser_in, 
+    bulk = flag_bulk_build, 
+    shared = flag_shared_meshes
+)
+incremental.primitives(
+    "laser_out", 
+    [b for b in beams if b["mat"] == "out"], 
+    material_laser_out, 
+    bulk = flag_bulk_build, 
+    shared = flag_shared_meshes
+)
+
+# pulses along the beams
+if flag_animation:
+    incremental.pulses(
+        "pulses", 
+        laser, 
+        laser_focus, 
+        frame_start = animation_frames[0], 
+        frame_end = animation_frames[1], 
+        period = pulse_period, 
+        pulses_per_beam = pulses_per_beam
+    )
 
 # proteins
-if not flag_no_proteins:
-    proteins = construction.define_proteins(
-        y_offset = protein_y_offset,
-        resources_path = resources_path
+if "proteins" in parts:
+    proteins = parts["proteins"]
+    incremental.proteins(
+        "proteins", 
+        proteins = proteins, 
+        native = flag_native_protein_import, 
+        cached = flag_protein_cache, 
+        cache_size = protein_cache_size, 
+        quality = protein_quality, 
+        # only "auto" uses the camera, otherwise moving the camera would read the proteins again
+        camera = camera if protein_quality == "auto" else None, 
+        resolution = resolution if protein_quality == "auto" else None
     )
-    build.make_proteins(
-        proteins = proteins
+
+
+# copies of the sample holder and the proteins
+if "instances" in parts:
+    incremental.instances(
+        "instances", 
+        [e["id"] for e in block + green_channel + blue_channel + parts.get("proteins", [])], 
+        parts["instances"], 
+        method = instancing_method, 
+        depends = ["block", "green_channel", "blue_channel", "proteins"]
     )
+else:
+    # the group of an earlier run, in incremental mode
+    instancing.remove_group("instances")
 
 
 ### POSITION CAMERAS AND LAMPS ###
 
 # camera properties
-camera = construction.define_camera()
-build.location_camera(
+incremental.camera(
+    "camera", 
     camera
 )
 
 # lamp properties
-lamps = construction.define_lamps()
-build.make_lamps(
+lamps = parts["lamps"]
+incremental.lamps(
+    "lamps", 
     lamps
 )
 
+incremental.end()
+
+
+### RENDER QUALITY ###
+
+# anti aliasing, size, reflections, shadows and raytracing of the proteins, all together
+protein_ids = [p["id"] for p in parts.get("proteins", [])]
+if render_time_budget is not None:
+    render_preset = presets.choose(render_time_budget, resolution, protein_ids)
+presets.apply(render_preset, resolution, protein_ids)
+
+# how often were meshes shared?
+if flag_shared_meshes:
+    build.mesh_cache_stats()
+
+# remove materials and textures that are not used (anymore)
+removed = materials.collect_garbage()
+materials.registry_report(removed)
+
+if flag_trace:
+    tracing.stop(os.path.join(path, "trace.json"))
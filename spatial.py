@@ -0,0 +1,184 @@
+"""
+Which elements touch each other? Bounding boxes and a bounding volume hierarchy (BVH) for the elements of construction.py, without Blender.
+
+Each element gets an axis aligned bounding box (AABB), from its shape, loc, rot and scale (boxes). The boxes of a rotated element are a bit bigger than the element, so two boxes can touch while the elements don't, never the other way around.
+
+The BVH (make_bvh) is a tree of boxes: each node has the box around its elements, the leaves have at most LEAF_SIZE elements. A query (query) only looks at the nodes whose box touches the box that is asked for, so finding what touches something takes about log(n) steps instead of n. With thousands of elements, groups (the sets of elements that touch each other, directly or through others) is quick.
+
+Boolean operations (see build.boolean_modifier with prune) use this to leave out what doesn't matter (plan_booleans):
+- a union with an element that doesn't touch the target: the meshes are simply joined, no boolean operation is needed
+- a difference with an element that doesn't touch the target: nothing changes, the element is skipped
+The objects of a difference are often the result of an earlier union (block_1m holds the whole block), their element alone is too small. For those, the box comes from the vertices of their mesh (mesh_box).
+Boxes that touch within TOLERANCE count as touching, so faces that lie against each other still get a boolean operation.
+
+Copyright Robbert Bloem, 2013
+"""
+
+import numpy
+
+import culling
+import view
+
+
+# boxes closer than this touch
+TOLERANCE = 1e-3
+
+# the largest number of elements in a leaf of the BVH
+LEAF_SIZE = 8
+
+
+def element_matrix(e):
+    """
+    The 4 x 4 matrix of the loc, rot and scale of an element: from the coordinates of the mesh to the world.
+    """
+    m = numpy.identity(4)
+    m[:3,:3] = view.euler_to_matrix(e.get("rot", (0,0,0))) * numpy.asarray(e.get("scale", (1,1,1)), dtype = float)
+    m[:3,3] = e["loc"]
+    return m
+
+
+def boxes(elements):
+    """
+    The bounding boxes of the elements: two n x 3 arrays with the lowest and the highest corners.
+    Elements without a shape are cubes, like in build.add_primitive.
+    """
+    n = len(elements)
+    if n == 0:
+        return numpy.zeros((0, 3)), numpy.zeros((0, 3))
+    half = numpy.array([culling.half_size(dict(e, shape = e.get("shape", "cube"))) for e in elements], dtype = float)
+    loc = numpy.array([e["loc"] for e in elements], dtype = float)
+    scale = numpy.array([e.get("scale", (1,1,1)) for e in elements], dtype = float)
+    m = view.euler_to_matrix(numpy.array([e.get("rot", (0,0,0)) for e in elements], dtype = float))
+    # the half size of the box around the rotated and scaled box
+    extent = numpy.einsum("nij,nj->ni", numpy.abs(m * scale[:,numpy.newaxis,:]), half)
+    return loc - extent, loc + extent
+
+
+def mesh_box(vertices, e):
+    """
+    The bounding box of the mesh of the object of element e: the lowest and the highest corner. vertices (n x 3) are in the coordinates of the mesh.
+    """
+    m = element_matrix(e)
+    world = numpy.dot(numpy.asarray(vertices, dtype = float).reshape((-1, 3)), m[:3,:3].T) + m[:3,3]
+    return world.min(axis = 0), world.max(axis = 0)
+
+
+def touch(lo1, hi1, lo2, hi2, tolerance = TOLERANCE):
+    """
+    Do the boxes touch? Works for arrays of boxes as well.
+    """
+    return numpy.all((lo1 <= hi2 + tolerance) & (lo2 <= hi1 + tolerance), axis = -1)
+
+
+def make_bvh(lo, hi, leaf_size = LEAF_SIZE):
+    """
+    The BVH of the boxes, as a dictionary with arrays. The nodes are split in the middle of their longest side (by the median of the centres).
+    """
+    lo = numpy.asarray(lo, dtype = float)
+    hi = numpy.asarray(hi, dtype = float)
+    order = numpy.arange(len(lo))
+    centres = (lo + hi) / 2
+    nodes = {"lo":[], "hi":[], "left":[], "right":[], "start":[], "end":[]}
+
+    # with a stack instead of recursion, for big trees
+    nodes_todo = [(0, len(lo), -1, None)]
+    while len(nodes_todo) > 0:
+        start, end, parent, side = nodes_todo.pop()
+        i = len(nodes["lo"])
+        index = order[start:end]
+        nodes["lo"].append(lo[index].min(axis = 0) if end > start else numpy.zeros(3))
+        nodes["hi"].append(hi[index].max(axis = 0) if end > start else numpy.zeros(3))
+        nodes["left"].append(-1)
+        nodes["right"].append(-1)
+        nodes["start"].append(start)
+        nodes["end"].append(end)
+        if parent >= 0:
+            nodes[side][parent] = i
+        if end - start > leaf_size:
+            spread = centres[index].max(axis = 0) - centres[index].min(axis = 0)
+            axis = numpy.argmax(spread)
+            order[start:end] = index[numpy.argsort(centres[index, axis], kind = "mergesort")]
+            middle = (start + end) // 2
+            nodes_todo.append((middle, end, i, "right"))
+            nodes_todo.append((start, middle, i, "left"))
+
+    bvh = dict((k, numpy.array(v)) for k, v in nodes.items())
+    bvh["order"] = order
+    bvh["boxes"] = (lo, hi)
+    return bvh
+
+
+def query(bvh, lo, hi, tolerance = TOLERANCE):
+    """
+    The indices of the boxes in the BVH that touch the box lo, hi.
+    """
+    lo = numpy.asarray(lo, dtype = float)
+    hi = numpy.asarray(hi, dtype = float)
+    box_lo, box_hi = bvh["boxes"]
+    result = []
+    stack = [0]
+    while len(stack) > 0:
+        i = stack.pop()
+        if not touch(bvh["lo"][i], bvh["hi"][i], lo, hi, tolerance):
+            continue
+        if bvh["left"][i] < 0:
+            index = bvh["order"][bvh["start"][i]:bvh["end"][i]]
+            result += index[touch(box_lo[index], box_hi[index], lo, hi, tolerance)].tolist()
+        else:
+            stack += [bvh["left"][i], bvh["right"][i]]
+    return sorted(result)
+
+
+def groups(lo, hi, tolerance = TOLERANCE):
+    """
+    Split the boxes in groups that touch each other, directly or through other boxes. Returns a list of lists of indices, in the order of the boxes.
+    """
+    n = len(lo)
+    bvh = make_bvh(lo, hi)
+    parent = numpy.arange(n)
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i in range(n):
+        for j in query(bvh, lo[i], hi[i], tolerance):
+            a, b = find(i), find(j)
+            if a != b:
+                parent[max(a, b)] = min(a, b)
+
+    result = {}
+    for i in range(n):
+        result.setdefault(find(i), []).append(i)
+    return sorted(result.values())
+
+
+def plan_booleans(elements, name_list, operation = "UNION", tolerance = TOLERANCE, vertices = None):
+    """
+    What to do with each operand of build.boolean_modifier: "boolean", "join" or "skip" (see above), as a dictionary by name.
+    elements are the elements of the objects in name_list, the target is the last one. The order of the operations stays the same.
+    vertices: the vertices of the meshes of (some of) the objects, as a dictionary by name. These objects get the box of their mesh instead of the box of their element.
+    """
+    by_id = dict((e["id"], e) for e in elements)
+    names = name_list[:-1]
+    lo, hi = boxes([by_id[n] for n in name_list])
+    if vertices is not None:
+        for i, n in enumerate(name_list):
+            if len(vertices.get(n, ())) > 0:
+                lo[i], hi[i] = mesh_box(vertices[n], by_id[n])
+    target = len(name_list) - 1
+    bvh = make_bvh(lo, hi)
+
+    plan = {}
+    for i, n in enumerate(names):
+        touching = query(bvh, lo[i], hi[i], tolerance)
+        if operation == "UNION":
+            # the target has grown with the objects before this one
+            plan[n] = "boolean" if any(j < i or j == target for j in touching) else "join"
+        elif operation == "DIFFERENCE":
+            plan[n] = "boolean" if target in touching else "skip"
+        else:
+            plan[n] = "boolean"
+    return plan
@@ -0,0 +1,371 @@
+"""
+The scene spec: everything construction.py defines for one figure, in one dictionary, without Blender.
+
+A spec looks like this:
+{
+    "version":1,
+    "order":["block", "green_channel", ...],
+    "parts":{
+        "block":[{"id":"block_2m", "loc":[9.5, 0, -5], "scale":[0.5, 1.01, 4]}, ...],
+        "lamps":[...],
+        ...
+    }
+}
+The parts are the lists from the construction.define_* functions, order is the order in which run.py builds them. Tuples are lists, like in JSON.
+
+A spec is checked with validate(): the elements must have a unique id and only known properties of the right type. It can be saved as JSON (readable, for diffs) or as a compact binary file (compressed, to send it somewhere). The hash (spec_hash) is the same for the same scene, whatever the file format.
+
+run.py makes the spec with make_spec and builds the scene from it. It can also build the scene from a file (scene_spec_file in run.py).
+
+Usage outside Blender:
+python spec.py make scene.spec                     the spec with the flags and properties of run.py
+python spec.py make scene.json --variant variants.json:close     with the changes of a variant (see batch.py)
+python spec.py hash scene.spec
+python spec.py validate scene.json
+python spec.py diff old.spec new.spec
+
+Copyright Robbert Bloem, 2013
+"""
+
+import argparse
+import ast
+import json
+import os
+import sys
+import zlib
+
+import cache
+import construction
+
+
+# change this when the format changes, old files are refused
+VERSION = 1
+
+# the first bytes of the binary format
+MAGIC = b"BDSPEC"
+
+# the known properties of the elements and their type
+# 'vector' is 3 numbers
+PROPERTIES = {
+    "id":"string",
+    "loc":"vector",
+    "start":"vector",
+    "rot":"vector",
+    "scale":"vector",
+    "color":"vector",
+    "shape":"string",
+    "radius":"number",
+    "depth":"number",
+    "vertices":"integer",
+    "mat":"string",
+    "filename":"string",
+    "type":"string",
+    "energy":"number",
+    "distance":"number",
+    "spot_size":"number",
+    "focus":"number",
+    "clip_end":"number",
+}
+
+# the shapes build.add_primitive can make
+SHAPES = ["cube", "cylinder", "cone", "plane"]
+
+# the folder with run.py
+package_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_settings(filename = None):
+    """
+    The flags and properties of run.py, without running it (it needs Blender).
+    Only the assignments at the top level that can be evaluated are used, up to the variants.
+    """
+    if filename is None:
+        filename = os.path.join(package_dir, "run.py")
+    with open(filename) as f:
+        tree = ast.parse(f.read(), filename)
+    settings = {}
+    for node in tree.body:
+        if isinstance(node, ast.Expr) and "apply_variant" in ast.dump(node):
+            break
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            try:
+                value = eval(compile(ast.Expression(node.value), filename, "eval"), {}, dict(settings))
+            except Exception:
+                continue
+            settings[node.targets[0].id] = value
+    return settings
+
+
+def read_variants(filename):
+    """
+    Read the variants (see batch.py) from a JSON file. Variants without a name are called variant_0, variant_1 etc.
+    """
+    with open(filename) as f:
+        variants = json.load(f)
+    names = set()
+    for i, v in enumerate(variants):
+        if "name" not in v:
+            v["name"] = "variant_%d" % i
+        if v["name"] in names:
+            raise ValueError("variant name '%s' is used twice" % v["name"])
+        names.add(v["name"])
+    return variants
+
+
+def apply_variant(settings, v):
+    """
+    Change the flags and properties in settings (the globals() of run.py, or run_settings()) to those of the variant v.
+    Names that do not exist are an error, to catch typos in the variants file.
+    """
+    for key, value in v.items():
+        if key == "name":
+            continue
+        if key not in settings:
+            raise KeyError("variant '%s': run.py has no flag or property '%s'" % (v.get("name"), key))
+        # JSON has no tuples
+        if isinstance(value, list):
+            value = tuple(value)
+        settings[key] = value
+    return v
+
+
+def resources(settings):
+    """
+    The resource folder, like in run.py.
+    """
+    if "resources_path" in settings:
+        return settings["resources_path"]
+    if settings["flag_use_alternate_resources"]:
+        return os.path.join(package_dir, "res_alt") + "/"
+    return os.path.join(package_dir, "res") + "/"
+
+
+def make_spec(settings):
+    """
+    Make the spec with the flags and properties in settings (the globals() of run.py, or run_settings()).
+    """
+    parts = []
+    parts.append(("block", construction.define_block(y_scale = settings["y_scale"])))
+    parts.append(("green_channel", construction.define_green_channel(y_scale = settings["y_scale"])))
+    parts.append(("blue_channel", construction.define_blue_channel(y_scale = settings["y_scale"])))
+
+    plot_loc = settings["plot_loc"]
+    if settings["flag_use_mirror_instead_of_plane"]:
+        mirror, black, plot, mirror_mount = construction.define_mirror(
+            plot_loc = (plot_loc[0]+2, plot_loc[1], plot_loc[2]),
+            plot_scale = settings["plot_scale"]
+        )
+        parts += [("mirror", mirror), ("plot", plot), ("black", black), ("mirror_mount", mirror_mount)]
+        targets = plot + mirror + black
+        mirrors = [e["id"] for e in mirror]
+    else:
+        plot_plane = construction.define_plot_plane(
+            loc = (plot_loc[0]+2, plot_loc[1], plot_loc[2]),
+            scale = settings["plot_scale"]
+        )
+        parts.append(("plot_plane", plot_plane))
+        targets = plot_plane
+        mirrors = []
+
+    parts.append(("laser_focus", construction.define_laser_focus(focus_location = settings["focus_location"])))
+    parts.append(("laser", construction.define_laser(
+        focus_location = settings["focus_location"],
+        plot_loc = plot_loc,
+        targets = targets if settings["flag_trace_laser"] else None,
+        mirrors = mirrors
+    )))
+
+    if not settings["flag_no_proteins"]:
+        parts.append(("proteins", construction.define_proteins(
+            y_offset = settings["protein_y_offset"],
+            resources_path = resources(settings)
+        )))
+
+    if settings["assembly_grid"] is not None:
+        parts.append(("instances", construction.define_grid(
+            nx = settings["assembly_grid"][0],
+            ny = settings["assembly_grid"][1],
+            spacing = settings["assembly_spacing"]
+        )))
+
+    camera = construction.define_camera()
+    camera[0].update(settings.get("camera_settings", {}))
+    parts.append(("camera", camera))
+    parts.append(("lamps", construction.define_lamps()))
+
+    spec = {
+        "version":VERSION,
+        "order":[name for name, elements in parts],
+        "parts":normalize(dict(parts))
+    }
+    validate(spec)
+    return spec
+
+
+def normalize(x):
+    """
+    Tuples to lists, like JSON gives them back.
+    """
+    return json.loads(json.dumps(x))
+
+
+def is_number(x):
+    return isinstance(x, (int, float)) and not isinstance(x, bool)
+
+
+def check_type(value, kind):
+    if kind == "string":
+        return isinstance(value, str)
+    if kind == "number":
+        return is_number(value)
+    if kind == "integer":
+        return isinstance(value, int) and not isinstance(value, bool)
+    if kind == "vector":
+        return isinstance(value, (list, tuple)) and len(value) == 3 and all(is_number(v) for v in value)
+    return False
+
+
+def validate(spec):
+    """
+    Check a spec. Raises a ValueError with all the problems.
+    """
+    problems = []
+    if spec.get("version") != VERSION:
+        raise ValueError("spec version %s, this is version %d" % (spec.get("version"), VERSION))
+    parts = spec.get("parts", {})
+    for name in spec.get("order", []):
+        if name not in parts:
+            problems.append("part '%s' is in the order, but not in the parts" % name)
+    ids = set()
+    for name, elements in parts.items():
+        if not isinstance(elements, list):
+            problems.append("%s: should be a list of elements" % name)
+            continue
+        for i, e in enumerate(elements):
+            where = "%s[%d]" % (name, i)
+            if not isinstance(e, dict):
+                problems.append("%s: should be a dictionary" % where)
+                continue
+            if "id" not in e:
+                problems.append("%s: has no id" % where)
+            elif e["id"] in ids:
+                problems.append("%s: id '%s' is used twice" % (where, e["id"]))
+            else:
+                ids.add(e["id"])
+                where = "%s '%s'" % (name, e["id"])
+            for key, value in e.items():
+                if key not in PROPERTIES:
+                    problems.append("%s: unknown property '%s'" % (where, key))
+                elif not check_type(value, PROPERTIES[key]):
+                    problems.append("%s: '%s' should be a %s, not %r" % (where, key, PROPERTIES[key], value))
+            if "shape" in e and e["shape"] not in SHAPES:
+                problems.append("%s: unknown shape '%s'" % (where, e["shape"]))
+    if len(problems) > 0:
+        raise ValueError("invalid spec:\n" + "\n".join(problems))
+
+
+def spec_hash(spec):
+    """
+    The hash of a spec: the same scene gives the same hash.
+    """
+    return cache.make_key("spec", spec)
+
+
+def dumps(spec, binary = False):
+    """
+    The spec as a JSON string, or with binary as compressed bytes with a header.
+    """
+    if not binary:
+        return json.dumps(spec, indent = 2, sort_keys = True)
+    data = json.dumps(spec, separators = (",", ":"), sort_keys = True).encode("utf-8")
+    return MAGIC + bytes([VERSION]) + zlib.compress(data, 9)
+
+
+def loads(data):
+    """
+    Read a spec from a JSON string or from bytes (JSON or binary) and check it.
+    """
+    if isinstance(data, bytes):
+        if data[:len(MAGIC)] == MAGIC:
+            version = data[len(MAGIC)]
+            if version != VERSION:
+                raise ValueError("spec version %d, this is version %d" % (version, VERSION))
+            data = zlib.decompress(data[len(MAGIC)+1:])
+        data = data.decode("utf-8")
+    spec = json.loads(data)
+    validate(spec)
+    return spec
+
+
+def save(spec, filename):
+    """
+    Save a spec. Files that end with .json are JSON, the others are binary.
+    """
+    binary = not filename.endswith(".json")
+    with open(filename, "wb") as f:
+        data = dumps(spec, binary)
+        if not binary:
+            data = data.encode("utf-8")
+        f.write(data)
+
+
+def load(filename):
+    with open(filename, "rb") as f:
+        return loads(f.read())
+
+
+def diff(old, new):
+    """
+    The differences between two specs, per part: the ids of the elements that were added, removed or changed.
+    """
+    result = {}
+    for name in sorted(set(old["parts"]) | set(new["parts"])):
+        o = dict((e["id"], e) for e in old["parts"].get(name, []))
+        n = dict((e["id"], e) for e in new["parts"].get(name, []))
+        d = {
+            "added":[i for i in n if i not in o],
+            "removed":[i for i in o if i not in n],
+            "changed":[i for i in n if i in o and n[i] != o[i]]
+        }
+        if any(len(v) > 0 for v in d.values()):
+            result[name] = d
+    return result
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description = "Make, check and compare scene specs.")
+    parser.add_argument("command", choices = ["make", "hash", "validate", "diff"])
+    parser.add_argument("files", nargs = "+", help = "the spec file(s), .json for JSON, binary otherwise")
+    parser.add_argument("--variant", default = None, help = "with make: variants file and name, like variants.json:close")
+    args = parser.parse_args(argv)
+
+    if args.command == "make":
+        settings = run_settings()
+        if args.variant is not None:
+            variants_file, name = args.variant.rsplit(":", 1)
+            variants = dict((v["name"], v) for v in read_variants(variants_file))
+            apply_variant(settings, variants[name])
+        spec = make_spec(settings)
+        save(spec, args.files[0])
+        print("%s: %d parts, %d elements, hash %s" % (args.files[0], len(spec["parts"]), sum(len(p) for p in spec["parts"].values()), spec_hash(spec)))
+    elif args.command == "hash":
+        for filename in args.files:
+            print("%s  %s" % (spec_hash(load(filename)), filename))
+    elif args.command == "validate":
+        for filename in args.files:
+            load(filename)
+            print("%s: ok" % filename)
+    elif args.command == "diff":
+        if len(args.files) != 2:
+            parser.error("diff needs two files")
+        d = diff(load(args.files[0]), load(args.files[1]))
+        if len(d) == 0:
+            print("no differences")
+        for name, changes in d.items():
+            for kind in ["added", "removed", "changed"]:
+                if len(changes[kind]) > 0:
+                    print("%s %s: %s" % (name, kind, ", ".join(changes[kind])))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,975 @@
+"""
+A small stand-in for bpy and mathutils, to run build.py and materials.py outside Blender.
+It only knows the parts of the API that this package uses. Nothing is drawn: objects, meshes and materials are plain Python objects. Every operator call and every new datablock is recorded, so it can be used to profile the build pipeline (see benchmark.py).
+
+Usage:
+    import stub_bpy
+    stub_bpy.install()
+    bpy.data.filepath = "/some/folder/blender.blend"
+    import run
+
+Images are not read, but PNG files get their real size.
+
+Copyright Robbert Bloem, 2013
+"""
+
+import math
+import os
+import sys
+import types
+
+import numpy
+
+import png
+
+
+# what happened: operator calls and datablocks made
+calls = {}
+allocations = {}
+
+
+def record(table, key, n = 1):
+    table[key] = table.get(key, 0) + n
+
+
+def reset_counters():
+    calls.clear()
+    allocations.clear()
+
+
+### MATHUTILS ###
+
+class Vector(object):
+    def __init__(self, seq = (0,0,0)):
+        self._v = [float(x) for x in seq]
+
+    def __len__(self):
+        return len(self._v)
+
+    def __getitem__(self, i):
+        return self._v[i]
+
+    def __setitem__(self, i, value):
+        self._v[i] = float(value)
+
+    def __iter__(self):
+        return iter(self._v)
+
+    def __repr__(self):
+        return "Vector(%s)" % (tuple(self._v),)
+
+    def __add__(self, other):
+        return Vector([a + b for a, b in zip(self, other)])
+
+    def __sub__(self, other):
+        return Vector([a - b for a, b in zip(self, other)])
+
+    def __mul__(self, other):
+        if isinstance(other, (int, float)):
+            return Vector([a * other for a in self])
+        return sum(a * b for a, b in zip(self, other))
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return Vector([-a for a in self])
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    x = property(lambda self: self._v[0])
+    y = property(lambda self: self._v[1])
+    z = property(lambda self: self._v[2])
+
+    @property
+    def length(self):
+        return math.sqrt(sum(a * a for a in self._v))
+
+    def dot(self, other):
+        return sum(a * b for a, b in zip(self, other))
+
+    def cross(self, other):
+        a, b = self._v, list(other)
+        return Vector((a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0]))
+
+    def normalized(self):
+        l = self.length
+        if l == 0:
+            return Vector(self._v)
+        return Vector([a / l for a in self._v])
+
+    def copy(self):
+        return Vector(self._v)
+
+    def rotation_difference(self, other):
+        # same algorithm as rotation_between_vecs_to_quat in Blender
+        v1 = self.normalized()
+        v2 = Vector(other).normalized()
+        axis = v1.cross(v2)
+        if axis.length < 1e-12:
+            # parallel or anti-parallel, any perpendicular axis will do
+            if v1.dot(v2) > 0:
+                return Quaternion((1, 0, 0, 0))
+            axis = v1.cross(Vector((1, 0, 0)))
+            if axis.length < 1e-6:
+                axis = v1.cross(Vector((0, 1, 0)))
+        axis = axis.normalized()
+        angle = math.acos(max(-1.0, min(1.0, v1.dot(v2))))
+        return Quaternion(axis, angle)
+
+
+class Quaternion(object):
+    def __init__(self, seq = (1,0,0,0), angle = None):
+        if angle is None:
+            self.w, self.x, self.y, self.z = [float(a) for a in seq]
+        else:
+            s = math.sin(angle / 2)
+            self.w = math.cos(angle / 2)
+            self.x, self.y, self.z = [float(a) * s for a in seq]
+
+    def to_matrix(self):
+        w, x, y, z = self.w, self.x, self.y, self.z
+        return Matrix((
+            (1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)),
+            (2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)),
+            (2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)),
+        ))
+
+    def to_euler(self, order = "XYZ"):
+        return self.to_matrix().to_euler(order)
+
+
+class Matrix(object):
+    def __init__(self, rows = ((1,0,0),(0,1,0),(0,0,1))):
+        self.rows = [list(r) for r in rows]
+
+    def __getitem__(self, i):
+        return self.rows[i]
+
+    def to_euler(self, order = "XYZ"):
+        # mat3_to_eul in Blender: of the two solutions, take the smallest
+        m = self.rows
+        cy = math.hypot(m[0][0], m[1][0])
+        if cy > 16 * 1.19e-7:
+            e1 = (math.atan2(m[2][1], m[2][2]), math.atan2(-m[2][0], cy), math.atan2(m[1][0], m[0][0]))
+            e2 = (math.atan2(-m[2][1], -m[2][2]), math.atan2(-m[2][0], -cy), math.atan2(-m[1][0], -m[0][0]))
+            if sum(abs(a) for a in e1) > sum(abs(a) for a in e2):
+                return Euler(e2)
+            return Euler(e1)
+        return Euler((math.atan2(-m[1][2], m[1][1]), math.atan2(-m[2][0], cy), 0))
+
+
+class Euler(Vector):
+    def __repr__(self):
+        return "Euler(%s)" % (tuple(self._v),)
+
+
+### DATABLOCKS ###
+
+class Bag(object):
+    """
+    Settings object that accepts any attribute, like render settings or raytrace_mirror.
+    """
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        value = Bag()
+        setattr(self, name, value)
+        return value
+
+
+class ID(Bag):
+    """
+    A datablock: it has a unique name, users and custom properties.
+    """
+    def __init__(self, name, collection):
+        self.__dict__["_name"] = name
+        self.__dict__["_collection"] = collection
+        self.__dict__["_props"] = {}
+        self.__dict__["users"] = 0
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        self._collection._rename(self, value)
+
+    def __getitem__(self, key):
+        return self._props[key]
+
+    def __setitem__(self, key, value):
+        self._props[key] = value
+
+    def __contains__(self, key):
+        return key in self._props
+
+    def get(self, key, default = None):
+        return self._props.get(key, default)
+
+    def copy(self):
+        new = self._collection.new(self.name)
+        for k, v in self.__dict__.items():
+            if k not in ("_name", "_collection", "_props", "users"):
+                new.__dict__[k] = v
+        new.__dict__["_props"] = dict(self._props)
+        return new
+
+
+class Collection(object):
+    def __init__(self, kind, cls):
+        self.kind = kind
+        self.cls = cls
+        self._items = {}
+
+    def _unique(self, name):
+        if name not in self._items:
+            return name
+        i = 1
+        while "%s.%03i" % (name, i) in self._items:
+            i += 1
+        return "%s.%03i" % (name, i)
+
+    def _rename(self, item, name):
+        if item._name == name:
+            return
+        if item._name in self._items and self._items[item._name] is item:
+            del self._items[item._name]
+        name = self._unique(name)
+        item.__dict__["_name"] = name
+        self._items[name] = item
+
+    def _add(self, item):
+        name = self._unique(item._name)
+        item.__dict__["_name"] = name
+        self._items[name] = item
+        record(allocations, self.kind)
+        return item
+
+    def new(self, name, *args, **kwargs):
+        return self._add(self.cls(name, self, *args, **kwargs))
+
+    def remove(self, item):
+        if item.users > 0:
+            raise RuntimeError("%s '%s' must have zero users to be removed" % (self.kind, item.name))
+        del self._items[item._name]
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return list(self._items.values())[key]
+        return self._items[key]
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __iter__(self):
+        return iter(list(self._items.values()))
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, default = None):
+        return self._items.get(key, default)
+
+    def keys(self):
+        return list(self._items.keys())
+
+    def values(self):
+        return list(self._items.values())
+
+
+class PropCollection(object):
+    """
+    Mesh element collection (vertices, loops, polygons) with add, foreach_get and foreach_set.
+    The values are kept in flat lists, like foreach_set gets them.
+    """
+    def __init__(self, attributes):
+        # attribute: number of values per element
+        self.attributes = attributes
+        self.count = 0
+        self.data = {}
+        for a in attributes:
+            self.data[a] = []
+
+    def __len__(self):
+        return self.count
+
+    def add(self, n):
+        self.count += n
+        for a, size in self.attributes.items():
+            self.data[a] += [0] * (n * size)
+
+    def foreach_set(self, attribute, seq):
+        size = self.attributes[attribute]
+        if hasattr(seq, "tolist"):
+            seq = seq.ravel().tolist()
+        else:
+            seq = list(seq)
+        if len(seq) != self.count * size:
+            raise RuntimeError("foreach_set: wrong length %i for %s (%i x %i)" % (len(seq), attribute, self.count, size))
+        self.data[attribute] = seq
+
+    def foreach_get(self, attribute, seq):
+        seq[:] = self.data[attribute]
+
+    def items(self, attribute):
+        """
+        The values per element, for example the coordinates of each vertex.
+        """
+        size = self.attributes[attribute]
+        flat = self.data[attribute]
+        return [flat[i * size:(i + 1) * size] for i in range(self.count)]
+
+
+class Mesh(ID):
+    def __init__(self, name, collection):
+        ID.__init__(self, name, collection)
+        self.__dict__["vertices"] = PropCollection({"co":3})
+        self.__dict__["loops"] = PropCollection({"vertex_index":1})
+        self.__dict__["polygons"] = PropCollection({"loop_start":1, "loop_total":1, "material_index":1})
+        self.__dict__["materials"] = MaterialList(self)
+        self.__dict__["vertex_colors"] = VertexColors(self)
+
+    def from_pydata(self, vertices, edges, faces):
+        self.vertices.add(len(vertices))
+        self.vertices.foreach_set("co", [c for v in vertices for c in v])
+        loops = [i for f in faces for i in f]
+        self.loops.add(len(loops))
+        self.loops.foreach_set("vertex_index", loops)
+        self.polygons.add(len(faces))
+        starts = []
+        s = 0
+        for f in faces:
+            starts += [s]
+            s += len(f)
+        self.polygons.foreach_set("loop_start", starts)
+        self.polygons.foreach_set("loop_total", [len(f) for f in faces])
+
+    def copy(self):
+        new = self._collection.new(self.name)
+        for attribute in ("vertices", "loops", "polygons"):
+            new.__dict__[attribute].data = dict((k, list(v)) for k, v in self.__dict__[attribute].data.items())
+            new.__dict__[attribute].count = self.__dict__[attribute].count
+        for m in self.materials:
+            new.materials.append(m)
+        new.__dict__["_props"] = dict(self._props)
+        return new
+
+    def update(self, calc_edges = False):
+        record(calls, "mesh.update")
+
+    def validate(self, verbose = False):
+        return False
+
+    def transform(self, matrix):
+        pass
+
+
+class MaterialList(list):
+    def __init__(self, owner):
+        list.__init__(self)
+        self.owner = owner
+
+    def append(self, mat):
+        list.append(self, mat)
+
+
+class VertexColors(list):
+    def __init__(self, owner):
+        list.__init__(self)
+        self.owner = owner
+
+    def new(self, name = "Col"):
+        layer = Bag(name = name, data = PropCollection({"color":3}))
+        layer.data.add(len(self.owner.loops))
+        self.append(layer)
+        return layer
+
+
+class MaterialSlot(Bag):
+    pass
+
+
+class Modifiers(object):
+    def __init__(self):
+        self._items = []
+
+    def new(self, name, type):
+        m = Bag(name = name, type = type, object = None, operation = "INTERSECT")
+        self._items += [m]
+        return m
+
+    def remove(self, m):
+        self._items.remove(m)
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self._items[key]
+        for m in self._items:
+            if m.name == key:
+                return m
+        raise KeyError(key)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(list(self._items))
+
+
+class Object(ID):
+    def __init__(self, name, collection, data = None):
+        ID.__init__(self, name, collection)
+        d = self.__dict__
+        d["_data"] = None
+        d["location"] = Vector((0,0,0))
+        d["scale"] = Vector((1,1,1))
+        d["rotation_euler"] = Euler((0,0,0))
+        d["layers"] = [True] + [False] * 19
+        d["hide"] = False
+        d["hide_render"] = False
+        d["select"] = False
+        d["parent"] = None
+        d["modifiers"] = Modifiers()
+        d["material_slots"] = []
+        d["animation_data"] = None
+        d["dupli_type"] = "NONE"
+        d["dupli_group"] = None
+        d["empty_draw_type"] = "PLAIN_AXES"
+        d["empty_draw_size"] = 1
+        self.data = data
+
+    def __setattr__(self, name, value):
+        if name in ("location", "scale", "rotation_euler"):
+            value = Vector(value) if name != "rotation_euler" else Euler(value)
+        object.__setattr__(self, name, value)
+
+    @property
+    def data(self):
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        if self._data is not None:
+            self._data.__dict__["users"] -= 1
+        if value is not None:
+            value.__dict__["users"] += 1
+        self.__dict__["_data"] = value
+        # mesh materials show up as slots
+        # like Blender, slots with a material linked to the object are kept
+        if isinstance(value, Mesh):
+            old = self.__dict__["material_slots"]
+            slots = []
+            for i, m in enumerate(value.materials):
+                if i < len(old) and old[i].link == "OBJECT":
+                    slots += [old[i]]
+                else:
+                    slots += [MaterialSlot(link = "DATA", material = m)]
+            self.__dict__["material_slots"] = slots
+
+    @property
+    def type(self):
+        if self._data is None:
+            return "EMPTY"
+        if isinstance(self._data, Lamp):
+            return "LAMP"
+        if isinstance(self._data, Camera):
+            return "CAMERA"
+        return "MESH"
+
+    @property
+    def active_material(self):
+        if len(self.material_slots) == 0:
+            return None
+        return self.material_slots[0].material
+
+    @active_material.setter
+    def active_material(self, mat):
+        if len(self.material_slots) == 0:
+            if isinstance(self._data, Mesh):
+                self._data.materials.append(mat)
+            self.material_slots.append(MaterialSlot(link = "DATA", material = mat))
+            return
+        self.material_slots[0].material = mat
+        if self.material_slots[0].link == "DATA" and isinstance(self._data, Mesh) and len(self._data.materials) > 0:
+            self._data.materials[0] = mat
+
+    @property
+    def matrix_world(self):
+        m = Euler(self.rotation_euler)
+        cx, sx = math.cos(m[0]), math.sin(m[0])
+        cy, sy = math.cos(m[1]), math.sin(m[1])
+        cz, sz = math.cos(m[2]), math.sin(m[2])
+        r = [
+            [cy * cz, sx * sy * cz - cx * sz, cx * sy * cz + sx * sz],
+            [cy * sz, sx * sy * sz + cx * cz, cx * sy * sz - sx * cz],
+            [-sy, sx * cy, cx * cy],
+        ]
+        rows = []
+        for i in range(3):
+            rows += [[r[i][j] * self.scale[j] for j in range(3)] + [self.location[i]]]
+        rows += [[0, 0, 0, 1]]
+        return Matrix(rows)
+
+    @property
+    def bound_box(self):
+        if not isinstance(self._data, Mesh) or len(self._data.vertices) == 0:
+            return [[0,0,0]] * 8
+        co = self._data.vertices.items("co")
+        lo = [min(c[i] for c in co) for i in range(3)]
+        hi = [max(c[i] for c in co) for i in range(3)]
+        return [[(lo, hi)[(k >> 2) & 1][0], (lo, hi)[(k >> 1) & 1][1], (lo, hi)[k & 1][2]] for k in range(8)]
+
+    @property
+    def users_group(self):
+        return [g for g in bpy.data.groups if self in g.objects]
+
+    def animation_data_create(self):
+        if self.animation_data is None:
+            self.__dict__["animation_data"] = Bag(action = None)
+        return self.animation_data
+
+
+class Lamp(ID):
+    def __init__(self, name, collection, type = "POINT"):
+        ID.__init__(self, name, collection)
+        self.type = type
+        self.energy = 1
+        self.color = (1,1,1)
+        self.distance = 25
+        self.shadow_method = "NOSHADOW"
+
+
+class Camera(ID):
+    def __init__(self, name, collection):
+        ID.__init__(self, name, collection)
+        self.lens = 35
+        self.sensor_width = 32
+        self.sensor_height = 18
+        self.sensor_fit = "AUTO"
+        self.clip_start = 0.1
+        self.clip_end = 100
+        self.type = "PERSP"
+
+
+class TextureSlots(list):
+    def add(self):
+        slot = Bag(texture = None, use_map_alpha = False, alpha_factor = 1)
+        self.append(slot)
+        return slot
+
+
+def _count_users(match):
+    n = 0
+    for o in bpy.data.objects:
+        for slot in o.material_slots:
+            if slot.link == "OBJECT" and match(slot.material):
+                n += 1
+    for m in bpy.data.meshes:
+        n += sum(1 for x in m.materials if match(x))
+    return n
+
+
+class Material(ID):
+    def __init__(self, name, collection):
+        ID.__init__(self, name, collection)
+        self.__dict__["texture_slots"] = TextureSlots()
+        self.raytrace_mirror = Bag(use = False, depth = 2, reflect_factor = 0.0)
+        del self.__dict__["users"]
+
+    @property
+    def users(self):
+        return _count_users(lambda m: m is self)
+
+
+class Texture(ID):
+    def __init__(self, name, collection, type = "IMAGE"):
+        ID.__init__(self, name, collection)
+        self.type = type
+        self.image = None
+        del self.__dict__["users"]
+
+    @property
+    def users(self):
+        return sum(1 for m in bpy.data.materials for slot in m.texture_slots if slot.texture is self)
+
+
+class Image(ID):
+    def __init__(self, name, collection, width = 256, height = 256, alpha = False):
+        ID.__init__(self, name, collection)
+        self.size = [width, height]
+        self.filepath = ""
+        self.filepath_raw = ""
+        self.file_format = "PNG"
+        del self.__dict__["users"]
+
+    @property
+    def users(self):
+        return sum(1 for t in bpy.data.textures if t.image is self)
+
+    def scale(self, width, height):
+        record(calls, "image.scale")
+        self.size = [width, height]
+
+    def save(self):
+        record(calls, "image.save")
+        # a grey picture of the right size, so that it can be loaded again
+        width, height = self.size
+        png.write_png(self.filepath_raw, {"bit_depth":8, "color_type":2}, numpy.full((height, width * 3), 128, dtype = numpy.uint8))
+
+    def reload(self):
+        pass
+
+
+class ImageCollection(Collection):
+    def load(self, filepath):
+        if not os.path.exists(filepath):
+            raise RuntimeError("Error: Cannot read image file '%s'" % filepath)
+        record(calls, "images.load")
+        # the real size for PNG files, the pixels are not read
+        width, height = 64, 64
+        if filepath.lower().endswith(".png"):
+            width, height = png.png_size(filepath)
+        img = self.new(os.path.basename(filepath), width, height)
+        img.filepath = filepath
+        return img
+
+
+class Group(ID):
+    def __init__(self, name, collection):
+        ID.__init__(self, name, collection)
+        self.__dict__["objects"] = GroupObjects()
+        self.dupli_offset = (0,0,0)
+
+
+class GroupObjects(list):
+    def link(self, obj):
+        self.append(obj)
+        obj.__dict__["users"] += 1
+
+    def unlink(self, obj):
+        self.remove(obj)
+        obj.__dict__["users"] -= 1
+
+
+class FCurve(Bag):
+    def __init__(self, data_path, index):
+        Bag.__init__(self, data_path = data_path, array_index = index)
+        self.__dict__["keyframe_points"] = PropCollection({"co":2, "interpolation":1})
+
+    def update(self):
+        pass
+
+
+class FCurves(list):
+    def new(self, data_path, index = 0, action_group = ""):
+        fc = FCurve(data_path, index)
+        self.append(fc)
+        return fc
+
+
+class Action(ID):
+    def __init__(self, name, collection):
+        ID.__init__(self, name, collection)
+        self.__dict__["fcurves"] = FCurves()
+
+
+class Text(ID):
+    def __init__(self, name, collection):
+        ID.__init__(self, name, collection)
+        self.__dict__["_body"] = ""
+
+    def clear(self):
+        self.__dict__["_body"] = ""
+
+    def write(self, s):
+        self.__dict__["_body"] += s
+
+    def as_string(self):
+        return self._body
+
+
+class SceneObjects(object):
+    def __init__(self, scene):
+        self.scene = scene
+        self._items = []
+        self.active = None
+
+    def link(self, obj):
+        if obj in self._items:
+            raise RuntimeError("Object '%s' already in scene" % obj.name)
+        self._items.append(obj)
+        obj.__dict__["users"] += 1
+
+    def unlink(self, obj):
+        self._items.remove(obj)
+        obj.__dict__["users"] -= 1
+        if self.active is obj:
+            self.active = None
+
+    def __contains__(self, key):
+        if isinstance(key, str):
+            return any(o.name == key for o in self._items)
+        return key in self._items
+
+    def __getitem__(self, key):
+        for o in self._items:
+            if o.name == key:
+                return o
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(list(self._items))
+
+    def __len__(self):
+        return len(self._items)
+
+
+class Scene(ID):
+    def __init__(self, name, collection):
+        ID.__init__(self, name, collection)
+        self.__dict__["objects"] = SceneObjects(self)
+        self.render = Bag(resolution_x = 1920, resolution_y = 1080, resolution_percentage = 50,
+            antialiasing_samples = "8", use_full_sample = False, use_border = False, use_crop_to_border = False,
+            border_min_x = 0, border_max_x = 1, border_min_y = 0, border_max_y = 1,
+            filepath = "", threads_mode = "AUTO", threads = 1,
+            layers = {"RenderLayer":Bag(use_sky = True)}, image_settings = Bag(color_mode = "RGB", file_format = "PNG"))
+        self.layers = [True] + [False] * 19
+        self.frame_start = 1
+        self.frame_end = 250
+        self.frame_current = 1
+        self.camera = None
+
+    def update(self):
+        record(calls, "scene.update")
+
+    def frame_set(self, frame):
+        self.frame_current = frame
+
+
+### OPERATORS ###
+
+class Context(object):
+    def __init__(self, data):
+        self._data = data
+        self.scene = None
+
+    @property
+    def active_object(self):
+        return self.scene.objects.active
+
+    @property
+    def object(self):
+        return self.scene.objects.active
+
+    @property
+    def selected_objects(self):
+        return [o for o in self.scene.objects if o.select]
+
+
+def _add_object(name, data, location = (0,0,0), rotation = (0,0,0), layers = None):
+    ctx = bpy.context
+    obj = bpy.data.objects.new(name, data)
+    obj.location = location
+    obj.rotation_euler = rotation
+    if layers is not None:
+        obj.layers = list(layers)
+    ctx.scene.objects.link(obj)
+    for o in ctx.scene.objects:
+        o.select = False
+    obj.select = True
+    ctx.scene.objects.active = obj
+    ctx.scene.update()
+    return obj
+
+
+def _primitive(name, make):
+    def op(location = (0,0,0), rotation = (0,0,0), layers = None, **kwargs):
+        record(calls, "ops.mesh." + name)
+        mesh = bpy.data.meshes.new(name.split("_")[1].capitalize())
+        verts, faces = make(**kwargs)
+        mesh.from_pydata(verts, [], faces)
+        _add_object(mesh.name, mesh, location, rotation, layers)
+        return {"FINISHED"}
+    return op
+
+
+def _cube(**kwargs):
+    verts = [(1,1,-1), (1,-1,-1), (-1,-1,-1), (-1,1,-1), (1,1,1), (1,-1,1), (-1,-1,1), (-1,1,1)]
+    return verts, [(0,1,2,3), (4,7,6,5), (0,4,5,1), (1,5,6,2), (2,6,7,3), (4,0,3,7)]
+
+
+def _plane(**kwargs):
+    return [(-1,-1,0), (1,-1,0), (1,1,0), (-1,1,0)], [(0,1,2,3)]
+
+
+def _ring(n, r, z):
+    return [(-r * math.sin(2 * math.pi * i / n), r * math.cos(2 * math.pi * i / n), z) for i in range(n)]
+
+
+def _cylinder(vertices = 32, radius = 1, depth = 2, end_fill_type = "NGON", **kwargs):
+    verts = _ring(vertices, radius, -depth / 2) + _ring(vertices, radius, depth / 2)
+    faces = [(i, (i + 1) % vertices, (i + 1) % vertices + vertices, i + vertices) for i in range(vertices)]
+    return verts, faces
+
+
+def _cone(vertices = 32, radius1 = 1, radius2 = 0, depth = 2, **kwargs):
+    verts = _ring(vertices, radius1, -depth / 2) + [(0, 0, depth / 2)]
+    faces = [(i, (i + 1) % vertices, vertices) for i in range(vertices)]
+    return verts, faces
+
+
+def _uv_sphere(segments = 32, ring_count = 16, size = 1, **kwargs):
+    return _cube()
+
+
+def _modifier_add(type = "BOOLEAN"):
+    record(calls, "ops.object.modifier_add")
+    obj = bpy.context.active_object
+    name = type.capitalize()
+    obj.modifiers.new(name, type)
+    return {"FINISHED"}
+
+
+def _modifier_apply(apply_as = "DATA", modifier = ""):
+    record(calls, "ops.object.modifier_apply")
+    obj = bpy.context.active_object
+    if obj.data.users > 1:
+        raise RuntimeError("Modifiers cannot be applied to multi-user data")
+    m = obj.modifiers[modifier]
+    if m.object is None:
+        raise RuntimeError("Modifier has no object")
+    # the geometry is not really combined: add the vertices of the other mesh
+    other = m.object.data
+    n = len(other.vertices)
+    if n:
+        co = []
+        other.vertices.foreach_get("co", co)
+        obj.data.vertices.add(n)
+        obj.data.vertices.data["co"][-3 * n:] = co
+    obj.modifiers.remove(m)
+    return {"FINISHED"}
+
+
+def _join():
+    record(calls, "ops.object.join")
+    ctx = bpy.context
+    active = ctx.active_object
+    for o in ctx.selected_objects:
+        if o is not active:
+            ctx.scene.objects.unlink(o)
+            bpy.data.objects.remove(o)
+    return {"FINISHED"}
+
+
+def _lamp_add(type = "POINT", location = (0,0,0), layers = None):
+    record(calls, "ops.object.lamp_add")
+    lamp = bpy.data.lamps.new(type.capitalize(), type)
+    _add_object(lamp.name, lamp, location, (0,0,0), layers)
+    return {"FINISHED"}
+
+
+def _x3d(filepath = ""):
+    record(calls, "ops.import_scene.x3d")
+    mesh = bpy.data.meshes.new("ShapeIndexedFaceSet")
+    mesh.materials.append(bpy.data.materials.new("Shape"))
+    _add_object("ShapeIndexedFaceSet", mesh)
+    _add_object("TODO", bpy.data.lamps.new("TODO"))
+    return {"FINISHED"}
+
+
+def _render(write_still = False, animation = False):
+    record(calls, "ops.render.render")
+    return {"FINISHED"}
+
+
+def _select_all(action = "TOGGLE"):
+    for o in bpy.context.scene.objects:
+        o.select = (action == "SELECT")
+    return {"FINISHED"}
+
+
+def _delete():
+    record(calls, "ops.object.delete")
+    scene = bpy.context.scene
+    for o in scene.objects:
+        if o.select:
+            scene.objects.unlink(o)
+            bpy.data.objects.remove(o)
+    return {"FINISHED"}
+
+
+def make_bpy():
+    """
+    Make a fresh bpy module: an empty scene with a camera and a world.
+    """
+    b = types.ModuleType("bpy")
+    data = types.SimpleNamespace()
+    data.objects = Collection("objects", Object)
+    data.meshes = Collection("meshes", Mesh)
+    data.materials = Collection("materials", Material)
+    data.textures = Collection("textures", Texture)
+    data.images = ImageCollection("images", Image)
+    data.lamps = Collection("lamps", Lamp)
+    data.cameras = Collection("cameras", Camera)
+    data.groups = Collection("groups", Group)
+    data.actions = Collection("actions", Action)
+    data.texts = Collection("texts", Text)
+    data.scenes = Collection("scenes", Scene)
+    data.worlds = Collection("worlds", ID)
+    data.filepath = ""
+    b.data = data
+
+    b.context = Context(data)
+    scene = data.scenes.new("Scene")
+    b.context.scene = scene
+    data.worlds.new("World")
+    camera = data.objects.new("Camera", data.cameras.new("Camera"))
+    scene.objects.link(camera)
+    scene.camera = camera
+
+    ops = types.SimpleNamespace()
+    ops.mesh = types.SimpleNamespace(
+        primitive_cube_add = _primitive("primitive_cube_add", _cube),
+        primitive_plane_add = _primitive("primitive_plane_add", _plane),
+        primitive_cylinder_add = _primitive("primitive_cylinder_add", _cylinder),
+        primitive_cone_add = _primitive("primitive_cone_add", _cone),
+        primitive_uv_sphere_add = _primitive("primitive_uv_sphere_add", _uv_sphere),
+    )
+    ops.object = types.SimpleNamespace(
+        modifier_add = _modifier_add,
+        modifier_apply = _modifier_apply,
+        lamp_add = _lamp_add,
+        join = _join,
+        select_all = _select_all,
+        delete = _delete,
+    )
+    ops.import_scene = types.SimpleNamespace(x3d = _x3d)
+    ops.render = types.SimpleNamespace(render = _render)
+    b.ops = ops
+    b.app = types.SimpleNamespace(version = (2, 66, 1), background = True, driver_namespace = {}, binary_path = "blender")
+    return b
+
+
+bpy = None
+
+
+def install():
+    """
+    Put a fresh bpy and mathutils in sys.modules. Call again to start with an empty scene.
+    """
+    global bpy
+    bpy = make_bpy()
+    mu = types.ModuleType("mathutils")
+    mu.Vector = Vector
+    mu.Quaternion = Quaternion
+    mu.Matrix = Matrix
+    mu.Euler = Euler
+    sys.modules["bpy"] = bpy
+    sys.modules["mathutils"] = mu
+    reset_counters()
+    return bpy
@@ -0,0 +1,84 @@
+"""
+How many vertices do the cylinders and cones need? That depends on how big they are in the picture.
+
+A circle drawn as a polygon with n vertices is at most r (1 - cos(pi / n)) away from the real circle, with r the radius. Here r is the radius in pixels in the picture (see view.py), and n is chosen so that this is at most MAX_ERROR pixels. Small beams far away get few vertices, the big mirror in front gets many.
+
+The number is put in the element as 'vertices' (see build.add_primitive). Elements that already have 'vertices' are not changed. The elements of boolean operations are left alone (see run.py): their cylinders need the same number of vertices (build.CYLINDER_VERTICES) to line up, otherwise the result can have holes.
+
+It does not need Blender.
+
+Copyright Robbert Bloem, 2013
+"""
+
+import math
+
+import numpy
+
+import view
+
+
+# the largest distance between the real circle and the polygon, in pixels
+MAX_ERROR = 0.5
+
+# limits for the number of vertices
+MIN_VERTICES = 8
+MAX_VERTICES = 128
+
+# the number of vertices is rounded up to a multiple of this, so that more objects can share a mesh (see build.template_mesh)
+STEP = 8
+
+# the depth of the shapes, if the element doesn't say
+DEFAULT_DEPTH = 2
+
+
+def vertices_for_radius(radius, max_error = MAX_ERROR):
+    """
+    The number of vertices for a circle with radius (in pixels).
+    """
+    if radius <= max_error:
+        n = MIN_VERTICES
+    else:
+        n = math.pi / math.acos(1 - max_error / radius)
+    n = int(math.ceil(n / STEP)) * STEP
+    return int(min(max(n, MIN_VERTICES), MAX_VERTICES))
+
+
+def end_circles(elements):
+    """
+    The centres and radii (in the world) of the two ends of cylinders and cones.
+    """
+    centres = []
+    radii = []
+    for e in elements:
+        loc = numpy.asarray(e["loc"], dtype = float)
+        scale = numpy.asarray(e.get("scale", (1,1,1)), dtype = float)
+        m = view.euler_to_matrix(e.get("rot", (0,0,0)))
+        half = e.get("depth", DEFAULT_DEPTH) / 2 * scale[2]
+        axis = m[:,2] * half
+        radius = e.get("radius", 1) * max(abs(scale[0]), abs(scale[1]))
+        centres += [loc - axis, loc + axis]
+        radii += [radius, radius]
+    return centres, radii
+
+
+def adapt(elements, camera, resolution, max_error = MAX_ERROR, previous = None):
+    """
+    Copies of the elements, with 'vertices' for the cylinders and cones.
+    The radius in the picture is taken at the end that is largest in the picture.
+    previous: the numbers of vertices of the last run, by id (see incremental.previous_vertices). An element keeps its number unless it needs more now, so moving the camera doesn't make the elements again in incremental mode.
+    """
+    todo = [i for i, e in enumerate(elements) if e.get("shape") in ("cylinder", "cone") and "vertices" not in e]
+    if len(todo) == 0:
+        return elements
+
+    centres, radii = end_circles([elements[i] for i in todo])
+    sizes = view.projected_size(centres, radii, camera, resolution)
+
+    result = list(elements)
+    for k, i in enumerate(todo):
+        radius = max(sizes[2*k], sizes[2*k+1]) / 2
+        result[i] = dict(elements[i])
+        result[i]["vertices"] = vertices_for_radius(radius, max_error)
+        if previous is not None and elements[i]["id"] in previous:
+            result[i]["vertices"] = max(result[i]["vertices"], previous[elements[i]["id"]])
+    return result
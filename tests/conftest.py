@@ -0,0 +1,43 @@
+"""
+The tests run without Blender: stub_bpy.py stands in for bpy (see benchmark.py).
+
+Copyright Robbert Bloem, 2013
+"""
+
+import os
+import sys
+
+import pytest
+
+package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+import stub_bpy
+
+# before the modules that import bpy
+stub_bpy.install()
+
+import cache
+
+
+@pytest.fixture
+def bpy(monkeypatch):
+    """
+    An empty scene. The modules of this folder keep the bpy they imported, they get the new one.
+    """
+    b = stub_bpy.install()
+    for name, module in list(sys.modules.items()):
+        filename = getattr(module, "__file__", None)
+        if filename is not None and os.path.dirname(os.path.abspath(filename)) == package_dir and hasattr(module, "bpy"):
+            monkeypatch.setattr(module, "bpy", b)
+    return b
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """
+    An empty cache folder for the test.
+    """
+    monkeypatch.setattr(cache, "cache_dir", str(tmp_path / "cache"))
+    return tmp_path / "cache"
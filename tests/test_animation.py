@@ -0,0 +1,45 @@
+import numpy
+
+import animation
+
+LASER = [{"id":"pulse1in", "loc":(10,0,0), "mat":"in"}, {"id":"pulse2out", "loc":(0,20,0), "mat":"out"}]
+FOCUS = [{"id":"focus", "loc":(0,0,0)}]
+
+
+def test_pulse_locations():
+    starts, ends = animation.pulse_paths(LASER, FOCUS)
+    # in: to the focus, out: from the focus
+    assert starts.tolist() == [[10,0,0], [0,0,0]]
+    assert ends.tolist() == [[0,0,0], [0,20,0]]
+
+    frames = numpy.arange(1, 101)
+    locations = animation.pulse_locations(starts, ends, frames, 50, pulses_per_beam = 2)
+    assert locations.shape == (4, 100, 3)
+    assert numpy.allclose(locations[0,0], (10,0,0))
+    assert numpy.allclose(locations[0,25], (5,0,0))
+    # after a period it starts again
+    assert numpy.allclose(locations[0,50], (10,0,0))
+    # the second pulse of the beam is half a period ahead
+    assert numpy.allclose(locations[1,0], (5,0,0))
+    assert numpy.allclose(locations[2,10], (0,4,0))
+
+
+def test_animate_pulses(bpy):
+    names = animation.animate_pulses(LASER, FOCUS, frame_start = 1, frame_end = 100, period = 50, pulses_per_beam = 2)
+    assert names == ["pulse1in_0", "pulse1in_1", "pulse2out_0", "pulse2out_1"]
+    objects = [bpy.data.objects[n] for n in names]
+    # one mesh for all pulses
+    assert all(o.data is objects[0].data for o in objects)
+    assert (bpy.context.scene.frame_start, bpy.context.scene.frame_end) == (1, 100)
+
+    # all keyframes at once
+    fcurves = objects[1].animation_data.action.fcurves
+    assert [f.array_index for f in fcurves] == [0, 1, 2]
+    co = numpy.array(fcurves[0].keyframe_points.data["co"]).reshape((-1, 2))
+    assert co[:,0].tolist() == list(range(1, 101))
+    assert numpy.isclose(co[0,1], 5)
+
+    # again: the pulses and actions of the last run are replaced
+    animation.animate_pulses(LASER, FOCUS, frame_start = 1, frame_end = 100, period = 50, pulses_per_beam = 2)
+    assert sorted(o.name for o in bpy.data.objects if o.name.startswith("pulse")) == names
+    assert len(bpy.data.actions) == 4
@@ -0,0 +1,40 @@
+import json
+
+import batch
+
+
+def test_threads_per_job():
+    assert batch.threads_per_job(3, cores = 8) == 2
+    assert batch.threads_per_job(16, cores = 8) == 1
+
+
+def test_job_name():
+    v = {"name":"close"}
+    assert batch.job_name(v) == "close"
+    assert batch.job_name(v, tile = (2, 2, 1, 0)) == "close_tile_1_0"
+    assert batch.job_name(v, frames = [11, 12, 13]) == "close_frames_11_13"
+
+
+def test_blender_command():
+    v = {"name":"close", "plot_loc":[1, 2, 3]}
+    command = batch.blender_command("blender", "/x/blender.blend", v, "/out", 4, tile = (2, 2, 0, 1))
+    assert command[:6] == ["blender", "-b", "/x/blender.blend", "-t", "4", "-P"]
+    args = command[command.index("--") + 1:]
+    assert json.loads(args[args.index("--worker") + 1]) == v
+    assert args[args.index("--tile") + 1] == "2,2,0,1"
+
+
+def test_scene_hash():
+    # the hash changes with the scene, not with the name
+    a = batch.scene_hash({"name":"a"})
+    assert batch.scene_hash({"name":"b"}) == a
+    assert batch.scene_hash({"name":"a", "plot_loc":[0, 0, 0]}) != a
+
+
+def test_apply_variant_of_the_scene(bpy):
+    settings = {"flag_no_proteins":False}
+    # run by hand: nothing changes
+    assert batch.apply_variant(settings) == {}
+    bpy.context.scene[batch.VARIANT_PROPERTY] = json.dumps({"name":"v", "flag_no_proteins":True})
+    batch.apply_variant(settings)
+    assert settings["flag_no_proteins"] is True
@@ -0,0 +1,29 @@
+import numpy
+
+import beams
+import build
+import spatial
+
+
+def test_cones_go_from_start_to_end():
+    starts = numpy.array([(10,0,0), (0,-7,3), (-2,4,-5), (0,0,9)], dtype = float)
+    end = (1,2,3)
+    widths = [0.5, 1, 2, 0.25]
+    locs, rots, scales = beams.beam_transforms(starts, end, widths)
+    for i in range(len(starts)):
+        m = spatial.element_matrix({"loc":locs[i], "rot":rots[i], "scale":scales[i]})
+        # the point of the cone is at the end, the middle of the base at the start
+        assert numpy.allclose(numpy.dot(m, (0,0,1,1))[:3], end)
+        assert numpy.allclose(numpy.dot(m, (0,0,-1,1))[:3], starts[i])
+        # the base has the width as radius
+        edge = numpy.dot(m, (1,0,-1,1))[:3]
+        assert numpy.isclose(numpy.linalg.norm(edge - starts[i]), widths[i])
+
+
+def test_laser_primitives():
+    laser = [{"id":"a", "loc":(5,0,0), "mat":"in"}, {"id":"b", "loc":(0,5,0), "mat":"out"}]
+    focus = [{"loc":(0,0,0)}]
+    elements = build.laser_primitives(laser, focus, 0.3, 0.6)
+    assert [(e["id"], e["shape"], e["mat"]) for e in elements] == [("a", "cone", "in"), ("b", "cone", "out")]
+    assert numpy.allclose([e["scale"] for e in elements], [(0.3,0.3,2.5), (0.6,0.6,2.5)])
+    assert build.laser_primitives([], focus, 1, 1) == []
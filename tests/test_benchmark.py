@@ -0,0 +1,32 @@
+import benchmark
+import spec
+import vrml
+
+
+def test_write_protein(tmp_path):
+    filename = str(tmp_path / "prot.wrl")
+    benchmark.write_protein(filename, 2000)
+    mesh = vrml.read_wrl(filename)
+    # about the number of faces that was asked for
+    assert 1500 < len(mesh["loop_totals"]) < 2500
+    assert mesh["colors"] is not None and len(mesh["colors"]) == len(mesh["vertices"])
+
+
+def test_grow():
+    scene = spec.make_spec(spec.run_settings())
+    grown = benchmark.grow(scene, 3)
+    block = grown["parts"]["block"]
+    assert len(block) == 3 * len(scene["parts"]["block"])
+    first = block[0]
+    copy = block[2 * len(scene["parts"]["block"])]
+    assert copy["id"] == first["id"] + "_2"
+    assert [copy["loc"][i] - first["loc"][i] for i in range(3)] == [2 * x for x in benchmark.OFFSET]
+    # one camera
+    assert grown["parts"]["camera"] == spec.normalize(scene)["parts"]["camera"]
+
+
+def test_compare():
+    old = {"sizes":{"1":{"total":1.0, "stages":{"block":0.5, "plot":0.01}}}}
+    new = {"sizes":{"1":{"total":1.1, "stages":{"block":0.8, "plot":0.02}}, "2":{"total":5.0, "stages":{}}}}
+    # the plot is twice as slow, but only a bit
+    assert benchmark.compare(old, new) == [(1, "block", 0.5, 0.8)]
@@ -0,0 +1,160 @@
+import math
+
+import numpy
+
+import build
+import stub_bpy
+
+ELEMENTS = [
+    {"id":"c1", "shape":"cube", "loc":(1,2,3), "scale":(2,1,1)},
+    {"id":"p1", "shape":"plane", "loc":(0,0,-1)},
+    {"id":"y1", "shape":"cylinder", "loc":(0,5,0), "radius":0.5, "depth":3, "rot":(math.pi/2,0,0)},
+    {"id":"n1", "shape":"cone", "loc":(3,0,0), "scale":(1,1,4)},
+    {"id":"d1", "loc":(-3,0,0)},
+]
+
+
+def mesh_shape(obj):
+    """
+    The number of vertices and the faces of the mesh of an object.
+    """
+    arrays = build.mesh_to_arrays(obj.data)
+    return len(arrays["vertices"]), sorted(arrays["loop_totals"].tolist())
+
+
+def scene_objects(bpy, names):
+    return [bpy.context.scene.objects[n] for n in names]
+
+
+def test_bulk_same_objects_as_operators(bpy):
+    mat = bpy.data.materials.new("mat")
+    names = build.add_primitives(ELEMENTS, mat)
+    ops = dict((n, (mesh_shape(o), tuple(o.location), tuple(o.scale), tuple(o.rotation_euler), o.active_material)) for n, o in zip(names, scene_objects(bpy, names)))
+    build.remove_objects(names)
+
+    stub_bpy.reset_counters()
+    assert build.add_primitives(ELEMENTS, mat, bulk = True) == names
+    # no operators, one scene update
+    assert not any(k.startswith("ops.") for k in stub_bpy.calls)
+    assert stub_bpy.calls["scene.update"] == 1
+
+    for n, o in zip(names, scene_objects(bpy, names)):
+        shape, loc, scale, rot, material = ops[n]
+        assert o.name == n
+        assert (tuple(o.location), tuple(o.scale), tuple(o.rotation_euler), o.active_material) == (loc, scale, rot, material)
+        # the operators of the stub don't make the ends of cylinders
+        if n != "y1":
+            assert mesh_shape(o)[0] == shape[0]
+    # the last one is active, boolean_modifier expects that
+    assert bpy.context.active_object.name == "d1"
+
+
+def test_bulk_cylinder_ends():
+    verts, loop_totals, loop_vertices = build.primitive_geometry("cylinder", 0.5, 3, 40)
+    # two rings and two centres, quads on the side and triangle fans
+    assert len(verts) == 82
+    assert sorted(set(loop_totals.tolist())) == [3, 4]
+    assert len(loop_totals) == 40 * 3
+    assert loop_vertices.max() == 81
+    assert numpy.allclose(numpy.hypot(verts[:80,0], verts[:80,1]), 0.5)
+    assert numpy.allclose(numpy.abs(verts[:,2]), 1.5)
+
+
+def test_compare_add_primitives(bpy):
+    times = build.compare_add_primitives(ELEMENTS)
+    assert set(times) == set(["operators", "bulk"])
+    # only the objects of the bulk path are left
+    assert sorted(o.name for o in bpy.context.scene.objects if o.name != "Camera") == sorted(e["id"] for e in ELEMENTS)
+    assert len(bpy.data.objects) == len(ELEMENTS) + 1
+
+
+def test_template_mesh_shared(bpy, monkeypatch):
+    monkeypatch.setattr(build, "mesh_templates", {})
+    elements = [{"id":"c%i" % i, "shape":"cube", "loc":(i,0,0)} for i in range(5)]
+    elements += [{"id":"y1", "shape":"cylinder", "loc":(0,0,0), "radius":1, "depth":2}]
+    red = bpy.data.materials.new("red")
+    blue = bpy.data.materials.new("blue")
+    build.add_primitives(elements[:3], red, bulk = True, shared = True)
+    build.add_primitives(elements[3:], blue, bulk = True, shared = True)
+
+    cubes = [bpy.data.objects["c%i" % i] for i in range(5)]
+    assert all(o.data is cubes[0].data for o in cubes)
+    assert cubes[0].data.users == 5
+    assert bpy.data.objects["y1"].data is not cubes[0].data
+    assert len(build.mesh_templates) == 2
+    # the material is on the object, not on the shared mesh
+    assert [o.active_material.name for o in cubes] == ["red"] * 3 + ["blue"] * 2
+    assert list(cubes[0].data.materials) == [None]
+
+
+def test_template_mesh_removed(bpy, monkeypatch):
+    monkeypatch.setattr(build, "mesh_templates", {})
+    monkeypatch.setattr(build, "mesh_template_stats", {"hits":0, "misses":0})
+    first = build.template_mesh("cube")
+    assert build.template_mesh("cube") is first
+    bpy.data.meshes.remove(first)
+    # gone, a new one is made
+    assert build.template_mesh("cube") is not first
+    assert build.mesh_template_stats == {"hits":1, "misses":2}
+
+
+def test_boolean_target_gets_own_mesh(bpy, monkeypatch):
+    monkeypatch.setattr(build, "mesh_templates", {})
+    elements = [{"id":"a", "shape":"cube", "loc":(0,0,0)}, {"id":"b", "shape":"cube", "loc":(0.5,0,0)}, {"id":"c", "shape":"cube", "loc":(9,0,0)}]
+    build.add_primitives(elements, bulk = True, shared = True)
+    shared = bpy.data.objects["c"].data
+    build.boolean_modifier(["a", "b"], "UNION")
+    # b changed, a and c still have the template
+    assert bpy.data.objects["b"].data is not shared
+    assert bpy.data.objects["a"].data is shared
+    assert len(shared.vertices) == 8
+
+
+def test_boolean_result_from_the_cache(bpy, cache_dir):
+    elements = [{"id":"a", "shape":"cube", "loc":(0,0,0)}, {"id":"b", "shape":"cube", "loc":(0.5,0,0)}]
+    names = build.add_primitives(elements, bulk = True)
+    build.boolean_modifier(names, "UNION", elements = elements)
+    made = build.mesh_to_arrays(bpy.data.objects["b"].data)
+    build.remove_objects(names)
+
+    build.add_primitives(elements, bulk = True)
+    stub_bpy.reset_counters()
+    build.boolean_modifier(names, "UNION", elements = elements)
+    assert "ops.object.modifier_apply" not in stub_bpy.calls
+    assert numpy.array_equal(build.mesh_to_arrays(bpy.data.objects["b"].data)["vertices"], made["vertices"])
+    assert bpy.data.objects["a"].hide_render
+
+    # another operation is not in the cache
+    build.boolean_modifier(names, "DIFFERENCE", elements = elements)
+    assert stub_bpy.calls["ops.object.modifier_apply"] == 1
+
+
+def test_pruned_difference_uses_merged_mesh(bpy, cache_dir):
+    # far doesn't touch op, it is joined into op; only far touches the target
+    elements = [{"id":"far", "shape":"cube", "loc":(10,0,0)}, {"id":"op", "shape":"cube", "loc":(0,0,0)}, {"id":"t", "shape":"cube", "loc":(10,0,1.5)}]
+    build.add_primitives(elements, bulk = True)
+    build.boolean_modifier(["far", "op"], "UNION", elements = elements, prune = True)
+    stub_bpy.reset_counters()
+    build.boolean_modifier(["op", "t"], "DIFFERENCE", hide_after_mod = False, elements = elements, prune = True)
+    assert stub_bpy.calls["ops.object.modifier_apply"] == 1
+
+
+def test_difference_cache_follows_the_operand_meshes(bpy, cache_dir):
+    elements = [{"id":"a", "shape":"cube", "loc":(0,0,0)}, {"id":"b", "shape":"cube", "loc":(0.5,0,0)}]
+    names = build.add_primitives(elements, bulk = True)
+    build.boolean_modifier(names, "DIFFERENCE", hide_after_mod = False, elements = elements)
+    build.remove_objects(names)
+
+    # the same operands: from the cache
+    build.add_primitives(elements, bulk = True)
+    stub_bpy.reset_counters()
+    build.boolean_modifier(names, "DIFFERENCE", hide_after_mod = False, elements = elements)
+    assert "ops.object.modifier_apply" not in stub_bpy.calls
+    build.remove_objects(names)
+
+    # a holds more after a union (made another way), the same elements
+    build.add_primitives(elements, bulk = True)
+    a = build.mesh_to_arrays(bpy.data.objects["a"].data)
+    build.replace_mesh(bpy.data.objects["a"], dict(a, vertices = a["vertices"] * 2))
+    build.boolean_modifier(names, "DIFFERENCE", hide_after_mod = False, elements = elements)
+    assert stub_bpy.calls["ops.object.modifier_apply"] == 1
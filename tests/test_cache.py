@@ -0,0 +1,67 @@
+import os
+
+import numpy
+
+import cache
+
+
+def test_make_key_ignores_the_order_of_dictionaries():
+    assert cache.make_key({"a":1, "b":2}) == cache.make_key({"b":2, "a":1})
+    assert cache.make_key([1, 2]) != cache.make_key([2, 1])
+    assert cache.make_key((1, 2)) == cache.make_key([1, 2])
+
+
+def test_save_and_load_arrays(cache_dir):
+    assert cache.load_arrays("test", "key") is None
+    cache.save_arrays("test", "key", a = numpy.arange(5), b = numpy.ones((2, 3)))
+    arrays = cache.load_arrays("test", "key")
+    assert numpy.array_equal(arrays["a"], numpy.arange(5))
+    assert arrays["b"].shape == (2, 3)
+
+
+def test_save_overwrites_an_existing_entry(cache_dir):
+    cache.save_arrays("test", "key", a = numpy.zeros(3))
+    cache.save_arrays("test", "key", a = numpy.ones(3))
+    assert numpy.array_equal(cache.load_arrays("test", "key")["a"], numpy.ones(3))
+
+
+def test_evict_removes_the_least_recently_used(cache_dir):
+    for i, name in enumerate(["old", "middle", "new"]):
+        path = cache.save_arrays("test", name, max_size = 10**9, a = numpy.zeros(1000))
+        os.utime(path, (1000 + i, 1000 + i))
+    size = os.path.getsize(cache.file_path("test", "new"))
+    assert cache.evict("test", 2 * size) == 1
+    assert cache.load_arrays("test", "old") is None
+    assert cache.load_arrays("test", "new") is not None
+
+
+def test_clear(cache_dir):
+    cache.save_arrays("test", "key", a = numpy.zeros(3))
+    cache.clear("test")
+    assert cache.load_arrays("test", "key") is None
+
+
+def test_raw_arrays(cache_dir):
+    vertices = numpy.random.rand(10, 3).astype(numpy.float32)
+    cache.save_raw("test", "key", vertices = vertices, empty = numpy.zeros(0, dtype = numpy.uint32))
+    arrays = cache.map_raw("test", "key")
+    assert numpy.array_equal(arrays["vertices"], vertices)
+    assert arrays["vertices"].dtype == numpy.float32
+    assert len(arrays["empty"]) == 0
+    assert cache.map_raw("test", "other") is None
+
+
+def test_save_raw_overwrites_an_existing_entry(cache_dir):
+    cache.save_raw("test", "key", a = numpy.zeros(3))
+    cache.save_raw("test", "key", a = numpy.ones(3))
+    assert numpy.array_equal(cache.map_raw("test", "key")["a"], numpy.ones(3))
+
+
+def test_save_keeps_max_size(cache_dir, monkeypatch):
+    # a limit above the default is not capped at the default
+    monkeypatch.setattr(cache, "max_bytes", 1)
+    for i in range(3):
+        cache.save_raw("test", "key%d" % i, max_size = 10**9, a = numpy.zeros(100))
+    assert len(os.listdir(cache.kind_dir("test"))) == 3
+    cache.save_raw("test", "key3", a = numpy.zeros(100))
+    assert len(os.listdir(cache.kind_dir("test"))) == 0
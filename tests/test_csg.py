@@ -0,0 +1,49 @@
+import numpy
+
+import cache
+import csg
+
+
+def test_tree_pairs_ends_in_the_last():
+    for n in range(1, 40):
+        levels = csg.tree_pairs(n)
+        alive = set(range(n))
+        for level in levels:
+            used = [i for pair in level for i in pair]
+            # each object at most once per level
+            assert len(used) == len(set(used))
+            for target, obj in level:
+                assert target in alive and obj in alive
+                alive.remove(obj)
+        assert alive == set([n - 1])
+        # a balanced tree: about log2(n) levels
+        assert len(levels) == (n - 1).bit_length()
+
+
+def test_boolean_key():
+    elements = [{"id":"a", "loc":(0,0,0)}, {"id":"b", "loc":(1,0,0)}]
+    names = ["a", "b"]
+    # the keys of before the methods stay the same
+    assert csg.boolean_key(elements, names, "UNION") == cache.make_key("boolean", elements, names, "UNION")
+    assert csg.boolean_key(elements, names, "UNION", prune = True) == cache.make_key("boolean", elements, names, "UNION", "prune")
+    assert csg.boolean_key(elements, names, "UNION", method = "tree") != csg.boolean_key(elements, names, "UNION")
+
+
+def test_holder_jobs():
+    parts = {"block":[{"id":"b1", "loc":(0,0,0)}, {"id":"b2", "loc":(1,0,0)}], "green_channel":[{"id":"g1", "loc":(0,0,0)}]}
+    jobs = csg.holder_jobs(parts, "tree", True)
+    assert [j["name"] for j in jobs] == ["block", "green_channel"]
+    assert jobs[0]["name_list"] == ["b1", "b2"]
+    assert jobs[0]["method"] == "tree" and jobs[0]["prune"]
+
+
+def test_boolean_key_with_meshes():
+    elements = [{"id":"a", "loc":(0,0,0)}, {"id":"b", "loc":(1,0,0)}]
+    names = ["a", "b"]
+    mesh = {"vertices":numpy.zeros((8, 3), dtype = numpy.float32), "loop_totals":numpy.full(6, 4, dtype = numpy.int32)}
+    key = csg.boolean_key(elements, names, "DIFFERENCE", meshes = [mesh, mesh])
+    assert key != csg.boolean_key(elements, names, "DIFFERENCE")
+    assert key == csg.boolean_key(elements, names, "DIFFERENCE", meshes = [dict(mesh), dict(mesh)])
+    # another union before the difference gives other meshes
+    other = dict(mesh, vertices = numpy.ones((8, 3), dtype = numpy.float32))
+    assert csg.boolean_key(elements, names, "DIFFERENCE", meshes = [other, mesh]) != key
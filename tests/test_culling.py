@@ -0,0 +1,49 @@
+import pytest
+
+import build
+import culling
+import tessellation
+
+CAMERA = [{"loc":(0,0,0), "rot":(0,0,0), "focus":35, "clip_end":100}]
+RESOLUTION = (1920, 1080, 100)
+
+# the camera looks along -z
+ELEMENTS = [
+    {"id":"front", "shape":"cylinder", "loc":(0,0,-10), "radius":0.5, "depth":2},
+    {"id":"behind", "shape":"cylinder", "loc":(0,0,10), "radius":0.5, "depth":2},
+    {"id":"side", "shape":"cube", "loc":(100,0,-10)},
+    {"id":"edge", "shape":"cube", "loc":(6,0,-10)},
+    {"id":"beyond", "shape":"cone", "loc":(0,0,-150)},
+    {"id":"big", "shape":"cube", "loc":(0,0,-150), "scale":(60,60,60)},
+    {"id":"unknown", "loc":(0,0,10)},
+]
+
+
+def test_cull_skip():
+    result, hidden = culling.cull(ELEMENTS, CAMERA, RESOLUTION)
+    assert hidden == ["behind", "side", "beyond"]
+    # elements without a shape are kept
+    assert [e["id"] for e in result] == ["front", "edge", "big", "unknown"]
+
+
+def test_cull_placeholder():
+    result, hidden = culling.cull(ELEMENTS, CAMERA, RESOLUTION, "placeholder")
+    assert [e["id"] for e in result] == [e["id"] for e in ELEMENTS]
+    by_id = dict((e["id"], e) for e in result)
+    assert by_id["behind"]["vertices"] == tessellation.MIN_VERTICES
+    assert by_id["beyond"]["vertices"] == tessellation.MIN_VERTICES
+    assert "vertices" not in by_id["front"]
+    with pytest.raises(ValueError):
+        culling.cull(ELEMENTS, CAMERA, RESOLUTION, "hide")
+
+
+def test_culled_elements_are_not_built(bpy):
+    for mode in culling.MODES:
+        result, hidden = culling.cull(ELEMENTS, CAMERA, RESOLUTION, mode)
+        names = build.add_primitives(result, bulk = True, shared = True)
+        if mode == "skip":
+            assert not any(n in bpy.data.objects for n in hidden)
+        else:
+            # cheap, but there
+            assert len(bpy.data.objects["behind"].data.vertices) == 2 * tessellation.MIN_VERTICES + 2
+        build.remove_objects(names)
@@ -0,0 +1,104 @@
+import build
+import incremental
+import stub_bpy
+
+
+def elements():
+    return [
+        {"id":"a", "shape":"cube", "loc":(0,0,0)},
+        {"id":"b", "shape":"cube", "loc":(3,0,0)},
+        {"id":"c", "shape":"cylinder", "loc":(6,0,0), "radius":1, "depth":2},
+    ]
+
+
+def run(stages):
+    """
+    One run of run.py: stages is a dictionary of stage name and (elements, options for incremental.primitives).
+    """
+    incremental.begin(True)
+    for stage, (e, options) in stages.items():
+        incremental.primitives(stage, e, **options)
+    return incremental.end()
+
+
+def test_only_what_changed(bpy):
+    mat = bpy.data.materials.new("mat")
+    assert run({"parts":(elements(), {"material":mat, "bulk":True})}) == set(["parts"])
+    a = bpy.data.objects["a"]
+    b = bpy.data.objects["b"]
+
+    # nothing changed
+    stub_bpy.reset_counters()
+    assert run({"parts":(elements(), {"material":mat, "bulk":True})}) == set()
+    assert "scene.update" not in stub_bpy.calls
+
+    # b moved, c is gone, d is new
+    e = elements()
+    e[1]["loc"] = (3,1,0)
+    e[2] = {"id":"d", "shape":"cube", "loc":(9,0,0)}
+    assert run({"parts":(e, {"material":mat, "bulk":True})}) == set(["parts"])
+    assert bpy.data.objects["a"] is a
+    assert bpy.data.objects["b"] is b
+    assert tuple(b.location) == (3,1,0)
+    assert "c" not in bpy.data.objects
+    assert bpy.data.objects["d"].active_material is mat
+
+    # another material, the same objects
+    other = bpy.data.materials.new("other")
+    run({"parts":(e, {"material":other, "bulk":True})})
+    assert bpy.data.objects["a"] is a
+    assert a.active_material is other
+
+
+def test_boolean_group_is_made_again(bpy):
+    booleans = [{"operation":"UNION"}]
+    run({"block":(elements(), {"booleans":booleans})})
+    a = bpy.data.objects["a"]
+    run({"block":(elements(), {"booleans":booleans})})
+    assert bpy.data.objects["a"] is a
+
+    e = elements()
+    e[1]["loc"] = (3,1,0)
+    assert run({"block":(e, {"booleans":booleans})}) == set(["block"])
+    assert bpy.data.objects["a"] is not a
+
+    # a group that uses it is made again too
+    run({"block":(e, {"booleans":booleans}), "holes":([{"id":"h", "loc":(0,0,0)}], {"booleans":[{"name_list":["h", "c"], "operation":"DIFFERENCE"}], "depends":["block"]})})
+    h = bpy.data.objects["h"]
+    e[0]["loc"] = (0,1,0)
+    assert run({"block":(e, {"booleans":booleans}), "holes":([{"id":"h", "loc":(0,0,0)}], {"booleans":[{"name_list":["h", "c"], "operation":"DIFFERENCE"}], "depends":["block"]})}) == set(["block", "holes"])
+    assert bpy.data.objects["h"] is not h
+
+
+def test_stage_not_built_anymore(bpy):
+    run({"mirror":(elements(), {}), "plane":([{"id":"p", "shape":"plane", "loc":(0,0,0)}], {})})
+    assert run({"plane":([{"id":"p", "shape":"plane", "loc":(0,0,0)}], {})}) == set(["mirror"])
+    assert not any(n in bpy.data.objects for n in ["a", "b", "c"])
+    assert "p" in bpy.data.objects
+
+
+def test_off_builds_everything(bpy):
+    run({"parts":(elements(), {})})
+    a = bpy.data.objects["a"]
+    build.remove_objects(["a", "b", "c"])
+    incremental.begin(False)
+    incremental.primitives("parts", elements())
+    assert incremental.end() == set(["parts"])
+    assert bpy.data.objects["a"] is not a
+
+
+def test_camera_and_previous_vertices(bpy):
+    camera = [{"loc":(1,2,3), "rot":(0,0,0), "focus":35, "clip_end":100}]
+    e = elements()
+    e[2]["vertices"] = 24
+    incremental.begin(True)
+    incremental.camera("camera", camera)
+    incremental.primitives("parts", e)
+    incremental.end()
+
+    incremental.begin(True)
+    assert incremental.previous_vertices() == {"c":24}
+    incremental.camera("camera", [dict(camera[0], loc = (1,2,4))])
+    incremental.primitives("parts", e)
+    assert incremental.end() == set(["camera"])
+    assert tuple(bpy.data.objects["Camera"].location) == (1,2,4)
@@ -0,0 +1,89 @@
+import pytest
+
+import build
+import construction
+import incremental
+import instancing
+import stub_bpy
+
+ELEMENTS = [
+    {"id":"block", "shape":"cube", "loc":(0,0,0)},
+    {"id":"channel", "shape":"cylinder", "loc":(0,0,0), "radius":0.5, "depth":3},
+    {"id":"operand", "shape":"cube", "loc":(0,2,0)},
+]
+
+
+def assembly(bpy):
+    names = build.add_primitives(ELEMENTS, bpy.data.materials.new("mat"), bulk = True)
+    # like an operand after a boolean operation
+    bpy.data.objects["operand"].hide_render = True
+    return names
+
+
+def test_grid():
+    grid = construction.define_grid(3, 2, (10, 20))
+    assert len(grid) == 5
+    assert grid[0] == {"id":"holder_1_0", "loc":(10, 0, 0)}
+    assert grid[-1]["loc"] == (20, 20, 0)
+
+
+def test_group_copies(bpy):
+    names = assembly(bpy)
+    grid = construction.define_grid(4, 4, (10, 10))
+    stub_bpy.reset_counters()
+    copies = instancing.make_copies("instances", names, grid)
+    # one empty per copy, no new meshes
+    assert copies == [t["id"] for t in grid]
+    assert "meshes" not in stub_bpy.allocations
+    group = bpy.data.groups["instances"]
+    assert sorted(o.name for o in group.objects) == ["block", "channel"]
+    for name, t in zip(copies, grid):
+        obj = bpy.data.objects[name]
+        assert obj.dupli_type == "GROUP" and obj.dupli_group is group
+        assert tuple(obj.location) == t["loc"]
+        assert obj.name in bpy.context.scene.objects
+
+    # again: the old group is replaced
+    instancing.make_copies("instances", names, grid[:1])
+    assert len([g for g in bpy.data.groups if g.name == "instances"]) == 1
+
+
+def test_linked_copies(bpy):
+    names = assembly(bpy)
+    grid = construction.define_grid(2, 2, (10, 10))
+    stub_bpy.reset_counters()
+    copies = instancing.make_copies("instances", names, grid, method = "linked")
+    assert "meshes" not in stub_bpy.allocations
+    assert copies[:3] == ["holder_1_0", "holder_1_0_block", "holder_1_0_channel"]
+    assert len(copies) == 3 * len(grid)
+    copy = bpy.data.objects["holder_1_0_channel"]
+    # shares the mesh, moves with its empty
+    assert copy.data is bpy.data.objects["channel"].data
+    assert copy.parent is bpy.data.objects["holder_1_0"]
+
+
+def test_unknown_method(bpy):
+    with pytest.raises(ValueError):
+        instancing.make_copies("instances", assembly(bpy), [], method = "array")
+
+
+def test_incremental_instances(bpy):
+    names = assembly(bpy)
+    grid = construction.define_grid(2, 1, (10, 10))
+    incremental.begin(True)
+    copies = incremental.instances("instances", names, grid)
+    incremental.end()
+    empty = bpy.data.objects[copies[0]]
+
+    # nothing changed: the same copies
+    incremental.begin(True)
+    assert incremental.instances("instances", names, grid) == copies
+    assert incremental.end() == set()
+    assert bpy.data.objects[copies[0]] is empty
+
+    # the assembly changed: made again
+    incremental.begin(True)
+    incremental.changed.add("block")
+    incremental.instances("instances", names, grid, depends = ["block"])
+    assert "instances" in incremental.end()
+    assert bpy.data.objects[copies[0]] is not empty
@@ -0,0 +1,64 @@
+import numpy
+import pytest
+
+import lod
+
+
+def sphere(n = 80):
+    """
+    A UV sphere with radius 1 and about 2 n^2 triangles, with a color per vertex.
+    """
+    theta = numpy.linspace(0, numpy.pi, n + 1)
+    phi = numpy.linspace(0, 2 * numpy.pi, 2 * n, endpoint = False)
+    t, p = numpy.meshgrid(theta, phi, indexing = "ij")
+    vertices = numpy.column_stack((numpy.sin(t).ravel() * numpy.cos(p).ravel(), numpy.sin(t).ravel() * numpy.sin(p).ravel(), numpy.cos(t).ravel()))
+    i, j = numpy.meshgrid(numpy.arange(n), numpy.arange(2 * n), indexing = "ij")
+    a = i * 2 * n + j
+    b = i * 2 * n + (j + 1) % (2 * n)
+    quads = numpy.column_stack((a.ravel(), b.ravel(), b.ravel() + 2 * n, a.ravel() + 2 * n))
+    return {
+        "vertices":vertices.astype(numpy.float32),
+        "loop_totals":numpy.full(len(quads), 4, dtype = numpy.uint32),
+        "loop_vertices":quads.ravel().astype(numpy.uint32),
+        "colors":numpy.tile(numpy.float32([1, 0.5, 0]), (len(vertices), 1)),
+    }
+
+
+def test_triangulate():
+    t = lod.triangulate([4, 3, 5], [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11])
+    assert t.tolist() == [[0, 1, 2], [0, 2, 3], [4, 5, 6], [7, 8, 9], [7, 9, 10], [7, 10, 11]]
+
+
+def test_simplify_levels():
+    geometry = sphere()
+    assert lod.simplify(geometry, "full") is geometry
+    for quality in ["medium", "low", "draft"]:
+        result = lod.simplify(geometry, quality)
+        assert 0 < len(result["loop_totals"]) <= lod.level_faces(quality)
+        assert result["loop_vertices"].max() < len(result["vertices"])
+        # still the same sphere, the same color
+        radius = numpy.linalg.norm(result["vertices"], axis = 1)
+        assert radius.max() <= 1 + 1e-6
+        assert radius.mean() > 0.8
+        assert numpy.allclose(result["colors"], [1, 0.5, 0])
+    with pytest.raises(ValueError):
+        lod.simplify(geometry, "better")
+
+
+def test_simplify_cached(cache_dir):
+    geometry = sphere()
+    a = lod.simplify(geometry, "draft", key = "sphere")
+    b = lod.simplify(geometry, "draft", key = "sphere")
+    assert isinstance(b["vertices"], numpy.memmap)
+    assert numpy.array_equal(a["loop_vertices"], b["loop_vertices"])
+
+
+def test_auto_quality():
+    geometry = sphere(10)
+    camera = {"loc":(0,0,0), "rot":(0,0,0), "focus":35}
+    resolution = (1920, 1080, 100)
+    # in front of the camera is -z
+    assert lod.auto_quality(geometry, {"loc":(0,0,-2), "scale":(1,1,1)}, camera, resolution) == "full"
+    assert lod.auto_quality(geometry, {"loc":(0,0,-2000), "scale":(1,1,1)}, camera, resolution) == "draft"
+    # behind the camera
+    assert lod.auto_quality(geometry, {"loc":(0,0,2), "scale":(1,1,1)}, camera, resolution) == "draft"
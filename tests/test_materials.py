@@ -0,0 +1,84 @@
+import os
+
+import numpy
+
+import materials
+import png
+import stub_bpy
+
+
+def test_registry_binds_the_arguments(bpy):
+    mat = materials.material_laser()
+    assert materials.material_laser(False) is mat
+    assert materials.material_laser(out = False) is mat
+    assert materials.material_laser(True) is not mat
+    assert len(bpy.data.materials) == 2
+
+
+def test_registry_follows_the_source(bpy):
+    def factory():
+        return bpy.data.materials.new("mat")
+    old = materials.registered(factory)
+    # the same name, other code
+    def factory():
+        mat = bpy.data.materials.new("mat")
+        mat.alpha = 0.5
+        return mat
+    new = materials.registered(factory)
+    assert old() is old()
+    assert new() is not old()
+
+
+def test_collect_garbage(bpy):
+    used = materials.material_block()
+    obj = bpy.data.objects.new("obj", bpy.data.meshes.new("mesh"))
+    obj.active_material = used
+    materials.material_laser()
+    removed = materials.collect_garbage()
+    assert removed["materials"] == 1
+    assert list(bpy.data.materials) == [used]
+
+
+def write_plot(path, width = 4, height = 4):
+    png.write_png(path, {"bit_depth":8, "color_type":2}, numpy.zeros((height, width * 3), dtype = numpy.uint8))
+
+
+def test_plot_material_follows_the_image(tmp_path, bpy):
+    resources_path = str(tmp_path) + os.sep
+    path = materials.plot_path(resources_path)
+    write_plot(path)
+    os.utime(path, (1000, 1000))
+
+    mat = materials.material_plot(resources_path)
+    assert materials.material_plot(resources_path, False) is mat
+
+    # a new plot
+    os.utime(path, (2000, 2000))
+    assert materials.material_plot(resources_path) is not mat
+
+
+def test_image_size():
+    assert materials.image_size(None) is None
+    assert materials.image_size(300) == 512
+    assert materials.image_size(512) == 512
+
+
+def test_load_image_scaled_and_reused(tmp_path, bpy, cache_dir, monkeypatch):
+    monkeypatch.setattr(materials, "image_stats", {"loaded":0, "reused":0})
+    path = str(tmp_path / "plot.png")
+    write_plot(path, 64, 32)
+
+    img = materials.load_image(path, 20)
+    # the longest side is 32, the first power of 2 above 20
+    assert list(img.size) == [32, 16]
+    assert materials.load_image(path, 30) is img
+    assert list(materials.load_image(path).size) == [64, 32]
+    assert materials.image_stats == {"loaded":2, "reused":1}
+
+    # in a new scene, the small copy comes from the cache
+    b = stub_bpy.install()
+    monkeypatch.setattr(materials, "bpy", b)
+    stub_bpy.reset_counters()
+    img = materials.load_image(path, 20)
+    assert list(img.size) == [32, 16]
+    assert "image.scale" not in stub_bpy.calls
@@ -0,0 +1,82 @@
+import math
+
+import numpy
+
+import animation
+import build
+import construction
+import optics
+import spatial
+
+# a mirror at 45 degrees in the beam to the plot, the reflection goes to -x, to a plot facing it
+MIRROR = [{"id":"mirror", "loc":(0,-10,0), "shape":"cylinder", "radius":3, "depth":0.1, "rot":(math.pi/2,0,math.pi/4)}]
+PLOT = [{"id":"plot", "loc":(-10,-10,0), "shape":"cylinder", "radius":3, "depth":0.01, "rot":(0,math.pi/2,0)}]
+
+
+def reflected_laser():
+    return construction.define_laser(focus_location = (0,0,0), plot_loc = (0,-10,0), targets = MIRROR + PLOT, mirrors = ["mirror"])
+
+
+def test_reflected_beam_ends_on_plot():
+    laser = dict((l["id"], l) for l in reflected_laser())
+    # the beam from the focus ends on the mirror
+    assert numpy.allclose(laser["pulse2out"]["loc"], (0,-10,0), atol = 0.1)
+    # the reflection starts there and ends on the front of the plot
+    segment = laser["pulse2out_r1"]
+    assert numpy.allclose(segment["start"], laser["pulse2out"]["loc"])
+    assert numpy.allclose(segment["loc"], (-10 + 0.005, laser["pulse2out"]["loc"][1], 0))
+    assert segment["mat"] == "out"
+    assert sorted(laser) == ["pulse1in", "pulse2in", "pulse2out", "pulse2out_r1"]
+
+
+def test_without_mirror_no_reflection():
+    laser = construction.define_laser(focus_location = (0,0,0), plot_loc = (0,-10,0), targets = MIRROR + PLOT)
+    assert [l["id"] for l in laser] == ["pulse1in", "pulse2in", "pulse2out"]
+
+
+def test_beam_segments():
+    # two mirrors facing each other: the first ray bounces between them, the second misses
+    mirrors = [
+        {"id":"a", "shape":"plane", "loc":(0,0,5), "scale":(2,2,1)},
+        {"id":"b", "shape":"plane", "loc":(0,0,-5), "scale":(2,2,1)},
+    ]
+    result = optics.trace([(0,0,0), (10,0,0)], (0,0,1), optics.surfaces(mirrors, ["a", "b"]), max_bounces = 3)
+    segments = optics.beam_segments(result, ["x", "y"])
+    assert [(s["id"], s["bounce"]) for s in segments] == [("x", 0), ("x_r1", 1), ("x_r2", 2), ("x_r3", 3), ("y", 0)]
+    assert numpy.allclose([s["end"][2] for s in segments[:4]], [5, -5, 5, -5])
+    assert numpy.allclose(segments[1]["start"], segments[0]["end"])
+    assert numpy.isclose(segments[4]["end"][2], optics.MAX_LENGTH)
+
+
+def test_laser_primitives_cylinder():
+    primitives = build.laser_primitives(reflected_laser(), [{"loc":(0,0,0)}], 0.3, 0.6)
+    by_id = dict((e["id"], e) for e in primitives)
+    assert by_id["pulse2out"]["shape"] == "cone"
+    cylinder = by_id["pulse2out_r1"]
+    assert (cylinder["shape"], cylinder["radius"], cylinder["depth"], cylinder["mat"]) == ("cylinder", 1, 2, "out")
+    # the ends of the cylinder are the ends of the segment, as wide as the cone
+    segment = [l for l in reflected_laser() if l["id"] == "pulse2out_r1"][0]
+    m = spatial.element_matrix(cylinder)
+    ends = [numpy.dot(m, (0,0,z,1))[:3] for z in (-1, 1)]
+    assert numpy.allclose(sorted(map(tuple, ends)), sorted([segment["start"], segment["loc"]]))
+    assert numpy.allclose(cylinder["scale"][:2], (0.6, 0.6))
+
+
+def test_build_reflected_beam(bpy):
+    primitives = build.laser_primitives(reflected_laser(), [{"loc":(0,0,0)}], 0.3, 0.6)
+    mat = bpy.data.materials.new("out")
+    names = build.add_primitives(primitives, mat, bulk = True)
+    assert names == [e["id"] for e in primitives]
+    cylinder = bpy.context.scene.objects["pulse2out_r1"]
+    # a cylinder has two rings of vertices
+    assert len(build.mesh_to_arrays(cylinder.data)["vertices"]) % 2 == 0
+    assert cylinder.active_material is mat
+
+
+def test_pulses_follow_reflection():
+    starts, ends = animation.pulse_paths(reflected_laser(), [{"loc":(0,0,0)}])
+    laser = reflected_laser()
+    assert numpy.allclose(starts[3], laser[3]["start"])
+    assert numpy.allclose(ends[3], laser[3]["loc"])
+    # the reflection starts where the first part ends
+    assert numpy.allclose(starts[3], ends[2])
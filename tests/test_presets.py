@@ -0,0 +1,102 @@
+import json
+
+import numpy
+import pytest
+
+import build
+import presets
+
+RESOLUTION = (1000, 500, 100)
+
+
+@pytest.fixture
+def model_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(presets, "MODEL_FILE", str(tmp_path / "cost_model.json"))
+    return tmp_path / "cost_model.json"
+
+
+def scene(bpy):
+    """
+    A gold mirror, a lamp and two proteins: one with raytracing from its factory, one without.
+    """
+    gold = bpy.data.materials.new("gold")
+    gold.raytrace_mirror.use = True
+    gold.raytrace_mirror.depth = 100
+    gold.raytrace_mirror.reflect_factor = 1
+    build.add_primitives([{"id":"mirror", "loc":(0,0,0)}], gold, bulk = True)
+    bpy.data.lamps.new("lamp")
+    bpy.context.scene.objects.link(bpy.data.objects.new("lamp", bpy.data.lamps["lamp"]))
+    for name, raytrace in [("shadows", True), ("flat", False)]:
+        mat = bpy.data.materials.new(name)
+        mat.use_raytrace = raytrace
+        build.add_primitives([{"id":name, "loc":(3,0,0)}], mat, bulk = True)
+    return gold
+
+
+def test_apply_and_back(bpy, model_file):
+    gold = scene(bpy)
+    proteins = ["shadows", "flat"]
+    presets.apply("preview", RESOLUTION, proteins)
+    assert bpy.context.scene.render.resolution_percentage == 25
+    assert gold.raytrace_mirror.depth == 2
+    assert bpy.data.lamps["lamp"].shadow_method == "NOSHADOW"
+    assert not bpy.data.materials["shadows"].use_raytrace
+
+    # final gives back what the factories made
+    presets.apply("final", RESOLUTION, proteins)
+    assert bpy.context.scene.render.resolution_percentage == 100
+    assert gold.raytrace_mirror.depth == 100
+    assert bpy.data.materials["shadows"].use_raytrace
+    assert not bpy.data.materials["flat"].use_raytrace
+
+
+def test_describe(bpy, model_file):
+    scene(bpy)
+    final = presets.describe("final", RESOLUTION, ["shadows", "flat"])
+    assert final["pixels"] == 1000 * 500
+    assert final["mirror_depth"] == 100
+    assert final["shadow_lamps"] == 1
+    # only the protein with raytracing
+    assert final["protein_faces"] == 6
+    assert presets.describe("draft", RESOLUTION, ["shadows", "flat"])["protein_faces"] == 0
+    assert presets.describe("final", RESOLUTION)["protein_faces"] == 0
+
+
+def test_calibrate(tmp_path, model_file):
+    coefficients = numpy.array([2, 1, 0.5, 3, 0.25, 4, 10])
+    variants = []
+    rng = numpy.random.RandomState(0)
+    for i in range(20):
+        d = {
+            "preset":"final",
+            "pixels":int(rng.randint(10**5, 10**6)),
+            "samples":int(rng.choice([5, 8, 16])),
+            "full_sample":bool(rng.randint(2)),
+            "mirror_depth":int(rng.randint(0, 200)),
+            "shadow_lamps":int(rng.randint(0, 3)),
+            "protein_faces":int(rng.randint(0, 10**6)),
+            "faces":int(rng.randint(0, 10**6)),
+        }
+        variants.append({"name":"v%d" % i, "scene":d, "render":presets.predict(d, coefficients)})
+    # tiles don't count
+    variants.append({"name":"tile", "scene":d, "render":1000, "tile":[0, 0]})
+    timings = tmp_path / "timings.json"
+    timings.write_text(json.dumps({"variants":variants}))
+
+    assert numpy.allclose(presets.calibrate([str(timings)]), coefficients)
+    assert numpy.allclose(presets.load_model(), coefficients)
+
+
+def test_old_model_is_not_used(model_file):
+    model_file.write_text(json.dumps({"features":presets.FEATURES[:-2] + ["faces"], "coefficients":[1, 2, 3, 4, 5, 6]}))
+    assert presets.load_model() == presets.DEFAULT_COEFFICIENTS
+
+
+def test_choose(bpy, model_file):
+    scene(bpy)
+    final = presets.predict(presets.describe("final", RESOLUTION))
+    assert presets.choose(final + 1, RESOLUTION) == "final"
+    assert presets.choose(final - 0.01, RESOLUTION) in ["draft", "preview"]
+    assert presets.choose(0, RESOLUTION) == "preview"
+    with pytest.raises(ValueError):
+        presets.get_preset("best")
@@ -0,0 +1,39 @@
+import progress
+
+
+def test_parse_frames():
+    assert progress.parse_frames("1-5") == [1, 2, 3, 4, 5]
+    assert progress.parse_frames("7") == [7]
+    assert progress.parse_frames("1-3,2-4,10") == [1, 2, 3, 4, 10]
+
+
+def test_chunks():
+    assert progress.chunks([1, 2, 3, 4, 5], 2) == [[1, 2], [3, 4], [5]]
+    # frames that are done leave gaps, a chunk doesn't jump over them
+    assert progress.chunks([5, 1, 2, 4], 10) == [[1, 2], [4, 5]]
+
+
+def test_done_frames(tmp_path):
+    output = str(tmp_path)
+    for frame in [1, 2, 3]:
+        open(progress.frame_file(output, "v", frame), "wb").close()
+        progress.record(output, "v", frame, "new", 1.5)
+    # rendered with another scene
+    progress.record(output, "v", 4, "old", 1.0)
+    open(progress.frame_file(output, "v", 4), "wb").close()
+    # recorded, but the picture is gone
+    progress.record(output, "v", 5, "new", 1.0)
+    # the last line of a Blender that was killed
+    with open(progress.progress_file(output, "v"), "a") as f:
+        f.write('{"frame":6, "ha')
+    assert progress.done_frames(output, "v", "new") == set([1, 2, 3])
+    assert progress.done_frames(output, "other", "new") == set()
+
+
+def test_report():
+    assert progress.frames_per_minute(30, 60) == 30
+    assert progress.time_to_go(60, 30) == 120
+    assert progress.time_to_go(60, 0) is None
+    assert progress.format_time(3725) == "1 h 2 min"
+    assert progress.report(50, 100, 10, 60) == "50 of 100 frames done, 10.0 frames per minute, 5 min 0 s to go"
+    assert progress.report(0, 100, 0, 0).endswith("? to go")
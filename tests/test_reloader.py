@@ -0,0 +1,57 @@
+import sys
+
+import pytest
+
+import reloader
+
+
+@pytest.fixture
+def chain(tmp_path, monkeypatch):
+    """
+    Three modules in a folder: rl_top imports rl_mid, rl_mid imports rl_leaf.
+    """
+    monkeypatch.setattr(reloader, "package_dir", str(tmp_path))
+    monkeypatch.setattr(sys, "dont_write_bytecode", True)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    (tmp_path / "rl_leaf.py").write_text("VALUE = 1\n")
+    (tmp_path / "rl_mid.py").write_text("import rl_leaf\nSEEN = rl_leaf.VALUE\n")
+    (tmp_path / "rl_top.py").write_text("import rl_mid\n")
+    yield tmp_path
+    for name in ["rl_leaf", "rl_mid", "rl_top"]:
+        sys.modules.pop(name, None)
+        reloader.sources.pop(name, None)
+
+
+def test_reload_changed_follows_the_imports(chain, monkeypatch):
+    import rl_top
+    import rl_mid
+    import rl_leaf
+    # just imported: nothing to reload
+    assert reloader.reload_changed(rl_top) == []
+
+    monkeypatch.setitem(reloader.STAGE_MODULES, "test", ["rl_leaf"])
+    code = reloader.stage_code("test")
+    assert code["rl_leaf"] is not None
+
+    (chain / "rl_leaf.py").write_text("VALUE = 22\n")
+    # not loaded yet, so the stage has the old code
+    assert reloader.stage_code("test") == code
+
+    # the leaf changed, the module that imports it is reloaded after it
+    assert reloader.reload_changed(rl_top) == ["rl_leaf", "rl_mid"]
+    assert rl_leaf.VALUE == 22
+    assert rl_mid.SEEN == 22
+    assert reloader.stage_code("test") != code
+
+    assert reloader.reload_changed(rl_top) == []
+
+
+def test_import_order(chain):
+    import rl_top
+    modules = reloader.package_modules()
+    assert reloader.import_order(rl_top, modules) == ["rl_leaf", "rl_mid"]
+
+
+def test_stages():
+    assert "primitives" in reloader.stages("build")
+    assert reloader.stages("materials") == []
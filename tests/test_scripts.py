@@ -0,0 +1,36 @@
+"""
+Blender runs batch.py and csg.py with -P, from any folder, without their folder in sys.path.
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# like blender -P: the script is run with exec, bpy is there, the other modules are not
+RUN = """
+import os, sys
+sys.path.insert(0, %(package_dir)r)
+import stub_bpy
+stub_bpy.install()
+sys.path.remove(%(package_dir)r)
+for name in list(sys.modules):
+    module = sys.modules[name]
+    if name not in ("bpy", "stub_bpy") and os.path.dirname(os.path.abspath(getattr(module, "__file__", None) or "/")) == %(package_dir)r:
+        del sys.modules[name]
+script = %(script)r
+with open(script) as f:
+    exec(compile(f.read(), script, "exec"), {"__name__":"blender_script", "__file__":script})
+"""
+
+
+@pytest.mark.parametrize("name", ["batch.py", "csg.py"])
+def test_script_imports_from_another_folder(name, tmp_path):
+    code = RUN % {"package_dir":package_dir, "script":os.path.join(package_dir, name)}
+    env = dict(os.environ)
+    env.pop("PYTHONPATH", None)
+    result = subprocess.run([sys.executable, "-c", code], cwd = str(tmp_path), env = env, stdout = subprocess.PIPE, stderr = subprocess.STDOUT)
+    assert result.returncode == 0, result.stdout.decode()
@@ -0,0 +1,59 @@
+import numpy
+
+import spatial
+
+
+def cube(i, loc, scale = (1,1,1)):
+    return {"id":"c%d" % i, "loc":loc, "scale":scale}
+
+
+def test_boxes():
+    lo, hi = spatial.boxes([cube(0, (1, 2, 3), (1, 2, 3))])
+    assert lo[0].tolist() == [0, 0, 0]
+    assert hi[0].tolist() == [2, 4, 6]
+    # a rotated cube gets a bigger box
+    lo, hi = spatial.boxes([{"id":"r", "loc":(0,0,0), "rot":(0, 0, numpy.pi / 4)}])
+    assert numpy.allclose(hi[0], [numpy.sqrt(2), numpy.sqrt(2), 1])
+
+
+def test_query_is_the_same_as_brute_force():
+    rng = numpy.random.RandomState(1)
+    lo = rng.rand(500, 3) * 100
+    hi = lo + rng.rand(500, 3) * 5
+    bvh = spatial.make_bvh(lo, hi)
+    for i in range(0, 500, 25):
+        brute = numpy.flatnonzero(spatial.touch(lo, hi, lo[i], hi[i])).tolist()
+        assert spatial.query(bvh, lo[i], hi[i]) == brute
+
+
+def test_groups():
+    lo, hi = spatial.boxes([cube(0, (0,0,0)), cube(1, (1.5,0,0)), cube(2, (10,0,0)), cube(3, (3,0,0))])
+    assert spatial.groups(lo, hi) == [[0, 1, 3], [2]]
+
+
+def test_plan_union():
+    # c0 touches the target, c1 touches nothing, c2 touches c0 only
+    elements = [cube(0, (2,0,0)), cube(1, (20,0,0)), cube(2, (4,0,0)), cube(3, (0,0,0))]
+    plan = spatial.plan_booleans(elements, ["c0", "c1", "c2", "c3"], "UNION")
+    assert plan == {"c0":"boolean", "c1":"join", "c2":"boolean"}
+
+
+def test_plan_difference():
+    elements = [cube(0, (1,0,0)), cube(1, (20,0,0)), cube(3, (0,0,0))]
+    plan = spatial.plan_booleans(elements, ["c0", "c1", "c3"], "DIFFERENCE")
+    assert plan == {"c0":"boolean", "c1":"skip"}
+
+
+def test_mesh_box():
+    vertices = [(-1,-1,-1), (1,1,1)]
+    lo, hi = spatial.mesh_box(vertices, cube(0, (10,0,0), (2,1,1)))
+    assert lo.tolist() == [8, -1, -1]
+    assert hi.tolist() == [12, 1, 1]
+
+
+def test_plan_difference_with_merged_operand():
+    # c0 alone doesn't touch the target, but it holds c1 as well after a union
+    elements = [cube(0, (0,0,0)), cube(1, (10,0,0)), cube(3, (10,0,1.5))]
+    assert spatial.plan_booleans(elements, ["c0", "c3"], "DIFFERENCE") == {"c0":"skip"}
+    vertices = {"c0":[(-1,-1,-1), (1,1,1), (9,-1,-1), (11,1,1)]}
+    assert spatial.plan_booleans(elements, ["c0", "c3"], "DIFFERENCE", vertices = vertices) == {"c0":"boolean"}
@@ -0,0 +1,76 @@
+import subprocess
+import sys
+
+import pytest
+
+import spec
+
+
+@pytest.fixture(scope = "module")
+def scene():
+    return spec.make_spec(spec.run_settings())
+
+
+def test_make_spec(scene):
+    assert "block" in scene["parts"]
+    assert scene["order"][0] == "block"
+    # the same settings give the same hash
+    assert spec.spec_hash(scene) == spec.spec_hash(spec.make_spec(spec.run_settings()))
+
+
+def test_dumps_and_loads(scene):
+    assert spec.loads(spec.dumps(scene)) == scene
+    data = spec.dumps(scene, binary = True)
+    assert data[:len(spec.MAGIC)] == spec.MAGIC
+    assert spec.loads(data) == scene
+
+
+def test_save_and_load(scene, tmp_path):
+    for name in ["scene.json", "scene.spec"]:
+        spec.save(scene, str(tmp_path / name))
+        assert spec.load(str(tmp_path / name)) == scene
+
+
+def test_validate_rejects_a_broken_spec(scene):
+    broken = spec.normalize(scene)
+    broken["parts"]["block"][0]["loc"] = [1, 2]
+    broken["parts"]["block"][1]["id"] = broken["parts"]["block"][2]["id"]
+    with pytest.raises(ValueError) as e:
+        spec.validate(broken)
+    assert "'loc' should be a vector" in str(e.value)
+    assert "is used twice" in str(e.value)
+
+
+def test_diff(scene):
+    new = spec.normalize(scene)
+    block = new["parts"]["block"]
+    block[0]["loc"] = [100, 0, 0]
+    removed = block.pop(1)
+    block.append({"id":"block_new", "loc":[0, 0, 0]})
+    d = spec.diff(scene, new)
+    assert list(d) == ["block"]
+    assert d["block"] == {"added":["block_new"], "removed":[removed["id"]], "changed":[block[0]["id"]]}
+    assert spec.diff(scene, scene) == {}
+
+
+def test_variants(tmp_path):
+    filename = tmp_path / "variants.json"
+    filename.write_text('[{"name":"close", "plot_loc":[1, 2, 3]}, {"flag_no_proteins":true}]')
+    variants = spec.read_variants(str(filename))
+    assert [v["name"] for v in variants] == ["close", "variant_1"]
+
+    settings = spec.run_settings()
+    spec.apply_variant(settings, variants[0])
+    assert settings["plot_loc"] == (1, 2, 3)
+    with pytest.raises(KeyError):
+        spec.apply_variant(settings, {"name":"typo", "plot_lco":[0, 0, 0]})
+
+    filename.write_text('[{"name":"a"}, {"name":"a"}]')
+    with pytest.raises(ValueError):
+        spec.read_variants(str(filename))
+
+
+def test_no_import_of_batch():
+    # batch.py imports spec.py, not the other way around
+    code = "import sys; sys.path.insert(0, %r); import spec; print('batch' in sys.modules)" % spec.package_dir
+    assert subprocess.check_output([sys.executable, "-c", code]).strip() == b"False"
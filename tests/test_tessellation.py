@@ -0,0 +1,49 @@
+import math
+
+import build
+import tessellation
+
+CAMERA = {"loc":(0,0,0), "rot":(0,0,0), "focus":35}
+RESOLUTION = (1920, 1080, 100)
+
+
+def test_vertices_for_radius():
+    last = 0
+    for radius in [0.1, 1, 10, 100, 1000, 10**6]:
+        n = tessellation.vertices_for_radius(radius)
+        assert n % tessellation.STEP == 0
+        assert tessellation.MIN_VERTICES <= n <= tessellation.MAX_VERTICES
+        assert n >= last
+        last = n
+        # the polygon is close enough to the circle, unless it is at the maximum
+        if n < tessellation.MAX_VERTICES:
+            assert radius * (1 - math.cos(math.pi / n)) <= tessellation.MAX_ERROR
+    assert tessellation.vertices_for_radius(10**6) == tessellation.MAX_VERTICES
+
+
+def test_adapt():
+    # the camera looks along -z
+    elements = [
+        {"id":"near", "shape":"cylinder", "loc":(0,0,-5), "radius":1, "depth":1},
+        {"id":"far", "shape":"cylinder", "loc":(0,0,-500), "radius":1, "depth":1},
+        {"id":"given", "shape":"cone", "loc":(0,0,-5), "vertices":12},
+        {"id":"cube", "shape":"cube", "loc":(0,0,-5)},
+    ]
+    result = tessellation.adapt(elements, CAMERA, RESOLUTION)
+    assert result[0]["vertices"] > result[1]["vertices"]
+    assert result[2]["vertices"] == 12
+    assert "vertices" not in result[3]
+    # copies, the elements are not changed
+    assert "vertices" not in elements[0]
+
+    # a camera move doesn't lower the number of the last run
+    moved = tessellation.adapt(elements, dict(CAMERA, loc = (0,0,-495)), RESOLUTION, previous = {"near":result[0]["vertices"], "far":8})
+    assert moved[0]["vertices"] == result[0]["vertices"]
+    assert moved[1]["vertices"] > 8
+
+
+def test_built_with_the_vertices(bpy):
+    e = tessellation.adapt([{"id":"beam", "shape":"cylinder", "loc":(0,0,-500), "radius":1, "depth":1}], CAMERA, RESOLUTION)[0]
+    build.add_primitives([e], bulk = True, shared = True)
+    # two rings and the centres of the ends
+    assert len(bpy.data.objects["beam"].data.vertices) == 2 * e["vertices"] + 2
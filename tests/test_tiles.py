@@ -0,0 +1,41 @@
+import numpy
+
+import png
+import tiles
+
+
+def test_tile_rects_cover_the_picture():
+    covered = numpy.zeros((101, 203), dtype = int)
+    for i, j, x0, y0, x1, y1 in tiles.tile_rects(203, 101, 3, 2):
+        covered[y0:y1, x0:x1] += 1
+    assert numpy.all(covered == 1)
+
+
+def test_border():
+    rect = tiles.tile_rect(200, 100, 2, 2, 1, 0)
+    # the top right quarter, Blender counts y from the bottom
+    assert tiles.border(rect, 200, 100) == (0.5, 1.0, 0.5, 1.0)
+
+
+def test_png(tmp_path):
+    header = {"bit_depth":8, "color_type":6}
+    pixels = numpy.random.RandomState(0).randint(0, 256, (7, 5 * 4)).astype(numpy.uint8)
+    png.write_png(str(tmp_path / "a.png"), header, pixels)
+    assert png.png_size(str(tmp_path / "a.png")) == (5, 7)
+    read_header, read_pixels = png.read_png(str(tmp_path / "a.png"))
+    assert read_header["color_type"] == 6
+    assert numpy.array_equal(read_pixels, pixels)
+
+
+def test_stitch(tmp_path):
+    width, height = 13, 9
+    header = {"bit_depth":8, "color_type":2}
+    picture = numpy.random.RandomState(0).randint(0, 256, (height, width * 3)).astype(numpy.uint8)
+    tile_files = []
+    for rect in tiles.tile_rects(width, height, 3, 2):
+        i, j, x0, y0, x1, y1 = rect
+        filename = str(tmp_path / ("tile_%d_%d.png" % (i, j)))
+        png.write_png(filename, header, picture[y0:y1, x0*3:x1*3].copy())
+        tile_files.append((rect, filename))
+    tiles.stitch(tile_files, width, height, str(tmp_path / "all.png"))
+    assert numpy.array_equal(png.read_png(str(tmp_path / "all.png"))[1], picture)
@@ -0,0 +1,30 @@
+import json
+
+import build
+import tracing
+
+
+def test_trace_build(bpy, tmp_path):
+    add_primitives = build.add_primitives
+    elements = [{"id":"a", "shape":"cube", "loc":(0,0,0)}, {"id":"b", "shape":"cylinder", "loc":(3,0,0), "radius":1, "depth":2}]
+    tracing.start()
+    try:
+        build.add_primitives(elements)
+    finally:
+        result = tracing.stop(str(tmp_path / "trace.json"))
+    # the original functions are back
+    assert build.add_primitives is add_primitives
+
+    functions = dict((s["name"], s) for s in result)
+    s = functions["build.add_primitives"]
+    assert s["calls"] == 1
+    assert s["objects"] == 2
+    assert s["ops"] >= 2
+    # add_primitive is called by add_primitives, so it is inside it
+    assert functions["build.add_primitive"]["calls"] == 2
+    assert s["self"] <= s["total"]
+
+    with open(str(tmp_path / "trace.json")) as f:
+        trace = json.load(f)
+    names = [e["name"] for e in trace["traceEvents"] if e["ph"] == "X"]
+    assert names.count("add_primitive") == 2
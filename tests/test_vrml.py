@@ -0,0 +1,87 @@
+import tracemalloc
+
+import numpy
+
+import build
+import vrml
+
+
+WRL = """#VRML V2.0 utf8
+Viewpoint { position 0 0 10 description "view { [" }
+DirectionalLight { direction 0 0 -1 }
+Transform { translation 1 2 3 children [
+Shape {
+ appearance Appearance { material Material { diffuseColor 1 1 1 } }
+ geometry DEF IFS IndexedFaceSet {
+  coord Coordinate { point [ 0 0 0, 1 0 0, 1 1 0,
+   0 1 0, 0.5 0.5 1.25e0 ] }
+  normal Normal { vector [ 0 0 1, 0 0 1 ] }
+  color Color { color [ 1 0 0, 0 1 0, 0 0 1, 1 1 0, 1 1 1 ] }
+  coordIndex [ 0 1 2 3 -1 0 1 4 -1, 1 2 4 -1 2 3 -1 -1 3 0 4 ]
+ }
+}
+] }
+Shape { geometry IndexedFaceSet { coord Coordinate { point [ 5 5 5 6 5 5 5 6 5 ] } coordIndex [ 0 1 2 -1 ] } }
+"""
+
+
+def write(tmp_path):
+    filename = tmp_path / "test.wrl"
+    filename.write_text(WRL)
+    return str(filename)
+
+
+def test_split_faces():
+    totals, indices = vrml.split_faces([0, 1, 2, -1, 3, 4, 5, 6])
+    assert totals.tolist() == [3, 4]
+    assert indices.tolist() == [0, 1, 2, 3, 4, 5, 6]
+    totals, indices = vrml.split_faces([0, 1, 2, -1, -1, 3, 4, 5, -1])
+    assert totals.tolist() == [3, 3]
+
+
+def test_read_wrl(tmp_path):
+    geometry = vrml.read_wrl(write(tmp_path))
+    assert geometry["vertices"].shape == (8, 3)
+    assert geometry["vertices"].dtype == numpy.float32
+    assert geometry["vertices"][4].tolist() == [0.5, 0.5, 1.25]
+    # the face with 2 vertices is left out, the second face set comes after the first
+    assert geometry["loop_totals"].tolist() == [4, 3, 3, 3, 3]
+    assert geometry["loop_vertices"].tolist() == [0, 1, 2, 3, 0, 1, 4, 1, 2, 4, 3, 0, 4, 5, 6, 7]
+    # the second face set has no colors: the default color
+    assert geometry["colors"][0].tolist() == [1, 0, 0]
+    assert numpy.allclose(geometry["colors"][5], vrml.DEFAULT_COLOR)
+
+
+def test_read_wrl_in_small_chunks(tmp_path):
+    # tokens that are split over chunks
+    filename = write(tmp_path)
+    a = vrml.read_wrl(filename)
+    b = vrml.read_wrl(filename, chunk_size = 7)
+    for k in ["vertices", "loop_totals", "loop_vertices", "colors"]:
+        assert numpy.array_equal(a[k], b[k])
+
+
+
+def test_make_protein_leaves_tracing_running(tmp_path, bpy):
+    p = {"id":"protein", "filename":write(tmp_path), "loc":(1,2,3), "scale":(2,2,2)}
+    tracemalloc.start()
+    try:
+        obj = build.make_protein(p)
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+    assert len(obj.data.vertices) == 8
+    assert tuple(obj.location) == (1,2,3)
+
+    build.make_protein(dict(p, id = "protein2"))
+    assert not tracemalloc.is_tracing()
+
+
+def test_read_wrl_cached(tmp_path, cache_dir):
+    filename = write(tmp_path)
+    a = vrml.read_wrl_cached(filename)
+    # the second time from the cache, memory-mapped
+    b = vrml.read_wrl_cached(filename)
+    assert isinstance(b["vertices"], numpy.memmap)
+    assert numpy.array_equal(a["vertices"], b["vertices"])
+    assert numpy.array_equal(a["loop_vertices"], b["loop_vertices"])
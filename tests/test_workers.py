@@ -0,0 +1,28 @@
+import sys
+import time
+
+import workers
+
+
+def test_script_args():
+    assert workers.script_args(["batch.py", "variants.json", "--jobs", "2"]) == ["variants.json", "--jobs", "2"]
+    # inside Blender, the arguments of Blender come first
+    assert workers.script_args(["blender", "-b", "x.blend", "-P", "csg.py", "--", "--worker", "job.json"]) == ["--worker", "job.json"]
+
+
+def test_run_blender(tmp_path):
+    log_file = str(tmp_path / "job.log")
+    returncode, total = workers.run_blender([sys.executable, "-c", "import sys; print('building'); sys.exit(3)"], log_file)
+    assert returncode == 3
+    assert total >= 0
+    with open(log_file) as f:
+        assert f.read().strip() == "building"
+
+
+def test_run_all_keeps_the_order():
+    finished = []
+    # the first job takes longest
+    results = workers.run_all(lambda i, d: time.sleep(d) or i, [(0, 0.2), (1, 0), (2, 0)], 3, finished.append)
+    assert results == [0, 1, 2]
+    assert sorted(finished) == [0, 1, 2]
+    assert finished[-1] == 0
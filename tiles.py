@@ -0,0 +1,75 @@
+"""
+Split the picture in tiles that are rendered separately (with a render border), and stitch them together again. Used by batch.py with --tiles.
+
+The tiles are numbered from the top left, like the pixels in a PNG file. Blender counts the border from the bottom left.
+The tiles are pasted byte by byte, so the colors and the alpha (with flag_transparent_background) are exactly those of the tiles.
+
+It does not need Blender.
+
+Copyright Robbert Bloem, 2013
+"""
+
+import numpy
+
+import png
+
+
+def tile_rects(width, height, nx, ny):
+    """
+    Split a picture of width x height pixels in nx x ny tiles.
+    Returns a list with for each tile (column, row, x0, y0, x1, y1), in pixels from the top left, x1 and y1 not included.
+    """
+    xs = [int(round(i * width / nx)) for i in range(nx + 1)]
+    ys = [int(round(j * height / ny)) for j in range(ny + 1)]
+    rects = []
+    for j in range(ny):
+        for i in range(nx):
+            rects.append((i, j, xs[i], ys[j], xs[i+1], ys[j+1]))
+    return rects
+
+
+def tile_rect(width, height, nx, ny, column, row):
+    for rect in tile_rects(width, height, nx, ny):
+        if rect[0] == column and rect[1] == row:
+            return rect
+    raise ValueError("there is no tile %d, %d in %d x %d tiles" % (column, row, nx, ny))
+
+
+def border(rect, width, height):
+    """
+    The render border (border_min_x, border_max_x, border_min_y, border_max_y) of a tile, as fractions of the picture.
+    """
+    i, j, x0, y0, x1, y1 = rect
+    return x0 / width, x1 / width, 1 - y1 / height, 1 - y0 / height
+
+
+def stitch(tiles, width, height, filename):
+    """
+    Paste the tiles into one picture of width x height pixels and save it as filename.
+    tiles is a list of (rect, PNG file). If Blender made a tile a pixel bigger or smaller because of rounding, it is cut off or the pixel stays empty.
+    """
+    header = None
+    pixels = None
+    for rect, tile_file in tiles:
+        tile_header, tile_pixels = png.read_png(tile_file)
+        if header is None:
+            header = tile_header
+            bpp = png.bytes_per_pixel(header)
+            pixels = numpy.zeros((height, width * bpp), dtype = numpy.uint8)
+        elif (tile_header["bit_depth"], tile_header["color_type"]) != (header["bit_depth"], header["color_type"]):
+            raise ValueError("%s has a different color type than the other tiles" % tile_file)
+        i, j, x0, y0, x1, y1 = rect
+        h = min(y1 - y0, tile_header["height"])
+        w = min(x1 - x0, tile_header["width"])
+        pixels[y0:y0+h, x0*bpp:(x0+w)*bpp] = tile_pixels[:h, :w*bpp]
+    png.write_png(filename, header, pixels)
+
+
+def print_times(name, times, nx, ny):
+    """
+    Print the render time of each tile in a grid, like the tiles in the picture. Shows where the picture is slow to render.
+    times is a dictionary with (column, row): time.
+    """
+    print("%s: render time per tile (s)" % name)
+    for j in range(ny):
+        print("  ".join("%7.1f" % times[(i, j)] if (i, j) in times else "      -" for i in range(nx)))
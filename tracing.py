@@ -0,0 +1,234 @@
+"""
+Where does the time go? Measure the functions in build.py and materials.py while run.py builds the scene.
+
+With flag_trace in run.py, every function in build.py and materials.py is measured while it runs: the time, the number of operator calls (bpy.ops), how many objects and other datablocks it made or removed, and the memory of Blender. Functions that are called by other functions are measured too, inside the one that calls them.
+
+The result is saved as a trace file for the Chrome browser (open chrome://tracing and load the file) or https://ui.perfetto.dev, and a summary is printed: per function the number of calls, the total time and the time without the functions it calls (self).
+
+Usage:
+    tracing.start()
+    ...
+    tracing.stop("trace.json")
+
+Copyright Robbert Bloem, 2013
+"""
+
+import functools
+import inspect
+import json
+import os
+import sys
+import time
+
+try:
+    import psutil
+except ImportError:
+    # psutil does not come with Blender, then the memory is read in another way
+    psutil = None
+
+import bpy
+
+import build
+import materials
+
+
+# the modules that are measured
+MODULES = [build, materials]
+
+# functions that are not measured
+EXCLUDE = ["registered"]
+
+# the bpy.ops modules of which the operator calls are counted
+OPS_MODULES = ["mesh", "object", "import_scene", "render", "material", "texture", "image"]
+
+# the datablocks that are counted
+DATA = ["objects", "meshes", "materials", "textures", "images", "lamps", "groups", "actions"]
+
+# what is measured
+events = []
+stack = []
+operator_calls = 0
+originals = []
+start_time = 0
+
+
+def memory():
+    """
+    The memory of the process in bytes, None if it can't be found out.
+    """
+    if psutil is not None:
+        return psutil.Process(os.getpid()).memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (IOError, OSError, ValueError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # the peak, not the current memory. In kB on Linux, in bytes on Mac
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak
+    return peak * 1024
+
+
+def datablocks():
+    """
+    The number of objects and the number of all counted datablocks.
+    """
+    n = 0
+    for d in DATA:
+        if hasattr(bpy.data, d):
+            n += len(getattr(bpy.data, d))
+    return len(bpy.data.objects), n
+
+
+def now():
+    """
+    Microseconds since start(), the time unit of the trace files.
+    """
+    return (time.time() - start_time) * 1e6
+
+
+class CountingOps(object):
+    """
+    Stands in for a module of bpy.ops, like bpy.ops.mesh, and counts the operator calls.
+    """
+    def __init__(self, ops):
+        self._ops = ops
+
+    def __getattr__(self, name):
+        operator = getattr(self._ops, name)
+
+        def call(*args, **kwargs):
+            global operator_calls
+            operator_calls += 1
+            return operator(*args, **kwargs)
+        return call
+
+
+def traced(f, category):
+    """
+    Measure function f.
+    """
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        objects, blocks = datablocks()
+        span = {
+            "start":now(),
+            "ops":operator_calls,
+            "objects":objects,
+            "datablocks":blocks,
+            "children":0
+        }
+        stack.append(span)
+        try:
+            return f(*args, **kwargs)
+        finally:
+            stack.pop()
+            end = now()
+            objects, blocks = datablocks()
+            duration = end - span["start"]
+            if len(stack) > 0:
+                stack[-1]["children"] += duration
+            events.append({
+                "name":f.__name__,
+                "cat":category,
+                "ph":"X",
+                "ts":span["start"],
+                "dur":duration,
+                "pid":os.getpid(),
+                "tid":0,
+                "args":{
+                    "ops":operator_calls - span["ops"],
+                    "objects":objects - span["objects"],
+                    "datablocks":blocks - span["datablocks"],
+                    "memory":memory(),
+                    "self":duration - span["children"]
+                }
+            })
+    return wrapper
+
+
+def start():
+    """
+    Start measuring: replace the functions in build.py and materials.py and the bpy.ops modules with ones that measure.
+    """
+    global events, stack, operator_calls, originals, start_time
+    if len(originals) > 0:
+        stop()
+    events = []
+    stack = []
+    operator_calls = 0
+    start_time = time.time()
+
+    for module in MODULES:
+        for name, f in inspect.getmembers(module, inspect.isfunction):
+            if f.__module__ == module.__name__ and not name.startswith("_") and name not in EXCLUDE:
+                originals.append((module, name, f, True))
+                setattr(module, name, traced(f, module.__name__))
+
+    for name in OPS_MODULES:
+        if hasattr(bpy.ops, name):
+            # in Blender, the modules of bpy.ops are made when they are asked for, they are not attributes
+            own = name in vars(bpy.ops)
+            originals.append((bpy.ops, name, getattr(bpy.ops, name), own))
+            setattr(bpy.ops, name, CountingOps(getattr(bpy.ops, name)))
+
+
+def stop(filename = None):
+    """
+    Stop measuring, put the original functions back. Saves the trace file (if filename is given) and prints the summary.
+    Returns the summary.
+    """
+    for module, name, f, own in reversed(originals):
+        if own:
+            setattr(module, name, f)
+        else:
+            delattr(module, name)
+    del originals[:]
+
+    if filename is not None:
+        save(filename)
+    result = summary()
+    print_summary(result)
+    return result
+
+
+def save(filename):
+    """
+    Save the trace file, with the memory as a counter.
+    """
+    trace = list(events)
+    for e in events:
+        if e["args"]["memory"] is not None:
+            trace.append({"name":"memory", "ph":"C", "ts":e["ts"] + e["dur"], "pid":e["pid"], "tid":0, "args":{"MB":e["args"]["memory"] / 1024 / 1024}})
+    trace.sort(key = lambda e: e["ts"])
+    with open(filename, "w") as f:
+        json.dump({"traceEvents":trace, "displayTimeUnit":"ms"}, f)
+    print("trace saved in %s" % filename)
+
+
+def summary():
+    """
+    Per function: calls, total time, self time (s), operator calls and new datablocks. Sorted by self time.
+    """
+    functions = {}
+    for e in events:
+        name = "%s.%s" % (e["cat"], e["name"])
+        s = functions.setdefault(name, {"name":name, "calls":0, "total":0, "self":0, "ops":0, "objects":0, "datablocks":0})
+        s["calls"] += 1
+        s["total"] += e["dur"] / 1e6
+        s["self"] += e["args"]["self"] / 1e6
+        s["ops"] += e["args"]["ops"]
+        s["objects"] += e["args"]["objects"]
+        s["datablocks"] += e["args"]["datablocks"]
+    return sorted(functions.values(), key = lambda s: -s["self"])
+
+
+def print_summary(result):
+    print("%-40s %6s %9s %9s %6s %8s %11s" % ("function", "calls", "total (s)", "self (s)", "ops", "objects", "datablocks"))
+    for s in result:
+        print("%-40s %6d %9.3f %9.3f %6d %8d %11d" % (s["name"], s["calls"], s["total"], s["self"], s["ops"], s["objects"], s["datablocks"]))
@@ -0,0 +1,114 @@
+"""
+What the camera sees: projection of points and sizes with the camera from construction.define_camera, without Blender.
+This is used to decide how much detail something needs, based on how big it ends up in the picture.
+
+The camera looks along its local -z axis, local y is up. Like in Blender, the sensor is 32 mm wide and it fits the largest side of the picture (sensor_fit AUTO).
+
+resolution is a tuple (resolution_x, resolution_y, resolution_percentage), like the render settings in run.py.
+
+Copyright Robbert Bloem, 2013
+"""
+
+import numpy
+
+
+# the default sensor size of the Blender camera, in mm
+SENSOR_WIDTH = 32
+
+
+def euler_to_matrix(rot):
+    """
+    XYZ Euler angles to a rotation matrix. rot can be 3 angles or an n x 3 array, then n matrices are returned.
+    """
+    rot = numpy.asarray(rot, dtype = float)
+    single = rot.ndim == 1
+    rot = numpy.atleast_2d(rot)
+
+    cx, sx = numpy.cos(rot[:,0]), numpy.sin(rot[:,0])
+    cy, sy = numpy.cos(rot[:,1]), numpy.sin(rot[:,1])
+    cz, sz = numpy.cos(rot[:,2]), numpy.sin(rot[:,2])
+
+    m = numpy.empty((len(rot), 3, 3))
+    m[:,0,0] = cy * cz
+    m[:,0,1] = sx * sy * cz - cx * sz
+    m[:,0,2] = cx * sy * cz + sx * sz
+    m[:,1,0] = cy * sz
+    m[:,1,1] = sx * sy * sz + cx * cz
+    m[:,1,2] = cx * sy * sz - sx * cz
+    m[:,2,0] = -sy
+    m[:,2,1] = sx * cy
+    m[:,2,2] = cx * cy
+
+    if single:
+        return m[0]
+    return m
+
+
+def camera_settings(camera):
+    """
+    The first element of the list of construction.define_camera. A dictionary is also fine.
+    """
+    if isinstance(camera, (list, tuple)):
+        return camera[0]
+    return camera
+
+
+def to_camera_space(points, camera):
+    """
+    World coordinates (n x 3) to camera coordinates. In front of the camera, z is negative.
+    """
+    c = camera_settings(camera)
+    m = euler_to_matrix(c["rot"])
+    points = numpy.atleast_2d(numpy.asarray(points, dtype = float))
+    # the columns of m are the axes of the camera
+    return numpy.dot(points - numpy.asarray(c["loc"], dtype = float), m)
+
+
+def render_size(resolution):
+    """
+    The size of the picture in pixels.
+    """
+    return resolution[0] * resolution[2] / 100, resolution[1] * resolution[2] / 100
+
+
+def focal_pixels(camera, resolution):
+    """
+    The focal length in pixels: an object of size 1 at distance 1 is this many pixels big.
+    """
+    c = camera_settings(camera)
+    width, height = render_size(resolution)
+    return c["focus"] / SENSOR_WIDTH * max(width, height)
+
+
+def projected_size(locs, radii, camera, resolution):
+    """
+    The size in pixels (the diameter) of spheres at locs with radii.
+    Spheres that are behind the camera get size 0. If the camera is inside a sphere, it gets the size of the picture.
+    """
+    p = to_camera_space(locs, camera)
+    radii = numpy.broadcast_to(numpy.asarray(radii, dtype = float), (len(p),))
+    depth = -p[:,2]
+
+    width, height = render_size(resolution)
+    size = numpy.zeros(len(p))
+    inside = numpy.sqrt(numpy.sum(p**2, axis = 1)) <= radii
+    front = (depth > 0) & ~inside
+    size[front] = 2 * radii[front] * focal_pixels(camera, resolution) / depth[front]
+    size[inside] = max(width, height)
+    return size
+
+
+def bounding_sphere(vertices, loc = (0,0,0), scale = (1,1,1), rot = (0,0,0)):
+    """
+    A sphere around a mesh (n x 3 vertices) that is placed with loc, scale and rot.
+    Returns the centre and the radius.
+    """
+    vertices = numpy.asarray(vertices, dtype = float)
+    if len(vertices) == 0:
+        return numpy.asarray(loc, dtype = float), 0.0
+    lo = vertices.min(axis = 0)
+    hi = vertices.max(axis = 0)
+    scale = numpy.asarray(scale, dtype = float)
+    centre = numpy.asarray(loc, dtype = float) + numpy.dot(euler_to_matrix(rot), (lo + hi) / 2 * scale)
+    radius = numpy.sqrt(numpy.sum(((hi - lo) / 2 * scale)**2))
+    return centre, radius
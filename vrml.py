@@ -0,0 +1,346 @@
+"""
+Read the geometry from VRML (.wrl) files, like the ones PyMol makes.
+This replaces bpy.ops.import_scene.x3d for the proteins: it only reads what is needed for the mesh (the IndexedFaceSets: points, faces and colors) and skips everything else, including the lights. The file is read in chunks and the numbers go straight into numpy arrays, so big files do not end up as big lists of Python floats.
+
+All IndexedFaceSets in a file are put together in one mesh. Transform nodes are not applied (PyMol doesn't use them for surfaces and cartoons).
+
+read_wrl_cached does the same, but the first time a file is read, the result is saved in a binary file (see cache.save_raw). The next time, that file is memory-mapped, so the .wrl file does not have to be read at all.
+
+It does not need Blender.
+
+Copyright Robbert Bloem, 2013
+"""
+
+import os
+
+import numpy
+
+import cache
+
+
+# nodes that are skipped completely
+SKIP_NODES = ["DirectionalLight", "PointLight", "SpotLight", "Viewpoint", "NavigationInfo", "Background", "WorldInfo", "Fog", "Sound", "Script"]
+
+# arrays with numbers that are not needed
+SKIP_ARRAYS = ["vector", "normalIndex", "texCoordIndex"]
+
+# the default color for faces without colors
+DEFAULT_COLOR = (0.8, 0.8, 0.8)
+
+
+class Reader(object):
+    """
+    Reads a file in chunks and splits it in tokens: words, numbers and the brackets {}[].
+    Arrays with numbers can be read in one go with read_numbers().
+    """
+
+    def __init__(self, f, chunk_size = 1024 * 1024):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """
+        Read the next chunk. Returns False at the end of the file.
+        """
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def next_token(self):
+        """
+        The next token, or None at the end of the file. Comments (#) and commas are skipped.
+        """
+        while True:
+            # skip white space and commas
+            while self.pos < len(self.buf) and (self.buf[self.pos].isspace() or self.buf[self.pos] == ","):
+                self.pos += 1
+            if self.pos >= len(self.buf):
+                if not self.fill():
+                    return None
+                continue
+
+            c = self.buf[self.pos]
+
+            # comment, until the end of the line
+            if c == "#":
+                end = self.buf.find("\n", self.pos)
+                while end == -1:
+                    if not self.fill():
+                        self.pos = len(self.buf)
+                        return None
+                    end = self.buf.find("\n", self.pos)
+                self.pos = end + 1
+                continue
+
+            if c in "{}[]":
+                self.pos += 1
+                return c
+
+            # string
+            if c == '"':
+                end = self.buf.find('"', self.pos + 1)
+                while end == -1:
+                    if not self.fill():
+                        end = len(self.buf)
+                        break
+                    end = self.buf.find('"', self.pos + 1)
+                token = self.buf[self.pos:end + 1]
+                self.pos = end + 1
+                return token
+
+            # word or number, until white space or a bracket
+            end = self.pos
+            while True:
+                while end < len(self.buf) and not (self.buf[end].isspace() or self.buf[end] in ",{}[]#"):
+                    end += 1
+                if end < len(self.buf) or self.eof:
+                    break
+                # the token may continue in the next chunk
+                end -= self.pos
+                if not self.fill():
+                    end += self.pos
+                    break
+                end += self.pos
+            token = self.buf[self.pos:end]
+            self.pos = end
+            return token
+
+    def read_numbers(self, dtype):
+        """
+        Read numbers up to the closing ], the [ has already been read.
+        The text is converted to numbers per chunk.
+        """
+        parts = []
+        while True:
+            end = self.buf.find("]", self.pos)
+            if end != -1:
+                parts += [to_numbers(self.buf[self.pos:end], dtype)]
+                self.pos = end + 1
+                break
+            # convert everything up to the last separator, a number may continue in the next chunk
+            cut = max(self.buf.rfind(" ", self.pos), self.buf.rfind(",", self.pos), self.buf.rfind("\n", self.pos))
+            if cut > self.pos:
+                parts += [to_numbers(self.buf[self.pos:cut], dtype)]
+                self.pos = cut
+            if not self.fill():
+                parts += [to_numbers(self.buf[self.pos:], dtype)]
+                self.pos = len(self.buf)
+                break
+        if len(parts) == 0:
+            return numpy.zeros(0, dtype = dtype)
+        return numpy.concatenate(parts)
+
+    def skip_block(self, open_bracket = "{", close_bracket = "}"):
+        """
+        Skip up to the matching closing bracket, the opening bracket has already been read.
+        """
+        depth = 1
+        while depth > 0:
+            token = self.next_token()
+            if token is None:
+                return
+            if token == open_bracket:
+                depth += 1
+            elif token == close_bracket:
+                depth -= 1
+
+
+def to_numbers(text, dtype):
+    """
+    Text with numbers separated by white space or commas to a numpy array.
+    """
+    return numpy.array(text.replace(",", " ").split(), dtype = float).astype(dtype)
+
+
+def read_wrl(filename, chunk_size = 1024 * 1024):
+    """
+    Read the IndexedFaceSets of a VRML file.
+
+    OUTPUT
+    A dictionary with:
+    - vertices: n x 3 (float32)
+    - loop_totals: the number of vertices of each face (uint32)
+    - loop_vertices: the vertex indices of the faces (uint32)
+    - colors: n x 3, color per vertex (float32), or None if the file has no colors
+    """
+    face_sets = []
+
+    with open(filename, "r") as f:
+        reader = Reader(f, chunk_size)
+
+        # the nodes we are in, and the last word
+        stack = []
+        word = None
+        current = None
+
+        while True:
+            token = reader.next_token()
+            if token is None:
+                break
+
+            if token == "{":
+                node = word
+                if node in SKIP_NODES:
+                    reader.skip_block()
+                    word = None
+                    continue
+                stack += [node]
+                if node == "IndexedFaceSet":
+                    current = {"point":None, "color":None, "coordIndex":None, "colorIndex":None, "colorPerVertex":True}
+
+            elif token == "}":
+                if len(stack) > 0:
+                    node = stack.pop()
+                    if node == "IndexedFaceSet" and current is not None:
+                        face_sets += [current]
+                        current = None
+
+            elif token == "[":
+                field = word
+                parent = stack[-1] if len(stack) > 0 else None
+                if current is not None and ((field == "point" and parent == "Coordinate") or (field == "color" and parent == "Color")):
+                    current[field] = reader.read_numbers(numpy.float32).reshape((-1, 3))
+                elif current is not None and field in ["coordIndex", "colorIndex"]:
+                    current[field] = reader.read_numbers(numpy.int64)
+                elif field in SKIP_ARRAYS or (field == "point" and parent == "TextureCoordinate"):
+                    reader.skip_block("[", "]")
+                else:
+                    # an array of nodes, like children [ ... ]
+                    stack += ["["]
+
+            elif token == "]":
+                if len(stack) > 0 and stack[-1] == "[":
+                    stack.pop()
+
+            else:
+                if current is not None and word == "colorPerVertex":
+                    current["colorPerVertex"] = (token == "TRUE")
+                # DEF name Type: skip the name
+                if word == "DEF":
+                    word = None
+                    continue
+                word = token
+
+    return combine_face_sets(face_sets)
+
+
+def read_wrl_cached(filename, validate = "mtime", max_size = None):
+    """
+    Same as read_wrl, but the result is kept in the cache (kind 'protein'). 
+    The cached file is used as long as the .wrl file didn't change. To check that, 'mtime' uses the modification time and size of the file (fast), 'hash' uses the contents (slower, but also works after copying files around).
+    max_size (bytes) limits the size of the protein cache, the least recently used files are removed first.
+    The arrays are memory-mapped: vertices (float32), loop_totals and loop_vertices (uint32) and colors (float32, per vertex).
+    """
+    key = protein_key(filename, validate)
+
+    geometry = cache.map_raw("protein", key)
+    if geometry is not None:
+        if "colors" not in geometry:
+            geometry["colors"] = None
+        return geometry
+
+    geometry = read_wrl(filename)
+    arrays = {}
+    for k, v in geometry.items():
+        if v is not None:
+            arrays[k] = v
+    cache.save_raw("protein", key, max_size = max_size, **arrays)
+    return geometry
+
+
+def protein_key(filename, validate = "mtime"):
+    """
+    The cache key of a .wrl file, see read_wrl_cached.
+    """
+    filename = os.path.abspath(filename)
+    if validate == "hash":
+        return cache.make_key("protein", cache.file_hash(filename))
+    return cache.make_key("protein", filename, os.path.getmtime(filename), os.path.getsize(filename))
+
+
+def combine_face_sets(face_sets):
+    """
+    Put the IndexedFaceSets together in one set of arrays.
+    """
+    vertices = []
+    loop_totals = []
+    loop_vertices = []
+    colors = []
+    has_colors = False
+    offset = 0
+
+    for fs in face_sets:
+        if fs["point"] is None or fs["coordIndex"] is None:
+            continue
+        points = fs["point"]
+        totals, indices = split_faces(fs["coordIndex"])
+
+        # colors per vertex
+        c = None
+        if fs["color"] is not None and fs["colorPerVertex"]:
+            if fs["colorIndex"] is not None and len(fs["colorIndex"]) > 0:
+                _t, color_indices = split_faces(fs["colorIndex"])
+                if len(color_indices) == len(indices):
+                    c = numpy.empty((len(points), 3), dtype = numpy.float32)
+                    c[:] = DEFAULT_COLOR
+                    c[indices] = fs["color"][color_indices]
+            elif len(fs["color"]) == len(points):
+                c = fs["color"]
+        if c is None:
+            c = numpy.empty((len(points), 3), dtype = numpy.float32)
+            c[:] = DEFAULT_COLOR
+        else:
+            has_colors = True
+
+        # faces with less than 3 vertices can't be used
+        keep = totals >= 3
+        if not numpy.all(keep):
+            indices = indices[numpy.repeat(keep, totals)]
+            totals = totals[keep]
+
+        vertices += [points]
+        colors += [c]
+        loop_totals += [totals]
+        loop_vertices += [indices + offset]
+        offset += len(points)
+
+    if len(vertices) == 0:
+        return {
+            "vertices":numpy.zeros((0, 3), dtype = numpy.float32),
+            "loop_totals":numpy.zeros(0, dtype = numpy.uint32),
+            "loop_vertices":numpy.zeros(0, dtype = numpy.uint32),
+            "colors":None
+        }
+
+    return {
+        "vertices":numpy.concatenate(vertices).astype(numpy.float32),
+        "loop_totals":numpy.concatenate(loop_totals).astype(numpy.uint32),
+        "loop_vertices":numpy.concatenate(loop_vertices).astype(numpy.uint32),
+        "colors":numpy.concatenate(colors).astype(numpy.float32) if has_colors else None
+    }
+
+
+def split_faces(index):
+    """
+    A VRML index list (faces separated by -1) to the number of vertices per face and the indices without the -1's.
+    """
+    index = numpy.asarray(index)
+    if len(index) == 0:
+        return numpy.zeros(0, dtype = numpy.int64), numpy.zeros(0, dtype = numpy.int64)
+    if index[-1] != -1:
+        index = numpy.append(index, -1)
+    ends = numpy.flatnonzero(index == -1)
+    totals = numpy.diff(numpy.concatenate(([-1], ends))) - 1
+    indices = index[index != -1]
+    # empty faces (-1 -1)
+    totals = totals[totals > 0]
+    return totals, indices
@@ -0,0 +1,55 @@
+"""
+Background Blenders (workers) for the scripts that are run from the command line, batch.py and csg.py.
+
+Both scripts are run twice: outside Blender as the driver, that starts a background Blender for each job, and inside each of these Blenders (blender -b file.blend -P script.py -- arguments) as the worker. This module has what they share:
+- package_dir, the folder with the scripts and blender.blend
+- script_args: the arguments of the script, inside Blender they come after --
+- run_blender: start one Blender and wait for it, its output goes to a log file
+- run_all: run the jobs, a number at the same time. The work is done by the Blenders, so threads are enough.
+
+Blender doesn't add the folder of the script to the path, so each script adds it before it imports this module.
+
+Copyright Robbert Bloem, 2013
+"""
+
+import concurrent.futures
+import os
+import subprocess
+import time
+
+
+# the folder with this file and blender.blend
+package_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def script_args(argv):
+    """
+    The arguments for the script in argv (sys.argv). Inside Blender, they come after --, the ones before are for Blender.
+    """
+    if "--" in argv:
+        return argv[argv.index("--") + 1:]
+    return argv[1:]
+
+
+def run_blender(command, log_file):
+    """
+    Run a Blender with command (a list, like for subprocess) and wait for it. The output goes to log_file.
+    Returns the return code and the time it took.
+    """
+    t = time.time()
+    with open(log_file, "w") as log:
+        returncode = subprocess.call(command, stdout = log, stderr = subprocess.STDOUT)
+    return returncode, time.time() - t
+
+
+def run_all(function, jobs, max_workers, done = None):
+    """
+    Call function(*args) for each args in jobs, max_workers at the same time. done(result) is called for each job when it is finished.
+    Returns the results in the order of jobs.
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers = max_workers) as pool:
+        futures = [pool.submit(function, *args) for args in jobs]
+        for future in concurrent.futures.as_completed(futures):
+            if done is not None:
+                done(future.result())
+    return [future.result() for future in futures]